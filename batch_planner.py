@@ -0,0 +1,423 @@
+# =============================================================================
+# BATCH PLANNER: VOORUIT LEZEN EN SCHRIJVEN OP DE ACHTERGROND
+# =============================================================================
+# Op netwerkschijven (SMB/NFS) gaat de meeste tijd naar het lezen van de
+# invoerbestanden. Zonder planner leest, converteert en schrijft de batch elk
+# bestand strikt na elkaar: tijdens het lezen staat de processor stil, en
+# tijdens het converteren staat het netwerk stil.
+#
+# Deze module laat die stappen overlappen:
+#   - voorgelezen_bestanden(): een asyncio-lus in een eigen thread leest de
+#     VOLGENDE bestanden al volledig in het geheugen terwijl het huidige
+#     bestand geconverteerd wordt. Hoeveel bestanden vooruit en hoeveel bytes
+#     maximaal tegelijk in het geheugen staan is instelbaar.
+#   - AchtergrondSchrijver: een thread die geconverteerde blokken wegschrijft,
+#     zodat de conversie niet op de schijf hoeft te wachten.
+#   - bestanden_zoeken(): een generator die een map (en submappen) doorloopt
+#     en de gevonden bestanden één voor één teruggeeft, zodat de batch al kan
+#     beginnen terwijl het zoeken nog bezig is.
+#
+#   - GeheugenMeter: meet tijdens een taak het geheugengebruik van het proces
+#     (met zijn werkprocessen) en onthoudt de piek (voor het geheugenbudget, zie batch_taak).
+#
+# De conversie zelf blijft in de batch-thread en in dezelfde volgorde: de
+# bestanden komen in de oorspronkelijke volgorde uit voorgelezen_bestanden.
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   asyncio   : plant het gelijktijdig inlezen van meerdere bestanden
+#   fnmatch   : bestandsnamen vergelijken met patronen zoals *.xyz
+#   os        : bestandsgrootte opvragen, mappen doorlopen (scandir)
+#   queue     : begrensde wachtrij tussen conversie en schrijf-thread
+#   sys       : besturingssysteem bepalen voor het meten van het geheugen
+#   threading : aparte threads voor de asyncio-lus, de schrijver en de meter
+#   time      : wachttijd van de conversie op de schrijf-thread meten
+#   compressie: uitvoer ingepakt wegschrijven (.gz, .zst, .xz)
+#   procestransformatie: proces-id's van de werkprocessen (geheugen meten)
+# -----------------------------------------------------------------------------
+import asyncio
+import fnmatch
+import os
+import queue
+import sys
+import threading
+import time
+from compressie import uitvoer_openen
+from procestransformatie import werkproces_ids
+
+
+# -----------------------------------------------------------------------------
+# Standaardwaarden (ook gebruikt door de GUI):
+#   VOORUIT_BESTANDEN : hoeveel volgende bestanden er maximaal al gelezen worden
+#   VOORUIT_MAX_BYTES : hoeveel bytes er maximaal voorgelezen in het geheugen staan
+# Een bestand dat op zich al groter is dan VOORUIT_MAX_BYTES wordt niet
+# voorgelezen; de conversie leest het dan gewoon chunk per chunk van schijf.
+# -----------------------------------------------------------------------------
+VOORUIT_BESTANDEN = 2
+VOORUIT_MAX_BYTES = 512 * 1024 * 1024
+
+
+# =============================================================================
+# BESTANDEN ZOEKEN IN EEN MAP
+# =============================================================================
+# Leveringen bestaan soms uit tienduizenden bestanden in geneste mappen. Een
+# volledige lijst vooraf opbouwen duurt op een netwerkschijf minuten; daarom
+# geeft deze generator elk bestand terug zodra het gevonden is.
+#
+# patronen : bestandsnaampatronen gescheiden door ";" (bijv. "*.xyz;*.txt"),
+#            hoofdletterongevoelig. Leeg = alle bestanden.
+# recursief: ook in submappen zoeken
+# uitsluiten: map die overgeslagen wordt, bijv. de uitvoermap als die binnen
+#            de invoermap ligt (anders zou de batch zijn eigen uitvoer vinden)
+#
+# Per map worden de namen gesorteerd (eerst de bestanden, dan de submappen),
+# zodat de volgorde voorspelbaar is. Mappen die niet gelezen kunnen worden
+# (geen rechten) worden overgeslagen, net zoals os.walk dat doet.
+# -----------------------------------------------------------------------------
+def bestanden_zoeken(map_pad, patronen: str = "", recursief: bool = True, uitsluiten=None):
+    lijst = [p.strip().lower() for p in patronen.split(";") if p.strip()] or ["*"]
+    overslaan = os.path.normcase(os.path.abspath(uitsluiten)) if uitsluiten else None
+
+    te_doorzoeken = [os.path.abspath(map_pad)]
+    while te_doorzoeken:
+        huidige = te_doorzoeken.pop()
+        try:
+            with os.scandir(huidige) as items:
+                items = sorted(items, key=lambda item: item.name.lower())
+        except OSError:
+            continue
+
+        submappen = []
+        for item in items:
+            if item.is_dir(follow_symlinks=False):
+                if os.path.normcase(item.path) != overslaan:
+                    submappen.append(item.path)
+            elif any(fnmatch.fnmatch(item.name.lower(), p) for p in lijst):
+                yield item.path
+        if recursief:
+            # Omgekeerd op de stapel, zodat de eerste submap eerst aan de beurt komt
+            te_doorzoeken.extend(reversed(submappen))
+
+
+# =============================================================================
+# VOORUIT LEZEN
+# =============================================================================
+# _voorlezen draait in de asyncio-lus. Voor elk pad:
+#   1. wacht tot er binnen het bytebudget plaats is voor dit bestand
+#   2. start het lezen als taak (asyncio.to_thread: lezen blokkeert, dus in
+#      een werkthread, zodat meerdere bestanden tegelijk kunnen laden)
+#   3. zet (pad, taak, grootte) in de wachtrij. Die heeft maxsize=vooruit:
+#      zo loopt de planner nooit meer dan "vooruit" bestanden voor.
+# Het budget wordt pas vrijgegeven als de batch-thread het bestand volledig
+# verwerkt heeft (zie voorgelezen_bestanden).
+#
+# paden mag ook een generator zijn (bijv. bestanden_zoeken): het volgende pad
+# wordt dan in een werkthread opgevraagd, zodat traag zoeken op een
+# netwerkschijf de asyncio-lus niet blokkeert.
+#
+# Leesfouten (bestand verdwenen, geen rechten) worden hier niet gemeld: het
+# bestand komt dan zonder data door en de conversie leest het zelf van schijf,
+# zodat de fout via de gewone foutafhandeling bij het juiste bestand verschijnt.
+# -----------------------------------------------------------------------------
+def _lees_bestand(pad):
+    try:
+        with open(pad, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _grootte(pad):
+    try:
+        return os.path.getsize(pad)
+    except OSError:
+        return None
+
+
+async def _voorlezen(paden, wachtrij: asyncio.Queue, max_bytes: int, budget: dict,
+                     vrijgegeven: asyncio.Condition):
+    try:
+        await _voorlezen_paden(iter(paden), wachtrij, max_bytes, budget, vrijgegeven)
+    except Exception:
+        # Fout bij het zoeken: de lijst afsluiten zodat de batch-thread niet
+        # blijft wachten; planner.result() geeft de fout daarna door.
+        await wachtrij.put(None)
+        raise
+    await wachtrij.put(None)   # einde van de lijst
+
+
+async def _voorlezen_paden(paden, wachtrij, max_bytes, budget, vrijgegeven):
+    while (pad := await asyncio.to_thread(next, paden, None)) is not None:
+        grootte = await asyncio.to_thread(_grootte, pad)
+        if grootte is None or grootte > max_bytes:
+            # Te groot (of onleesbaar): de conversie leest zelf van schijf
+            await wachtrij.put((pad, None, 0))
+            continue
+
+        async with vrijgegeven:
+            await vrijgegeven.wait_for(lambda: budget["bytes"] + grootte <= max_bytes)
+            budget["bytes"] += grootte
+        taak = asyncio.create_task(asyncio.to_thread(_lees_bestand, pad))
+        await wachtrij.put((pad, taak, grootte))
+
+
+async def _vrijgeven(budget: dict, vrijgegeven: asyncio.Condition, grootte: int):
+    async with vrijgegeven:
+        budget["bytes"] -= grootte
+        vrijgegeven.notify_all()
+
+
+async def _resultaat(taak):
+    return None if taak is None else await taak
+
+
+# -----------------------------------------------------------------------------
+# Generator voor de batch-thread: geeft per bestand (pad, data) terug, in de
+# oorspronkelijke volgorde. data zijn de volledige bytes van het bestand, of
+# None als het niet voorgelezen werd (te groot). Stopt de batch vroegtijdig
+# (Stop-knop, fout), dan ruimt het finally-blok de asyncio-lus netjes op.
+# -----------------------------------------------------------------------------
+def voorgelezen_bestanden(paden, vooruit: int = VOORUIT_BESTANDEN, max_bytes: int = VOORUIT_MAX_BYTES):
+    lus = asyncio.new_event_loop()
+    thread = threading.Thread(target=lus.run_forever, daemon=True)
+    thread.start()
+
+    def in_lus(coroutine):
+        # Coroutine uitvoeren in de asyncio-lus en vanuit deze thread wachten op het resultaat
+        return asyncio.run_coroutine_threadsafe(coroutine, lus).result()
+
+    async def opstarten():
+        # Queue en Condition moeten binnen de lopende lus aangemaakt worden
+        return asyncio.Queue(maxsize=max(vooruit, 1)), asyncio.Condition()
+
+    budget = {"bytes": 0}
+    wachtrij, vrijgegeven = in_lus(opstarten())
+    planner = asyncio.run_coroutine_threadsafe(
+        _voorlezen(paden, wachtrij, max_bytes, budget, vrijgegeven), lus)
+    try:
+        while True:
+            item = in_lus(wachtrij.get())
+            if item is None:
+                break
+            pad, taak, grootte = item
+            data = in_lus(_resultaat(taak))
+            yield pad, data
+            del data   # geheugen vrijgeven vóór het budget vrijkomt
+            in_lus(_vrijgeven(budget, vrijgegeven, grootte))
+        planner.result()   # fouten uit de planner (bijv. bestand niet gevonden) doorgeven
+    finally:
+        planner.cancel()
+        lus.call_soon_threadsafe(lus.stop)
+        thread.join()
+        lus.close()
+
+
+# =============================================================================
+# SCHRIJVEN OP DE ACHTERGROND
+# =============================================================================
+# De conversie zet elk geconverteerd blok tekst in een begrensde wachtrij;
+# een aparte thread schrijft die weg. Is de schijf trager dan de conversie,
+# dan raakt de wachtrij vol en wacht de conversie (back-pressure): het
+# geheugengebruik blijft zo begrensd tot max_blokken blokken.
+# Met max_bytes (geheugenbudget) wacht de conversie ook zodra er zoveel bytes
+# onderweg zijn; één blok mag altijd, ook als het alleen al groter is.
+# wachttijd telt hoe lang de conversie in totaal op de schrijver gewacht heeft.
+#
+# Eindigt het pad op .gz, .zst of .xz, dan pakt deze thread de tekst ook in
+# (compressie.uitvoer_openen). Het inpakken overlapt zo met de conversie.
+#
+# Met stroom (een open binair bestand, bijv. sys.stdout.buffer) gaat alles
+# wat met pad None aangeboden wordt naar die stroom (pijpmodus, zie
+# conversie_pijp). Die blijft open; wacht() spoelt ze enkel door.
+#
+# Een schrijffout wordt onthouden en bij de volgende schrijf() of bij
+# sluiten() opnieuw opgeworpen in de batch-thread, zodat die gewoon via de
+# bestaande foutafhandeling gemeld wordt.
+# -----------------------------------------------------------------------------
+class AchtergrondSchrijver:
+    _SLUIT = "sluit"    # markering: huidig bestand sluiten
+    _STOP = None        # markering: thread beëindigen
+
+    def __init__(self, max_blokken: int = 4, max_bytes=None, stroom=None):
+        self._wachtrij = queue.Queue(maxsize=max_blokken)
+        self._stroom = stroom
+        self._fout = None
+        self._max_bytes = max_bytes
+        self._onderweg = 0
+        self._ruimte = threading.Condition()
+        self.wachttijd = 0.0
+        self._thread = threading.Thread(target=self._werk, daemon=True)
+        self._thread.start()
+
+    def _werk(self):
+        # Het bestand blijft open zolang er naar hetzelfde pad geschreven wordt
+        bestand, huidig_pad = None, None
+        while True:
+            item = self._wachtrij.get()
+            try:
+                if item is self._STOP or item == self._SLUIT:
+                    if bestand is not None:
+                        bestand.close()
+                    bestand, huidig_pad = None, None
+                    if self._stroom is not None and self._fout is None:
+                        self._stroom.flush()
+                    if item is self._STOP:
+                        return
+                    continue
+                pad, mode, data = item
+                try:
+                    if self._fout is not None:
+                        continue   # na een fout enkel nog de wachtrij leegmaken
+                    if pad is None:
+                        self._stroom.write(data)
+                        continue
+                    if pad != huidig_pad or mode == "w":
+                        if bestand is not None:
+                            bestand.close()
+                        bestand, huidig_pad = uitvoer_openen(pad, mode), pad
+                    bestand.write(data)
+                finally:
+                    with self._ruimte:
+                        self._onderweg -= len(data)
+                        self._ruimte.notify_all()
+            except Exception as e:
+                self._fout = e
+            finally:
+                self._wachtrij.task_done()
+
+    def schrijf(self, pad, mode: str, tekst: str):
+        if self._fout is not None:
+            raise self._fout
+        data = tekst.encode("utf-8")
+        start = time.perf_counter()
+        with self._ruimte:
+            while self._max_bytes and self._onderweg and self._onderweg + len(data) > self._max_bytes:
+                self._ruimte.wait()
+            self._onderweg += len(data)
+        try:
+            self._wachtrij.put((None if pad is None else str(pad), mode, data))
+        finally:
+            self.wachttijd += time.perf_counter() - start
+
+    def wacht(self, fout_negeren: bool = False):
+        # Wachten tot alles wat tot nu toe aangeboden werd op schijf staat en
+        # het bestand gesloten is (daarna kan het bijv. verwijderd worden).
+        # fout_negeren: bij opruimen na een annulering of een andere fout is
+        # een schrijffout niet meer van belang.
+        self._wachtrij.put(self._SLUIT)
+        self._wachtrij.join()
+        fout, self._fout = self._fout, None
+        if fout is not None and not fout_negeren:
+            raise fout
+
+    def sluiten(self):
+        self._wachtrij.put(self._STOP)
+        self._thread.join()
+
+
+# =============================================================================
+# GEHEUGENGEBRUIK METEN
+# =============================================================================
+# geheugen_nu() geeft het geheugen dat het proces op dit moment inneemt
+# (resident set / working set) in bytes, of None als dat niet te bepalen is.
+# Enkel met de standaardbibliotheek:
+#   Linux   : /proc/<pid>/statm (tweede getal = resident, in pagina's)
+#   Windows : GetProcessMemoryInfo uit psapi.dll (WorkingSetSize)
+#   anders  : de piek tot nu toe via resource.getrusage (macOS: in bytes)
+# De werkprocessen van de transformatie (procestransformatie) tellen mee:
+# ze vallen onder hetzelfde geheugenbudget. Op Linux en Windows wordt hun
+# geheugen opgeteld bij dat van het proces zelf; gedeelde bibliotheken en
+# de blokken in gedeeld geheugen tellen dan meermaals, wat de meting aan
+# de veilige kant houdt. Elders telt enkel het proces zelf.
+#
+# GeheugenMeter meet dat in een eigen thread om de GEHEUGEN_INTERVAL
+# seconden en onthoudt de piek van de hele taak (piek) en sinds het laatste
+# bestand_starten() (bestand_piek). Een piek tussen twee metingen in kan
+# gemist worden; bij chunks van een fractie van een seconde is dat weinig.
+# -----------------------------------------------------------------------------
+GEHEUGEN_INTERVAL = 0.2
+
+
+def _geheugen_windows(pid=None):
+    import ctypes
+    from ctypes import wintypes
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+    class Tellers(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    tellers = Tellers()
+    tellers.cb = ctypes.sizeof(tellers)
+    kernel32 = ctypes.windll.kernel32
+    if pid is None:
+        proces = kernel32.GetCurrentProcess()
+    else:
+        proces = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not proces:
+            return None
+    try:
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(proces, ctypes.byref(tellers), tellers.cb):
+            return None
+    finally:
+        if pid is not None:
+            kernel32.CloseHandle(proces)
+    return tellers.WorkingSetSize
+
+
+def _geheugen_proces(pid=None):
+    # Resident geheugen van één proces (pid None: dit proces), of None
+    try:
+        if sys.platform.startswith("linux"):
+            with open(f"/proc/{pid or 'self'}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if sys.platform == "win32":
+            return _geheugen_windows(pid)
+        if pid is not None:
+            return None
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (OSError, ValueError, ImportError, AttributeError):
+        return None
+
+
+def geheugen_nu():
+    nu = _geheugen_proces()
+    if nu is None:
+        return None
+    # Een werkproces dat net stopt, telt gewoon niet meer mee
+    return nu + sum(_geheugen_proces(pid) or 0 for pid in werkproces_ids())
+
+
+class GeheugenMeter:
+    def __init__(self, interval: float = GEHEUGEN_INTERVAL):
+        self.piek = self.bestand_piek = geheugen_nu()
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._werk, daemon=True)
+        if self.piek is not None:
+            self._thread.start()
+
+    def _werk(self):
+        while not self._stop.wait(self._interval):
+            self.meten()
+
+    def meten(self):
+        nu = geheugen_nu()
+        if nu is not None:
+            self.piek = max(self.piek, nu)
+            self.bestand_piek = max(self.bestand_piek, nu)
+
+    def bestand_starten(self):
+        self.bestand_piek = geheugen_nu()
+
+    def sluiten(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self.piek is not None:
+            self.meten()
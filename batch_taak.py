@@ -0,0 +1,830 @@
+# =============================================================================
+# BATCHTAKEN: PROFIELEN, UITVOERING ZONDER GUI EN WACHTRIJ
+# =============================================================================
+# Een batchtaak (profiel) bevat ALLE keuzes van de batchversie: stelsels,
+# scheidingstekens, vinkjes, reductievlak, tegels, uitdunnen, ontdubbelen,
+# samenvoegen én de invoer- en uitvoerlocaties. Zo'n profiel kan:
+#   - in de batch-GUI opgeslagen en terug geladen worden
+#   - in de single-versie geladen worden (enkel de conversie-instellingen)
+#   - zonder GUI uitgevoerd worden vanaf de opdrachtregel, bijv. 's nachts
+#     via de Taakplanner van Windows op een aparte machine:
+#
+#       python batch_taak.py levering_a.json levering_b.toml
+#       python batch_taak.py D:\taken          (alle profielen in de map)
+#
+# Meerdere taken lopen na elkaar in hetzelfde proces (wachtrij_uitvoeren).
+# pandas en pyproj worden zo maar één keer geladen, en de caches van
+# conversie_kern (werkgebieden, correctierasters, PROJ-database) blijven
+# warm van de ene taak naar de volgende.
+#
+# De batch-GUI gebruikt dezelfde taak_uitvoeren(): de GUI bouwt een profiel
+# uit zijn widgets en krijgt de status per bestand terug via een callback.
+# Deze module bevat dus GEEN Tkinter-code.
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   argparse       : opdrachtregelopties
+#   functools      : vaste gegevens van een bestand meegeven aan het logboek
+#   json           : profielen lezen en opslaan
+#   os             : paden absoluut maken (zoals batch_planner.bestanden_zoeken)
+#   shutil         : map met onvolledige tegeluitvoer verwijderen bij annuleren
+#   signal         : Ctrl+C netjes afhandelen (huidig bestand opruimen)
+#   sys            : afsluitcode van het opdrachtregelprogramma
+#   threading      : stop-vlag (dezelfde als de Stop-knop van de GUI)
+#   time           : duur per bestand en per taak
+#   pathlib        : bestandspaden
+#   conversie_kern : de eigenlijke conversie
+#   batch_planner  : vooruit lezen, schrijven op de achtergrond, map doorzoeken,
+#                    geheugengebruik meten
+#   compressie     : gecomprimeerde invoer herkennen, uitvoer inpakken
+#   werkmap        : werkbladen van een Excel-werkmap opsommen
+#   logboek        : logboek en metrieken van een taak
+#   multiprocessing / procestransformatie : werkprocessen voor de transformatie
+# -----------------------------------------------------------------------------
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from conversie_kern import (CRS_CODES, STANDAARD_INSTELLINGEN, formaat_detecteren, formaat_toepassen,
+                            steekproef_controleren, statistiek_nieuw, statistiek_schrijven, tegel_map,
+                            conversie_meerdere_stelsels, tak_nieuw, ConversieGeannuleerd,
+                            uitvoer_doel, doel_afsluiten, ontdubbelen_nieuw, ontdubbelen_sluiten,
+                            hoogte_controleren, SORTEER_METHODES, geheugen_verdeling, GEHEUGEN_MIN_MB,
+                            sorteren_nieuw, sorteren_doel_afronden, sorteren_sluiten, uitdunnen_nieuw,
+                            uitdunnen_doel_afronden)
+from batch_planner import (voorgelezen_bestanden, AchtergrondSchrijver, bestanden_zoeken, GeheugenMeter,
+                           VOORUIT_BESTANDEN, VOORUIT_MAX_BYTES)
+from compressie import COMPRESSIES, zonder_compressie
+from werkmap import is_werkmap, werkbladen
+from procestransformatie import procestransformers_sluiten
+from logboek import logboek_openen, logboek_bestand, logboek_afsluiten
+
+
+# =============================================================================
+# PROFIEL
+# =============================================================================
+# Een profiel is een gewone dictionary: de conversie-instellingen (zoals in
+# conversie_kern.STANDAARD_INSTELLINGEN) onder "instellingen", en daarnaast
+# de batchopties hieronder. Op schijf is het een JSON- of TOML-bestand, bijv.
+#
+#   naam = "Levering haven Antwerpen"
+#   invoer_map = "D:/leveringen/2024-06"
+#   patronen = "*.xyz"
+#   uitvoer_map = "D:/uitvoer/2024-06"
+#   stelsels_uit = ["L72", "WGS84"]
+#   validatie = true
+#
+#   [instellingen]
+#   stelsel_in = "UTM31"
+#   separator_uit = ";"
+#   decimal_uit = ","
+#   reductievlak_keuze = 1
+#
+# Alles wat niet in het bestand staat krijgt de standaardwaarde. Onbekende
+# sleutels geven een fout: een tikfout mag er niet toe leiden dat een
+# nachtelijke conversie stilletjes met de standaardwaarde loopt.
+#
+# TOML kent geen "leeg" (null): tegel_grootte = 0, geheugen_mb = 0, processen = 0 en
+# uitdunnen, sorteren, hoogte_in of hoogte_uit = "" betekenen daar "uit". Relatieve paden gelden ten
+# opzichte van de map van het profiel.
+#
+#   bestanden            : lijst met invoerbestanden (of gebruik invoer_map)
+#   invoer_map           : map die doorzocht wordt (zie batch_planner.bestanden_zoeken)
+#   patronen / recursief : welke bestanden uit de invoermap, ook in submappen
+#   uitvoer_map          : waar de uitvoer komt (mappenstructuur wordt nagebouwd)
+#   extensie             : extensie van de uitvoerbestanden, bijv. ".asc"
+#   uitvoer_compressie   : "" of ".gz", ".zst", ".xz": uitvoer ingepakt wegschrijven
+#   stelsels_uit         : uitvoerstelsels; leeg = enkel instellingen["stelsel_uit"]
+#   auto_formaat         : formaat per bestand detecteren
+#   validatie            : steekproef vooraf controleren op het werkgebied
+#   samenvatting         : .samenvatting.json per uitvoerbestand
+#   vooruit_bestanden    : aantal bestanden vooruit lezen (0 = uit)
+#   vooruit_mb           : maximaal aantal MB vooruit gelezen
+#   samenvoeg_naam       : naam van het samengevoegde bestand ("" = niet samenvoegen)
+#   bron_kolom           : bij samenvoegen de kolom "bron" toevoegen
+#   ontdubbelen          : dubbele punten verwijderen
+#   ontdubbel_tolerantie : hokgrootte voor "dezelfde positie" (0 = exact)
+#   logboek              : logboek (JSON Lines) en metrieken in de uitvoermap
+# -----------------------------------------------------------------------------
+PROFIEL_VERSIE = 1
+
+STANDAARD_OPTIES = {
+    "bestanden":            [],
+    "invoer_map":           "",
+    "patronen":             "*.xyz;*.txt;*.asc;*.csv;*.pts;*.cgp;*.xlsx;*.xlsm;*.gz;*.zst;*.xz",
+    "recursief":            True,
+    "uitvoer_map":          "",
+    "extensie":             ".asc",
+    "uitvoer_compressie":   "",
+    "stelsels_uit":         [],
+    "auto_formaat":         True,
+    "validatie":            True,
+    "samenvatting":         False,
+    "vooruit_bestanden":    VOORUIT_BESTANDEN,
+    "vooruit_mb":           VOORUIT_MAX_BYTES // (1024 * 1024),
+    "samenvoeg_naam":       "",
+    "bron_kolom":           False,
+    "ontdubbelen":          False,
+    "ontdubbel_tolerantie": 0.0,
+    "logboek":              False,
+}
+
+PROFIEL_EXTENSIES = (".json", ".toml")
+
+
+def profiel_maken(instellingen: dict, naam: str = "", **opties) -> dict:
+    # Volledig profiel uit instellingen en (een deel van de) batchopties.
+    # Ontbrekende waarden worden aangevuld en alles wordt gecontroleerd.
+    ruw = {"naam": naam, "instellingen": instellingen, **opties}
+    return _profiel_aanvullen(ruw, naam)
+
+
+def profiel_laden(pad) -> dict:
+    pad = Path(pad)
+    with open(pad, "rb") as f:
+        if pad.suffix.lower() == ".toml":
+            try:
+                import tomllib   # standaardbibliotheek vanaf Python 3.11
+            except ImportError:
+                raise ValueError("TOML-profielen vereisen Python 3.11 of nieuwer; "
+                                 "sla het profiel op als JSON.") from None
+            ruw = tomllib.load(f)
+        else:
+            ruw = json.load(f)
+    if not isinstance(ruw, dict):
+        raise ValueError(f"{pad.name}: een profiel moet een object met opties zijn.")
+
+    # Relatieve paden ten opzichte van de map van het profiel
+    basis = os.path.dirname(os.path.abspath(pad))
+    for sleutel in ("invoer_map", "uitvoer_map"):
+        if ruw.get(sleutel):
+            ruw[sleutel] = os.path.join(basis, ruw[sleutel])
+    if "bestanden" in ruw:
+        ruw["bestanden"] = [os.path.join(basis, bestand) for bestand in ruw["bestanden"]]
+    return _profiel_aanvullen(ruw, pad.stem)
+
+
+def profiel_opslaan(profiel: dict, pad):
+    # Altijd als JSON: de standaardbibliotheek kan TOML enkel lezen
+    if Path(pad).suffix.lower() != ".json":
+        raise ValueError("Een profiel kan enkel als .json opgeslagen worden.")
+    with open(pad, "w", encoding="utf-8") as f:
+        json.dump(profiel, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def _profiel_aanvullen(ruw: dict, naam: str) -> dict:
+    ruw = dict(ruw)
+    ruw.pop("versie", None)
+    naam = ruw.pop("naam", "") or naam
+    instellingen = ruw.pop("instellingen", {})
+
+    onbekend = sorted(set(ruw) - set(STANDAARD_OPTIES)) + \
+               sorted(f"instellingen.{s}" for s in set(instellingen) - set(STANDAARD_INSTELLINGEN))
+    if onbekend:
+        raise ValueError(f"Onbekende optie(s) in profiel {naam!r}: {', '.join(onbekend)}")
+
+    instellingen = {**STANDAARD_INSTELLINGEN, **instellingen}
+    instellingen["tegel_grootte"] = instellingen["tegel_grootte"] or None
+    instellingen["uitdunnen"] = instellingen["uitdunnen"] or None
+    instellingen["hoogte_in"] = instellingen["hoogte_in"] or None
+    instellingen["hoogte_uit"] = instellingen["hoogte_uit"] or None
+    instellingen["sorteren"] = instellingen["sorteren"] or None
+    instellingen["geheugen_mb"] = instellingen["geheugen_mb"] or None
+    instellingen["processen"] = instellingen["processen"] or None
+    opties = {**STANDAARD_OPTIES, **ruw}
+    if opties["bestanden"] and opties["invoer_map"]:
+        raise ValueError(f"Profiel {naam!r}: geef bestanden óf een invoer_map op, niet allebei.")
+    # Absolute paden: de submappen onder de invoermap worden ten opzichte
+    # ervan bepaald, en bestanden_zoeken geeft absolute paden terug
+    opties["bestanden"] = [os.path.abspath(bestand) for bestand in opties["bestanden"]]
+    for sleutel in ("invoer_map", "uitvoer_map"):
+        if opties[sleutel]:
+            opties[sleutel] = os.path.abspath(opties[sleutel])
+
+    # Eerste uitvoerstelsel = hoofdstelsel, zonder dubbels
+    stelsels = [instellingen["stelsel_uit"]] if not opties["stelsels_uit"] else []
+    for stelsel in opties["stelsels_uit"]:
+        if stelsel not in stelsels:
+            stelsels.append(stelsel)
+    opties["stelsels_uit"] = stelsels
+    instellingen["stelsel_uit"] = stelsels[0]
+
+    for stelsel in [instellingen["stelsel_in"]] + stelsels:
+        if stelsel not in CRS_CODES:
+            raise ValueError(f"Onbekend stelsel {stelsel!r} in profiel {naam!r}. "
+                             f"Mogelijk: {', '.join(CRS_CODES)}")
+    return {"versie": PROFIEL_VERSIE, "naam": naam, "instellingen": instellingen, **opties}
+
+
+# -----------------------------------------------------------------------------
+# Controle vóór het starten. Geeft een ValueError met een leesbare melding;
+# de GUI toont die in een venster, de opdrachtregel drukt ze af.
+# -----------------------------------------------------------------------------
+def profiel_controleren(profiel: dict):
+    instellingen = profiel["instellingen"]
+    if not profiel["bestanden"] and not profiel["invoer_map"]:
+        raise ValueError("Selecteer eerst invoerbestanden of een invoermap.")
+    if profiel["invoer_map"] and not Path(profiel["invoer_map"]).is_dir():
+        raise ValueError(f"Invoermap bestaat niet: {profiel['invoer_map']}")
+    if not profiel["uitvoer_map"]:
+        raise ValueError("Selecteer eerst een uitvoermap.")
+    if instellingen["tegel_grootte"] is not None and instellingen["tegel_grootte"] <= 0:
+        raise ValueError("Geef een tegelgrootte groter dan 0 op.")
+    if instellingen["tegel_grootte"] and profiel["extensie"] in (".parquet", ".gpkg"):
+        raise ValueError("Tegeluitvoer kan niet als Parquet of GeoPackage.")
+    if profiel["uitvoer_compressie"] and profiel["uitvoer_compressie"] not in COMPRESSIES:
+        raise ValueError(f"Onbekende compressie {profiel['uitvoer_compressie']!r}. "
+                         f"Mogelijk: {', '.join(COMPRESSIES)}")
+    if profiel["uitvoer_compressie"] and (instellingen["tegel_grootte"]
+                                         or profiel["extensie"] in (".parquet", ".gpkg")):
+        raise ValueError("Compressie kan niet samen met tegels, Parquet- of GeoPackage-uitvoer.")
+    if profiel["samenvoeg_naam"] and (instellingen["tegel_grootte"] or profiel["extensie"] == ".wkt"):
+        raise ValueError("Samenvoegen kan niet samen met tegels of WKT-uitvoer.")
+    if profiel["ontdubbelen"] and profiel["ontdubbel_tolerantie"] < 0:
+        raise ValueError("Ontdubbelen: geef een tolerantie van 0 of meer op.")
+    if profiel["vooruit_bestanden"] < 0 or profiel["vooruit_mb"] < 0:
+        raise ValueError("Vooruit lezen: geef gehele getallen van 0 of meer op.")
+    if instellingen["sorteren"] not in SORTEER_METHODES.values():
+        raise ValueError(f"Onbekende sorteermethode {instellingen['sorteren']!r}.")
+    if instellingen["geheugen_mb"] is not None and not isinstance(instellingen["geheugen_mb"], int):
+        raise ValueError("Geheugenbudget: geef een geheel aantal MB op.")
+    if instellingen["processen"] is not None and (not isinstance(instellingen["processen"], int)
+                                                  or instellingen["processen"] < 1):
+        raise ValueError("Processen: geef een geheel aantal van 1 of meer op.")
+    geheugen_verdeling(instellingen["geheugen_mb"], len(profiel["stelsels_uit"]), instellingen["processen"])
+    hoogte_controleren(instellingen)
+
+
+# =============================================================================
+# UITVOERBESTANDSNAAM
+# =============================================================================
+# Originele naam met de gekozen extensie, in de uitvoermap. Bij een invoermap
+# dezelfde submap onder de uitvoermap, bijv.
+#   <invoermap>/2024/zone_a/x.xyz → <uitvoermap>/2024/zone_a/x.asc
+# Bij meerdere uitvoerstelsels komt het stelsel in de naam: x_L72.asc, ...
+# Compressie van de invoer valt weg, die van de uitvoer komt er achter:
+#   x.xyz.gz → x.asc, of x.asc.zst met uitvoer_compressie = ".zst"
+# Bij een werkmap met meerdere werkbladen komt het blad in de naam, vóór het
+# stelsel: x.xlsx → x_Dag 1.asc, x_Dag 2_L72.asc, ...
+# -----------------------------------------------------------------------------
+def uitvoer_pad(input_pad, profiel: dict, stelsel=None, blad=None) -> str:
+    naam = zonder_compressie(input_pad).stem + blad_achtervoegsel(blad)
+    bron_map = profiel["invoer_map"]
+    submap = Path(input_pad).parent.relative_to(bron_map) if bron_map else Path()
+    return str(Path(profiel["uitvoer_map"]) / submap / (naam + stelsel_achtervoegsel(stelsel) +
+                                                         profiel["extensie"] + profiel["uitvoer_compressie"]))
+
+
+def blad_achtervoegsel(blad) -> str:
+    # Tekens die Windows niet toelaat in een bestandsnaam vervangen door "_"
+    if not blad:
+        return ""
+    return "_" + "".join("_" if teken in '<>:"/\\|?*' else teken for teken in blad).strip()
+
+
+def stelsel_achtervoegsel(stelsel) -> str:
+    return f"_{stelsel}" if stelsel else ""
+
+
+def getal_tekst(waarde) -> str:
+    # Geheel getal met punt als duizendtalscheiding: 1234567 → "1.234.567"
+    return f"{waarde:_.0f}".replace("_", ".")
+
+
+# =============================================================================
+# EEN TAAK UITVOEREN
+# =============================================================================
+# Verwerkt alle bestanden van een profiel na elkaar, met vooruit lezen en
+# schrijven op de achtergrond (batch_planner). Per bestand (bij een
+# Excel-werkmap: per werkblad, zie werkmap):
+#   1. formaat detecteren (auto_formaat)
+#   2. steekproef controleren (validatie); afwijkende bestanden worden
+#      "afgekeurd" en overgeslagen, de taak loopt verder
+#   3. één keer lezen en per uitvoerstelsel wegschrijven
+#   4. samenvatting (.samenvatting.json) per uitvoerbestand
+#
+# Samenvoegen: per uitvoerstelsel één doel (conversie_kern.uitvoer_doel) voor
+# alle bestanden, met één samenvatting en ontdubbeling over alles heen.
+#
+# Callbacks (allemaal optioneel, opgeroepen vanuit de thread van de taak):
+#   melden(index, status, detail) : status per bestand: "bezig", "klaar",
+#                                   "afgekeurd", "gestopt" of "fout"
+#   gevonden(pad)                 : bij een invoermap, per gevonden bestand
+#                                   (vóór het verwerkt wordt)
+# stop_event en voortgang werken zoals bij conversie_kern.conversie_een_bestand.
+#
+# Bij de eerste fout stopt de taak. Bij stoppen worden de onvolledige
+# uitvoerbestanden van het huidige bestand verwijderd.
+#
+# Geheugenbudget (instellingen["geheugen_mb"]): zie conversie_kern.
+# geheugen_verdeling. Het budget begrenst hier ook het vooruit lezen (bovenop
+# vooruit_mb) en de tekst die op de schrijf-thread wacht. Gaat het gemeten
+# geheugen tijdens een bestand toch boven het budget (bijv. door lange
+# puntnamen), dan krijgen de volgende bestanden telkens de helft van het
+# budget voor hun chunks, runs en sleutels, tot GEHEUGEN_MIN_KRIMP: trager,
+# maar de taak loopt verder.
+#
+# Met instellingen["processen"] > 1 transformeren werkprocessen de chunks
+# (zie procestransformatie): één groep voor alle uitvoerstelsels, die over
+# alle bestanden van de taak blijft draaien en op het einde van de taak
+# gestopt wordt. Met een geheugenbudget worden het er niet meer dan er in
+# het budget passen (zie conversie_kern.geheugen_verdeling), en hun
+# geheugen telt mee in piek_mb en in de controle op het budget.
+#
+# Met de optie logboek komt elk bestand (ook afgekeurd, gestopt of fout) als
+# regel in het logboek, met de metrieken op het einde (zie logboek).
+# Geeft een dictionary terug met het verloop:
+#   status        : "klaar", "gestopt" of "fout"
+#   totaal        : aantal (gevonden) invoerbestanden
+#   geconverteerd : lijst met de geconverteerde invoerbestanden
+#   afgekeurd     : aantal afgekeurde bestanden
+#   index         : bij stoppen of fout: welk bestand (0-gebaseerd)
+#   bestand / fout: bij een fout: het invoerbestand en de foutmelding
+#   samengevoegd  : paden van de samengevoegde bestanden
+#   piek_mb       : hoogste gemeten geheugengebruik van het proces en zijn
+#                   werkprocessen (None als dat op dit systeem niet te meten is)
+#   processen     : aantal werkprocessen waarmee de taak startte, binnen het
+#                   budget (None: transformatie in het hoofdproces)
+#   schrijf_wacht_s : hoe lang de conversie op de schrijf-thread wachtte
+#   duur_s        : totale duur
+# -----------------------------------------------------------------------------
+# Een bestand wordt afgekeurd als meer dan deze fractie van de steekproef
+# buiten het gebied van het invoerstelsel valt.
+VALIDATIE_MAX_AFWIJKEND = 0.05
+
+# Ondergrens voor het verkleinen van het budget na een overschrijding
+GEHEUGEN_MIN_KRIMP = 1 / 8
+MB = 1024 * 1024
+
+
+def _niets(*args):
+    pass
+
+
+def taak_uitvoeren(profiel: dict, melden=None, stop_event=None, voortgang=None, gevonden=None) -> dict:
+    melden = melden or _niets
+    start = time.perf_counter()
+    Path(profiel["uitvoer_map"]).mkdir(parents=True, exist_ok=True)
+
+    # Bij een invoermap groeit de lijst terwijl de bestanden gevonden worden
+    paden = list(profiel["bestanden"])
+    invoer = _gevonden_bestanden(profiel, paden, gevonden or _niets) if profiel["invoer_map"] else list(paden)
+
+    verdeling = geheugen_verdeling(profiel["instellingen"]["geheugen_mb"], len(profiel["stelsels_uit"]),
+                                   profiel["instellingen"]["processen"])
+    if profiel["vooruit_bestanden"]:
+        vooruit_bytes = profiel["vooruit_mb"] * MB
+        if verdeling["vooruit_bytes"] is not None:
+            vooruit_bytes = min(vooruit_bytes, verdeling["vooruit_bytes"])
+        bestanden = voorgelezen_bestanden(invoer, profiel["vooruit_bestanden"], vooruit_bytes)
+    else:
+        bestanden = ((bestand, None) for bestand in invoer)
+    # Schrijf-thread: bij vooruit lezen, en altijd bij compressie (het
+    # inpakken gebeurt dan in die thread, naast de conversie)
+    schrijver = None
+    if profiel["vooruit_bestanden"] or profiel["uitvoer_compressie"]:
+        schrijver = AchtergrondSchrijver(max_bytes=verdeling["schrijf_bytes"])
+    meter = GeheugenMeter()
+    logboek = None
+    if profiel["logboek"]:
+        opties = {sleutel: waarde for sleutel, waarde in profiel.items()
+                  if sleutel not in ("instellingen", "bestanden")}
+        logboek = logboek_openen(profiel["uitvoer_map"], profiel["naam"], profiel["instellingen"], opties)
+
+    # Samenvoegen: per uitvoerstelsel één doel, met eigen statistiek, ontdubbeling,
+    # uitdunning en sortering (over alle invoerbestanden samen, weggeschreven na
+    # het laatste)
+    samen = {}
+    if profiel["samenvoeg_naam"]:
+        meerdere = len(profiel["stelsels_uit"]) > 1
+        for stelsel in profiel["stelsels_uit"]:
+            naam = (profiel["samenvoeg_naam"] + stelsel_achtervoegsel(stelsel if meerdere else None) +
+                    profiel["extensie"] + profiel["uitvoer_compressie"])
+            samen[stelsel] = {
+                "doel":         uitvoer_doel(Path(profiel["uitvoer_map"]) / naam),
+                "statistiek":   statistiek_nieuw() if profiel["samenvatting"] else None,
+                "ontdubbeling": _ontdubbeling(profiel, stelsel, verdeling),
+                "uitdunning":   uitdunnen_nieuw(profiel["instellingen"]),
+                "sortering":    sorteren_nieuw({**profiel["instellingen"], "stelsel_uit": stelsel},
+                                               verdeling["sorteer_bytes"]),
+            }
+
+    resultaat = {"naam": profiel["naam"], "status": "klaar", "totaal": 0, "geconverteerd": [],
+                 "afgekeurd": 0, "index": None, "bestand": None, "fout": None,
+                 "samengevoegd": [str(gedeeld["doel"]["pad"]) for gedeeld in samen.values()]}
+    try:
+        _bestanden_verwerken(bestanden, paden, schrijver, samen, profiel, resultaat,
+                             melden, stop_event, voortgang, meter, logboek)
+    finally:
+        for gedeeld in samen.values():
+            if gedeeld["ontdubbeling"] is not None:
+                ontdubbelen_sluiten(gedeeld["ontdubbeling"])
+            if gedeeld["sortering"] is not None:
+                sorteren_sluiten(gedeeld["sortering"])
+            doel_afsluiten(gedeeld["doel"])
+        bestanden.close()   # asyncio-lus van de planner opruimen
+        if schrijver is not None:
+            schrijver.sluiten()
+        meter.sluiten()
+        procestransformers_sluiten()
+        if logboek is not None:
+            logboek_afsluiten(logboek, resultaat, meter.piek)
+
+    resultaat["totaal"] = len(paden)
+    resultaat["piek_mb"] = round(meter.piek / MB) if meter.piek is not None else None
+    resultaat["processen"] = verdeling["processen"]
+    resultaat["schrijf_wacht_s"] = round(schrijver.wachttijd, 3) if schrijver is not None else 0.0
+    resultaat["duur_s"] = round(time.perf_counter() - start, 3)
+    return resultaat
+
+
+def _gevonden_bestanden(profiel, paden, gevonden):
+    for pad in bestanden_zoeken(profiel["invoer_map"], profiel["patronen"],
+                                profiel["recursief"], profiel["uitvoer_map"]):
+        paden.append(pad)
+        gevonden(pad)
+        yield pad
+
+
+def _ontdubbeling(profiel, stelsel, verdeling):
+    if not profiel["ontdubbelen"]:
+        return None
+    return ontdubbelen_nieuw(stelsel, profiel["ontdubbel_tolerantie"], verdeling["ontdubbel_sleutels"])
+
+
+def _bron_label(bestand, profiel, blad=None):
+    # Naam van het bronbestand voor de kolom "bron"; bij een invoermap het
+    # relatieve pad, zodat gelijke namen in verschillende submappen uit elkaar blijven.
+    # Bij een werkmap met meerdere werkbladen komt het blad erachter: "a.xlsx:Dag 1".
+    if profiel["invoer_map"]:
+        label = Path(bestand).relative_to(profiel["invoer_map"]).as_posix()
+    else:
+        label = Path(bestand).name
+    return f"{label}:{blad}" if blad else label
+
+
+def _takken_maken(bestand, bestand_instellingen, samen, profiel, blad=None):
+    # Eén tak per uitvoerstelsel (zie conversie_kern.tak_nieuw). Zonder
+    # samenvoegen krijgt elke tak een eigen bestand, statistiek en ontdubbeling.
+    # blad: werkblad in de naam van het uitvoerbestand (werkmap met meerdere bladen)
+    stelsels = profiel["stelsels_uit"]
+    verdeling = geheugen_verdeling(bestand_instellingen["geheugen_mb"], len(stelsels),
+                                   bestand_instellingen["processen"])
+    takken = []
+    for stelsel in stelsels:
+        tak_instellingen = {**bestand_instellingen, "stelsel_uit": stelsel}
+        if samen:
+            gedeeld = samen[stelsel]
+            takken.append(tak_nieuw(tak_instellingen, gedeeld["doel"]["pad"], gedeeld["statistiek"],
+                                    gedeeld["doel"], gedeeld["ontdubbeling"], gedeeld["sortering"],
+                                    gedeeld["uitdunning"]))
+        else:
+            pad = uitvoer_pad(bestand, profiel, stelsel if len(stelsels) > 1 else None, blad)
+            takken.append(tak_nieuw(tak_instellingen, pad,
+                                    statistiek_nieuw() if profiel["samenvatting"] else None,
+                                    ontdubbeling=_ontdubbeling(profiel, stelsel, verdeling)))
+    return takken
+
+
+def _bestanden_verwerken(bestanden, paden, schrijver, samen, profiel, resultaat,
+                         melden, stop_event, voortgang, meter, logboek):
+    instellingen = profiel["instellingen"]
+    budget = instellingen["geheugen_mb"]
+    krimp = 1
+    start_taak = time.perf_counter()
+
+    for index, (bestand, data) in enumerate(bestanden):
+        takken = []
+        start_bestand = time.perf_counter()
+        verslagen = []
+        invoer_bytes = _invoer_grootte(bestand, data)
+        loggen = functools.partial(_bestand_loggen, logboek, bestand, start_bestand, invoer_bytes, verslagen, meter)
+        try:
+            melden(index, "bezig", "")
+            meter.bestand_starten()
+            geheugen_mb = max(GEHEUGEN_MIN_MB, round(budget * krimp)) if budget else None
+
+            # Een Excel-werkmap geeft één uitvoer per werkblad, met de naam
+            # van het blad in de bestandsnaam als er meer dan één is.
+            bladen = list(werkbladen(bestand, data)) if is_werkmap(bestand) else [None]
+            for blad in bladen:
+                verslagen.append(_invoer_converteren(bestand, blad, len(bladen) > 1, data, takken, samen,
+                                                     profiel, geheugen_mb, schrijver, stop_event, voortgang))
+            del data   # voorgelezen bytes niet langer vasthouden dan nodig
+
+            klaar = [verslag for verslag in verslagen if verslag["status"] == "klaar"]
+            if not klaar:
+                resultaat["afgekeurd"] += 1
+                melden(index, "afgekeurd", verslagen[0]["detail"])
+                loggen("afgekeurd", detail=verslagen[0]["detail"])
+                continue
+            resultaat["geconverteerd"].append(str(bestand))
+
+            # De cijfers van het hoofdstelsel (eerste tak), over alle werkbladen
+            dubbels = sum(verslag["dubbels"] or 0 for verslag in klaar)
+            buiten = sum(verslag["buiten"] for verslag in klaar)
+            detail = (f"{sum(verslag['duur'] for verslag in klaar):.1f} s, "
+                      f"{getal_tekst(sum(verslag['rijen'] for verslag in klaar))} rijen")
+            if len(bladen) > 1:
+                detail += f", {len(klaar)} werkbladen"
+            if len(profiel["stelsels_uit"]) > 1:
+                detail += f", {len(profiel['stelsels_uit'])} stelsels"
+            if dubbels:
+                detail += f", {getal_tekst(dubbels)} dubbel verwijderd"
+            if len(klaar) < len(verslagen):
+                detail += f", {len(verslagen) - len(klaar)} werkblad(en) afgekeurd"
+            if buiten:
+                # Binnen de tolerantie, maar toch even melden
+                detail += f", let op: {buiten} punten buiten gebied"
+            meter.meten()
+            if budget and meter.bestand_piek is not None and meter.bestand_piek > budget * MB:
+                # Boven het budget: de volgende bestanden voorzichtiger
+                krimp = max(krimp / 2, GEHEUGEN_MIN_KRIMP)
+                detail += f", geheugen {meter.bestand_piek // MB} MB boven budget: kleinere blokken"
+            melden(index, "klaar", detail)
+            loggen("klaar", detail=detail, dubbels=dubbels, buiten=buiten)
+
+        except ConversieGeannuleerd:
+            # Stoppen: de half geschreven uitvoerbestanden verwijderen zodat er
+            # nooit een onvolledig bestand op schijf achterblijft. Eerst de
+            # schrijf-thread laten afronden: die kan een bestand nog open hebben.
+            _opruimen(schrijver, samen, takken, instellingen)
+            melden(index, "gestopt", "")
+            loggen("gestopt")
+            resultaat.update(status="gestopt", index=index)
+            return
+
+        except Exception as e:
+            if schrijver is not None:
+                schrijver.wacht(fout_negeren=True)
+            melden(index, "fout", str(e))
+            loggen("fout", fout=f"{type(e).__name__}: {e}")
+            resultaat.update(status="fout", index=index, bestand=str(bestand), fout=str(e))
+            return   # niet verder met de rest
+
+    # Uitgedund of gesorteerd samenvoegen: pas nu, na het laatste bestand,
+    # alles wegschrijven (eerst de rastercellen, die ook gesorteerd worden)
+    try:
+        for stelsel, gedeeld in samen.items():
+            if gedeeld["uitdunning"] is not None:
+                uitdunnen_doel_afronden(gedeeld["uitdunning"], gedeeld["doel"],
+                                        {**instellingen, "stelsel_uit": stelsel}, gedeeld["statistiek"],
+                                        gedeeld["sortering"], schrijver)
+            if gedeeld["sortering"] is not None:
+                sorteren_doel_afronden(gedeeld["sortering"], gedeeld["doel"],
+                                       {**instellingen, "stelsel_uit": stelsel}, schrijver)
+    except Exception as e:
+        if schrijver is not None:
+            schrijver.wacht(fout_negeren=True)
+        resultaat.update(status="fout", index=max(len(paden) - 1, 0), bestand=str(gedeeld["doel"]["pad"]),
+                         fout=f"Samenvoegen afronden mislukt: {e}")
+        return
+
+    # Bij samenvoegen één samenvatting per samengevoegd bestand
+    for stelsel, gedeeld in samen.items():
+        if gedeeld["statistiek"] is not None and resultaat["geconverteerd"]:
+            statistiek_schrijven(gedeeld["statistiek"], gedeeld["doel"]["pad"], {
+                "invoer":      resultaat["geconverteerd"],
+                "uitvoer":     str(gedeeld["doel"]["pad"]),
+                "stelsel_in":  instellingen["stelsel_in"],
+                "stelsel_uit": stelsel,
+                "duur_s":      round(time.perf_counter() - start_taak, 3),
+                "dubbels_verwijderd": gedeeld["ontdubbeling"]["verwijderd"] if gedeeld["ontdubbeling"] else None,
+            })
+
+
+# -----------------------------------------------------------------------------
+# Eén invoer converteren: een bestand, of één werkblad (blad) van een
+# werkmap. De nieuwe takken komen bij in takken, zodat de oproeper bij
+# stoppen alles van het huidige bestand kan opruimen. Geeft een verslag
+# terug: status "klaar" (met rijen, dubbels, buiten en duur van het
+# hoofdstelsel) of "afgekeurd" (met de reden in detail).
+# -----------------------------------------------------------------------------
+def _invoer_converteren(bestand, blad, blad_in_naam, data, takken, samen, profiel, geheugen_mb,
+                        schrijver, stop_event, voortgang) -> dict:
+    instellingen = profiel["instellingen"]
+
+    # Formaat per bestand bepalen uit de eerste regels. Lukt dat
+    # niet, dan gelden de instellingen van het profiel.
+    bestand_instellingen = instellingen
+    is_cgp = zonder_compressie(bestand).suffix.lower() == ".cgp"
+    if profiel["auto_formaat"] and not is_cgp:
+        bestand_instellingen = formaat_toepassen(instellingen, formaat_detecteren(bestand, blad=blad))
+
+    # Controle vooraf op een steekproef: bestanden die duidelijk in
+    # een ander stelsel staan worden overgeslagen in plaats van
+    # volledig (en fout) geconverteerd. De taak loopt gewoon verder.
+    controle = None
+    if profiel["validatie"] and not is_cgp:
+        controle = steekproef_controleren(bestand, bestand_instellingen, blad)
+        afwijkend = controle["buiten"] + controle["niet_eindig"]
+        if afwijkend > VALIDATIE_MAX_AFWIJKEND * max(controle["aantal"], 1):
+            return {"status": "afgekeurd", "formaat": _formaat(bestand_instellingen),
+                    "detail": f"{afwijkend}/{controle['aantal']} punten buiten gebied {instellingen['stelsel_in']}"}
+
+    if geheugen_mb != instellingen["geheugen_mb"]:
+        bestand_instellingen = {**bestand_instellingen, "geheugen_mb": geheugen_mb}
+    naam_blad = blad if blad_in_naam else None
+    nieuwe_takken = _takken_maken(bestand, bestand_instellingen, samen, profiel, naam_blad)
+    takken.extend(nieuwe_takken)
+    for tak in nieuwe_takken:
+        Path(tak["output_pad"]).parent.mkdir(parents=True, exist_ok=True)
+    bron_label = _bron_label(bestand, profiel, naam_blad) if samen and profiel["bron_kolom"] else None
+    verwijderd_voor = [tak["ontdubbeling"]["verwijderd"] if tak["ontdubbeling"] else 0 for tak in nieuwe_takken]
+
+    start = time.perf_counter()
+    try:
+        rijen = conversie_meerdere_stelsels(bestand, nieuwe_takken, voortgang, stop_event,
+                                            data, schrijver, bron_label, blad)
+    finally:
+        if not samen:
+            for tak in nieuwe_takken:
+                if tak["ontdubbeling"] is not None:
+                    ontdubbelen_sluiten(tak["ontdubbeling"])
+    duur = time.perf_counter() - start
+    dubbels = [tak["ontdubbeling"]["verwijderd"] - voor if tak["ontdubbeling"] else None
+               for tak, voor in zip(nieuwe_takken, verwijderd_voor)]
+
+    if not samen:
+        for tak, tak_dubbels in zip(nieuwe_takken, dubbels):
+            if tak["statistiek"] is not None:
+                statistiek_schrijven(tak["statistiek"], tak["output_pad"], {
+                    "invoer":      str(bestand),
+                    **({"werkblad": blad} if blad is not None else {}),
+                    "uitvoer":     str(tak["output_pad"]),
+                    "stelsel_in":  instellingen["stelsel_in"],
+                    "stelsel_uit": tak["instellingen"]["stelsel_uit"],
+                    "duur_s":      round(duur, 3),
+                    "controle":    controle,
+                    "dubbels_verwijderd": tak_dubbels,
+                })
+
+    return {"status": "klaar", "rijen": rijen[0], "dubbels": dubbels[0], "duur": duur,
+            "buiten": controle["buiten"] + controle["niet_eindig"] if controle else 0,
+            "formaat": _formaat(bestand_instellingen)}
+
+
+def _bestand_loggen(logboek, bestand, start, invoer_bytes, verslagen, meter, status, **gegevens):
+    # Eén regel in het logboek (als dat aanstaat), met de cijfers van alle werkbladen
+    if logboek is None:
+        return
+    klaar = [verslag for verslag in verslagen if verslag["status"] == "klaar"]
+    logboek_bestand(logboek, bestand, status, time.perf_counter() - start, invoer_bytes,
+                    rijen=sum(verslag["rijen"] for verslag in klaar) if klaar else None,
+                    formaat=verslagen[0]["formaat"] if verslagen else None,
+                    werkbladen=len(verslagen) if len(verslagen) > 1 else None,
+                    piek_mb=meter.bestand_piek // MB if meter.bestand_piek is not None else None,
+                    **gegevens)
+
+
+def _formaat(instellingen):
+    # Het invoerformaat dat voor een bestand gebruikt werd (na detectie)
+    return {sleutel: instellingen[sleutel] for sleutel in ("separator_in", "decimal_in", "titelrij_in", "naam_kolom")}
+
+
+def _invoer_grootte(bestand, data):
+    if data is not None:
+        return len(data)
+    try:
+        return Path(bestand).stat().st_size
+    except OSError:
+        return None
+
+
+def _opruimen(schrijver, samen, takken, instellingen):
+    if schrijver is not None:
+        schrijver.wacht(fout_negeren=True)
+    for gedeeld in samen.values():
+        doel_afsluiten(gedeeld["doel"])   # samengevoegd bestand is onvolledig: ook weg
+    for tak in takken:
+        Path(tak["output_pad"]).unlink(missing_ok=True)
+        if instellingen["tegel_grootte"]:
+            shutil.rmtree(tegel_map(tak["output_pad"]), ignore_errors=True)
+
+
+# -----------------------------------------------------------------------------
+# Korte samenvatting van een resultaat, voor het statuslabel en de opdrachtregel
+# -----------------------------------------------------------------------------
+def resultaat_tekst(resultaat: dict) -> str:
+    positie = f"{(resultaat['index'] or 0) + 1}/{resultaat['totaal']}"
+    if resultaat["status"] == "gestopt":
+        return f"Gestopt bij bestand {positie}"
+    if resultaat["status"] == "fout":
+        return f"Fout bij bestand {positie}"
+    tekst = f"Klaar! {len(resultaat['geconverteerd'])}/{resultaat['totaal']} bestanden geconverteerd."
+    if resultaat["samengevoegd"]:
+        tekst += f" Samengevoegd in {', '.join(Path(p).name for p in resultaat['samengevoegd'])}."
+    if resultaat["afgekeurd"]:
+        tekst += f" {resultaat['afgekeurd']} afgekeurd."
+    if resultaat["piek_mb"] is not None:
+        tekst += f" Piek geheugen {getal_tekst(resultaat['piek_mb'])} MB"
+        tekst += f" (met {resultaat['processen']} werkprocessen)." if resultaat.get("processen") else "."
+    return tekst
+
+
+# =============================================================================
+# WACHTRIJ: MEERDERE TAKEN NA ELKAAR
+# =============================================================================
+# profielen: lijst met paden naar profielen (of mappen met profielen), of
+# al geladen profiel-dictionaries. Een taak die niet geladen kan worden of
+# die met een fout eindigt, stopt de wachtrij niet: de volgende taak start
+# gewoon. Enkel stoppen (stop_event, Ctrl+C) beëindigt de hele wachtrij.
+#
+# melden(taak, index, status, detail): zoals bij taak_uitvoeren, met de
+# naam van de taak erbij. Geeft per taak het resultaat terug.
+# -----------------------------------------------------------------------------
+def profielen_zoeken(paden) -> list:
+    # Mappen vervangen door de profielen erin, alfabetisch
+    gevonden = []
+    for pad in paden:
+        pad = Path(pad)
+        if pad.is_dir():
+            gevonden += sorted(p for p in pad.iterdir() if p.suffix.lower() in PROFIEL_EXTENSIES)
+        else:
+            gevonden.append(pad)
+    return gevonden
+
+
+def wachtrij_uitvoeren(profielen, melden=None, stop_event=None, voortgang=None) -> list:
+    melden = melden or _niets
+    resultaten = []
+    for profiel in profielen:
+        if stop_event is not None and stop_event.is_set():
+            break
+        naam = profiel["naam"] if isinstance(profiel, dict) else Path(profiel).stem
+        try:
+            if not isinstance(profiel, dict):
+                profiel = profiel_laden(profiel)
+                naam = profiel["naam"]
+            profiel_controleren(profiel)
+            resultaat = taak_uitvoeren(profiel, lambda index, status, detail: melden(naam, index, status, detail),
+                                       stop_event, voortgang)
+        except Exception as e:
+            resultaat = {"naam": naam, "status": "fout", "totaal": 0, "geconverteerd": [], "afgekeurd": 0,
+                         "index": None, "bestand": None, "fout": str(e), "samengevoegd": [],
+                         "piek_mb": None, "processen": None, "schrijf_wacht_s": 0.0, "duur_s": 0}
+        resultaten.append(resultaat)
+    return resultaten
+
+
+# =============================================================================
+# OPDRACHTREGEL
+# =============================================================================
+#   python batch_taak.py taak.json [taak2.toml ...] [map_met_taken]
+#   python batch_taak.py --controleer taak.json
+#
+# Afsluitcode 0 als alle taken zonder fout liepen, anders 1 (handig voor de
+# Taakplanner of een script). Ctrl+C stopt na het huidige blok en ruimt het
+# onvolledige bestand op, net als de Stop-knop in de GUI.
+# -----------------------------------------------------------------------------
+def _regel_melden(taak, index, status, detail):
+    if status != "bezig":
+        print(f"[{taak}] {index + 1}: {status}{' ' + detail if detail else ''}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batchtaken (profielen) uitvoeren zonder GUI")
+    parser.add_argument("profielen", nargs="+", help="profielen (.json/.toml) of mappen met profielen")
+    parser.add_argument("--controleer", action="store_true",
+                        help="enkel de profielen laden en controleren, niets converteren")
+    args = parser.parse_args()
+
+    paden = profielen_zoeken(args.profielen)
+    if not paden:
+        parser.error("geen profielen gevonden")
+
+    if args.controleer:
+        fouten = 0
+        for pad in paden:
+            try:
+                profiel_controleren(profiel_laden(pad))
+                print(f"{pad}: in orde")
+            except Exception as e:
+                fouten += 1
+                print(f"{pad}: {e}")
+        sys.exit(1 if fouten else 0)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+
+    resultaten = wachtrij_uitvoeren(paden, _regel_melden, stop_event)
+    for resultaat in resultaten:
+        tekst = resultaat_tekst(resultaat) if resultaat["totaal"] else resultaat["fout"] or "Geen bestanden."
+        if resultaat["bestand"]:
+            tekst += f": {Path(resultaat['bestand']).name}: {resultaat['fout']}"
+        print(f"[{resultaat['naam']}] {tekst} ({resultaat['duur_s']:.1f} s)")
+    sys.exit(0 if all(r["status"] == "klaar" for r in resultaten) and len(resultaten) == len(paden) else 1)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()   # als .exe: werkprocessen starten hier, niet main()
+    main()
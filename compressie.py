@@ -0,0 +1,177 @@
+# =============================================================================
+# GECOMPRIMEERDE INVOER EN UITVOER (gzip, zstd, xz)
+# =============================================================================
+# Gearchiveerde peilingen staan als .xyz.gz of .xyz.zst op de server, en
+# leveringen moeten ook gecomprimeerd vertrekken. In plaats van eerst uit te
+# pakken naar schijf, te converteren en daarna opnieuw in te pakken (drie keer
+# alle bytes over de schijf) wordt hier tijdens het streamen zelf in- en
+# uitgepakt. Het soort compressie volgt uit de laatste extensie:
+#   .gz  → gzip  (standaardbibliotheek)
+#   .xz  → xz    (standaardbibliotheek, lzma)
+#   .zst → zstd  (vereist het pakket zstandard, pas geïmporteerd als nodig)
+#
+# Inlezen: invoer_openen() geeft een binaire stroom met de uitgepakte bytes.
+# Het uitpakken gebeurt in een eigen thread die ONTPAK_VOORUIT blokken
+# voorloopt, zodat het overlapt met het ontleden en transformeren. zlib, lzma
+# en zstd geven de GIL vrij tijdens het (uit)pakken, dus dat loopt echt
+# gelijktijdig.
+#
+# Wegschrijven: uitvoer_openen() opent een bestand waarin alles wat
+# geschreven wordt meteen ingepakt wordt. De batch doet dat in de schrijf-
+# thread (batch_planner.AchtergrondSchrijver), zodat ook het inpakken
+# overlapt met de conversie. Bij 'a' (toevoegen) komt er een nieuw
+# gzip-lid/zstd-frame/xz-stroom achteraan; dat is voor alle drie een geldig
+# bestand en wordt bij het lezen als één geheel uitgepakt.
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   gzip / lzma : gzip- en xz-compressie uit de standaardbibliotheek
+#   io          : uitgepakte blokken als leesbare stroom aanbieden
+#   queue       : begrensde wachtrij tussen uitpak-thread en lezer
+#   threading   : aparte thread voor het uitpakken
+#   pathlib     : extensies bepalen
+# -----------------------------------------------------------------------------
+import gzip
+import io
+import lzma
+import queue
+import threading
+from pathlib import Path
+
+
+COMPRESSIES = {".gz": "gzip", ".zst": "zstd", ".xz": "xz"}
+
+# Uitpakken: blokgrootte en hoeveel blokken de uitpak-thread mag voorlopen
+ONTPAK_BLOK = 1024 * 1024
+ONTPAK_VOORUIT = 8
+
+# Inpakniveaus: snel genoeg om de conversie niet op te houden, en toch een
+# veel kleiner bestand (coördinatentekst pakt typisch 3 à 5 keer in).
+GZIP_NIVEAU = 6
+ZSTD_NIVEAU = 3
+XZ_NIVEAU = 3
+
+
+def compressie(pad):
+    # "gzip", "zstd", "xz" of None voor een gewoon bestand
+    return COMPRESSIES.get(Path(pad).suffix.lower())
+
+
+def zonder_compressie(pad) -> Path:
+    # meting.xyz.gz → meting.xyz (gewone bestanden blijven ongewijzigd)
+    pad = Path(pad)
+    return pad.with_suffix("") if compressie(pad) else pad
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Voor .zst-bestanden is het pakket zstandard nodig.") from None
+    return zstandard
+
+
+def ontpakker(ruw, soort: str):
+    # Uitpakkende stroom rond een binair bestand (of BytesIO)
+    if soort == "gzip":
+        return gzip.GzipFile(fileobj=ruw, mode="rb")
+    if soort == "xz":
+        return lzma.LZMAFile(ruw, "rb")
+    return _zstandard().ZstdDecompressor().stream_reader(ruw, read_across_frames=True, closefd=False)
+
+
+# -----------------------------------------------------------------------------
+# Uitpakken in een eigen thread. De lezer (pandas) vraagt bytes op via
+# readinto(); de thread vult intussen de wachtrij met de volgende blokken.
+# Een fout tijdens het uitpakken (beschadigd bestand) wordt bij het lezen
+# opnieuw opgeworpen, zodat ze bij het juiste bestand gemeld wordt.
+# -----------------------------------------------------------------------------
+class _OntpakStroom(io.RawIOBase):
+    _EINDE = b""
+
+    def __init__(self, ruw, soort: str):
+        self._ruw = ruw
+        self._bron = ontpakker(ruw, soort)
+        self._wachtrij = queue.Queue(maxsize=ONTPAK_VOORUIT)
+        self._stop = threading.Event()
+        self._blok, self._positie = b"", 0
+        self._thread = threading.Thread(target=self._uitpakken, daemon=True)
+        self._thread.start()
+
+    def _uitpakken(self):
+        try:
+            while not self._stop.is_set():
+                blok = self._bron.read(ONTPAK_BLOK)
+                self._wachtrij.put(blok)
+                if not blok:
+                    return
+        except Exception as e:
+            self._wachtrij.put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._blok is None:
+            return 0   # einde al bereikt
+        if self._positie >= len(self._blok):
+            item = self._wachtrij.get()
+            if isinstance(item, Exception):
+                self._wachtrij.put(item)   # ook bij een volgende poging opnieuw melden
+                raise item
+            if not item:
+                self._blok = None
+                return 0
+            self._blok, self._positie = item, 0
+        n = min(len(buffer), len(self._blok) - self._positie)
+        buffer[:n] = self._blok[self._positie:self._positie + n]
+        self._positie += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            # De thread kan wachten op een volle wachtrij: leegmaken tot hij stopt
+            self._stop.set()
+            while self._thread.is_alive():
+                try:
+                    self._wachtrij.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._bron.close()
+            self._ruw.close()
+        super().close()
+
+
+def invoer_openen(pad, data=None):
+    # Geeft (stroom, ruw) terug: stroom levert de uitgepakte bytes, ruw is het
+    # bestand zelf. ruw.tell() zegt hoeveel bytes van schijf gelezen zijn
+    # (voor de MB/s-weergave). data: al vooruit gelezen bytes van het bestand.
+    # Sluiten van de stroom sluit ook het bestand.
+    ruw = open(pad, "rb") if data is None else io.BytesIO(data)
+    soort = compressie(pad)
+    if soort is None:
+        return ruw, ruw
+    try:
+        return io.BufferedReader(_OntpakStroom(ruw, soort), ONTPAK_BLOK), ruw
+    except Exception:
+        ruw.close()
+        raise
+
+
+def uitvoer_openen(pad, mode: str = "w"):
+    # Binair bestand om naar te schrijven ('w' nieuw, 'a' toevoegen), met
+    # compressie volgens de extensie.
+    soort = compressie(pad)
+    if soort == "gzip":
+        return gzip.open(pad, mode + "b", compresslevel=GZIP_NIVEAU)
+    if soort == "xz":
+        return lzma.open(pad, mode + "b", preset=XZ_NIVEAU)
+    if soort == "zstd":
+        bestand = open(pad, mode + "b")
+        try:
+            return _zstandard().ZstdCompressor(level=ZSTD_NIVEAU).stream_writer(bestand)
+        except Exception:
+            bestand.close()
+            raise
+    return open(pad, mode + "b")
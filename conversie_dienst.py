@@ -0,0 +1,292 @@
+# =============================================================================
+# LOKALE CONVERSIEDIENST (HTTP)
+# =============================================================================
+# Langlopende dienst die coördinaten converteert op vraag van andere
+# programma's (webportaal, scripts). Een nieuw Python-proces per conversie
+# starten kost door het laden van pandas en pyproj meer tijd dan de
+# conversie zelf; deze dienst laadt alles één keer en houdt per stelselpaar
+# kant-en-klare ("warme") Transformer-objecten bij.
+#
+# De eigenlijke conversie gebeurt met dezelfde code als de batchversie
+# (conversie_kern.verwerk_chunk), dus afronding, diepte omdraaien en
+# reductievlakcorrectie geven exact hetzelfde resultaat.
+#
+# Starten:   python conversie_dienst.py --poort 8750
+#
+# Eindpunten:
+#   GET  /stelsels  → JSON met de beschikbare stelsels en hun EPSG-code
+#   POST /punten    → JSON in, JSON uit. Voor kleine aantallen punten.
+#       {"van": "L72", "naar": "WGS84", "punten": [[x, y], [x, y, z], ...],
+#        "point_id": false, "diepte": false,
+#        "reductievlak_keuze": 0, "reductievlak_waarde": 0}
+#       → {"kolommen": ["LAT", "LON", "Z"], "punten": [[...], ...]}
+#   POST /bestand?van=L72&naar=WGS84&invoer=...&uitvoer=...
+#       De body is de inhoud van een tekstbestand (zoals de batchversie
+#       inleest). Het antwoord is het geconverteerde bestand, gestreamd in
+#       blokken van CHUNK_RIJEN rijen (Transfer-Encoding: chunked), zodat
+#       ook grote bestanden nooit volledig in het geheugen staan.
+#       Parameters (allemaal optioneel):
+#         invoer / uitvoer : label uit de scheidingsteken-dropdown
+#         titelrij_in      : 1 = eerste rij overslaan
+#         titelrij_uit     : 0 = geen kolomnamen in het antwoord
+#         point_id, diepte, reductievlak_keuze, reductievlak_waarde
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   argparse       : opdrachtregelopties (host en poort)
+#   contextlib     : contextmanager om een Transformer te lenen en terug te geven
+#   io             : begrensde invoerstroom voor de bestandsupload
+#   json           : verzoeken en antwoorden van /punten en /stelsels
+#   queue          : wachtrij met vrije Transformers per stelselpaar
+#   http.server    : de HTTP-server uit de standaardbibliotheek (één thread per verbinding)
+#   urllib.parse   : parameters uit de URL halen
+#   pandas         : tabel opbouwen voor verwerk_chunk en CSV lezen/schrijven
+#   conversie_kern : de gedeelde conversielogica
+# -----------------------------------------------------------------------------
+import argparse
+import contextlib
+import io
+import json
+import queue
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+from conversie_kern import (CRS_CODES, HEADERS, SCHEIDINGSTEKENS, STANDAARD_INSTELLINGEN,
+                            CHUNK_RIJEN, transformer_maken, verwerk_chunk)
+
+
+# =============================================================================
+# WARME TRANSFORMERS PER STELSELPAAR
+# =============================================================================
+# Een pyproj Transformer mag niet door twee threads tegelijk gebruikt worden.
+# Daarom heeft elk stelselpaar een wachtrij met vrije Transformers: een
+# verzoek leent er één, gebruikt ze en geeft ze daarna terug. Is de wachtrij
+# leeg (alle exemplaren in gebruik), dan wordt er een extra aangemaakt die
+# na afloop ook in de wachtrij belandt. De pool groeit zo vanzelf tot het
+# aantal gelijktijdige verzoeken en maakt daarna niets nieuws meer aan.
+# -----------------------------------------------------------------------------
+_transformer_pool = {}   # (stelsel_in, stelsel_uit) → queue.SimpleQueue
+
+
+def pool_opwarmen():
+    # Bij het starten van de dienst voor elk paar uit CRS_CODES één Transformer
+    # aanmaken, zodat ook het eerste verzoek geen opstartkost heeft.
+    for stelsel_in in CRS_CODES:
+        for stelsel_uit in CRS_CODES:
+            with geleende_transformer(stelsel_in, stelsel_uit):
+                pass
+
+
+@contextlib.contextmanager
+def geleende_transformer(stelsel_in: str, stelsel_uit: str):
+    # dict.setdefault is atomair: twee threads krijgen dezelfde wachtrij
+    wachtrij = _transformer_pool.setdefault((stelsel_in, stelsel_uit), queue.SimpleQueue())
+    try:
+        transformer = wachtrij.get_nowait()
+    except queue.Empty:
+        transformer = transformer_maken(stelsel_in, stelsel_uit)
+    try:
+        yield transformer
+    finally:
+        wachtrij.put(transformer)
+
+
+# =============================================================================
+# INSTELLINGEN UIT EEN VERZOEK
+# =============================================================================
+# Zet de parameters van een verzoek om naar de instellingen-dictionary van
+# conversie_kern. Onbekende stelsels of scheidingstekens geven een ValueError,
+# die de handler als "400 Bad Request" terugstuurt.
+# -----------------------------------------------------------------------------
+def _ja(waarde) -> bool:
+    return str(waarde).lower() in ("1", "true", "ja", "yes")
+
+
+def instellingen_uit_verzoek(parameters: dict) -> dict:
+    stelsel_in, stelsel_uit = parameters.get("van"), parameters.get("naar")
+    if stelsel_in not in CRS_CODES or stelsel_uit not in CRS_CODES:
+        raise ValueError(f"Kies 'van' en 'naar' uit: {', '.join(CRS_CODES)}")
+
+    invoer = parameters.get("invoer", "spatie(decimaal punt)")
+    uitvoer = parameters.get("uitvoer", "komma(decimaal punt)")
+    if invoer not in SCHEIDINGSTEKENS or uitvoer not in SCHEIDINGSTEKENS:
+        raise ValueError(f"Kies 'invoer' en 'uitvoer' uit: {', '.join(SCHEIDINGSTEKENS)}")
+
+    return {
+        **STANDAARD_INSTELLINGEN,
+        "stelsel_in":          stelsel_in,
+        "stelsel_uit":         stelsel_uit,
+        "separator_in":        SCHEIDINGSTEKENS[invoer][0],
+        "decimal_in":          SCHEIDINGSTEKENS[invoer][1],
+        "separator_uit":       SCHEIDINGSTEKENS[uitvoer][0],
+        "decimal_uit":         SCHEIDINGSTEKENS[uitvoer][1],
+        "titelrij_in":         _ja(parameters.get("titelrij_in", False)),
+        "titelrij_uit":        _ja(parameters.get("titelrij_uit", True)),
+        "naam_kolom":          _ja(parameters.get("point_id", False)),
+        "diepte":              _ja(parameters.get("diepte", False)),
+        "reductievlak_keuze":  int(parameters.get("reductievlak_keuze", 0)),
+        "reductievlak_waarde": int(parameters.get("reductievlak_waarde", 0)),
+    }
+
+
+# -----------------------------------------------------------------------------
+# Leest hoogstens "lengte" bytes uit de socket en meldt daarna einde-bestand.
+# Zonder deze begrenzing zou pandas blijven wachten op meer data, want bij
+# HTTP/1.1 blijft de verbinding na het verzoek open.
+# -----------------------------------------------------------------------------
+class _BegrensdeInvoer(io.RawIOBase):
+    def __init__(self, bron, lengte: int):
+        self.bron = bron
+        self.resterend = lengte
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.resterend <= 0:
+            return 0
+        data = self.bron.read(min(len(buffer), self.resterend))
+        self.resterend -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+# =============================================================================
+# HTTP-HANDLER
+# =============================================================================
+# ThreadingHTTPServer roept per verzoek een methode van deze klasse op, elk
+# in een eigen thread. protocol_version HTTP/1.1 houdt de verbinding open
+# tussen verzoeken (keep-alive): bij veel kleine verzoeken scheelt dat een
+# nieuwe TCP-verbinding per conversie.
+# -----------------------------------------------------------------------------
+class ConversieHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _json_antwoord(self, status: int, inhoud: dict):
+        data = json.dumps(inhoud, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/stelsels":
+            self._json_antwoord(200, {"stelsels": CRS_CODES})
+        else:
+            self._json_antwoord(404, {"fout": "Onbekend eindpunt"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        lengte = int(self.headers.get("Content-Length", 0))
+        try:
+            if url.path == "/punten":
+                self._punten(json.loads(self.rfile.read(lengte) or b"{}"))
+            elif url.path == "/bestand":
+                parameters = {k: v[0] for k, v in parse_qs(url.query).items()}
+                self._bestand(parameters, lengte)
+            else:
+                self.rfile.read(lengte)   # body weggooien, verbinding blijft bruikbaar
+                self._json_antwoord(404, {"fout": "Onbekend eindpunt"})
+        except (ValueError, KeyError, TypeError) as e:
+            # De body is mogelijk niet volledig gelezen: verbinding niet hergebruiken
+            self.close_connection = True
+            self._json_antwoord(400, {"fout": str(e)})
+        except Exception as e:
+            # Fout in de dienst zelf (bijv. pyproj of de conversiekern): de
+            # client krijgt toch een antwoord in plaats van een verbroken verbinding
+            self.close_connection = True
+            self._json_antwoord(500, {"fout": f"{type(e).__name__}: {e}"})
+
+    def _punten(self, verzoek: dict):
+        instellingen = instellingen_uit_verzoek(verzoek)
+        chunk = pd.DataFrame(verzoek.get("punten", []))
+        if chunk.empty:
+            raise ValueError("Geen punten meegegeven")
+
+        with geleende_transformer(instellingen["stelsel_in"], instellingen["stelsel_uit"]) as transformer:
+            df_output = verwerk_chunk(chunk, transformer, instellingen)
+
+        # NaN/inf (bijv. punt buiten het geldige gebied) is geen geldige JSON → null
+        df_output = df_output.astype(object).where(df_output.map(_is_eindig), None)
+        self._json_antwoord(200, {"kolommen": list(df_output.columns),
+                                  "punten": df_output.values.tolist()})
+
+    def _bestand(self, parameters: dict, lengte: int):
+        instellingen = instellingen_uit_verzoek(parameters)
+        invoer = io.TextIOWrapper(io.BufferedReader(_BegrensdeInvoer(self.rfile, lengte)),
+                                  encoding="utf-8", errors="replace")
+        chunk_iter = pd.read_csv(invoer, delimiter=instellingen["separator_in"],
+                                 decimal=instellingen["decimal_in"], header=None,
+                                 skiprows=1 if instellingen["titelrij_in"] else 0,
+                                 chunksize=CHUNK_RIJEN)
+
+        # De eerste chunk inlezen en converteren vóór de antwoordkop verstuurd
+        # wordt: een fout in het formaat kan dan nog als "400" gemeld worden.
+        with geleende_transformer(instellingen["stelsel_in"], instellingen["stelsel_uit"]) as transformer:
+            try:
+                eerste = verwerk_chunk(next(chunk_iter), transformer, instellingen)
+            except StopIteration:
+                eerste = pd.DataFrame(columns=HEADERS[instellingen["stelsel_uit"]])
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            try:
+                self._blok_schrijven(eerste, instellingen, instellingen["titelrij_uit"])
+                for chunk in chunk_iter:
+                    self._blok_schrijven(verwerk_chunk(chunk, transformer, instellingen),
+                                         instellingen, False)
+            except Exception:
+                # De status 200 is al verstuurd: de verbinding afbreken zonder
+                # afsluitend leeg blok, zodat de client weet dat het antwoord
+                # onvolledig is.
+                self.close_connection = True
+                return
+        self.wfile.write(b"0\r\n\r\n")   # einde van het gestreamde antwoord
+
+    def _blok_schrijven(self, df_output: pd.DataFrame, instellingen: dict, titelrij: bool):
+        data = df_output.to_csv(index=False, sep=instellingen["separator_uit"],
+                                decimal=instellingen["decimal_uit"], header=titelrij).encode("utf-8")
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+    def log_message(self, format, *args):
+        # Standaard schrijft BaseHTTPRequestHandler elke oproep naar stderr;
+        # bij duizenden kleine verzoeken vertraagt dat enkel.
+        pass
+
+
+def _is_eindig(waarde) -> bool:
+    return not isinstance(waarde, float) or (waarde == waarde and abs(waarde) != float("inf"))
+
+
+# =============================================================================
+# STARTEN
+# =============================================================================
+# Standaard enkel bereikbaar vanaf de eigen machine (127.0.0.1).
+# daemon_threads: lopende verzoeken houden het afsluiten (Ctrl+C) niet tegen.
+# -----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Lokale coördinaat-conversiedienst")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--poort", type=int, default=8750)
+    args = parser.parse_args()
+
+    pool_opwarmen()
+    server = ThreadingHTTPServer((args.host, args.poort), ConversieHandler)
+    server.daemon_threads = True
+    print(f"Conversiedienst actief op http://{args.host}:{args.poort}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2094 @@
+# =============================================================================
+# CONVERSIE KERN
+# =============================================================================
+# Gedeelde hulpfuncties voor de single- en de batchversie van de converter.
+# Deze module bevat GEEN Tkinter-code: alles werkt met gewone paden en
+# waarden, zodat beide GUI's en de conversiedienst dezelfde logica gebruiken
+# in plaats van elk een eigen kopie.
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   codecs    : bekende BOM-reeksen (byte order mark) om de codering te herkennen
+#   functools : lru_cache om opgezochte CRS-gegevens te onthouden
+#   hashlib   : naam van een correctieraster in de cache (versie + definitie)
+#   io        : uitgepakt CGP-bestand als tekst lezen (TextIOWrapper)
+#   itertools : eerste rijen van een werkblad nemen (islice)
+#   json      : wegschrijven van de samenvatting per bestand
+#   numpy     : snelle berekeningen op de coördinaatkolommen (min/max, NaN, inf)
+#   os        : cachemap van de correctierasters bepalen, bestand atomair vervangen
+#   sys       : map van de meegeleverde geoïderasters (ook in de .exe)
+#   pandas    : inlezen van een steekproef uit het invoerbestand
+#   pyproj    : coördinatenconversie en gebruiksgebied van een CRS (en de
+#               PROJ-versie, die mee in de naam van een correctieraster zit)
+#   pathlib   : objectgeoriënteerde bestandspaden
+#   shutil    : tijdelijke map van het ontdubbelen opruimen
+#   tempfile  : tijdelijke map voor sleutels die niet meer in het geheugen passen
+#   shapely   : geometrie-bewerkingen (hier: WKT polygon export)
+#   compressie: gecomprimeerde invoer en uitvoer (.gz, .zst, .xz) streamen
+#   werkmap   : Excel-werkmappen blad per blad inlezen
+#   geopackage: uitvoer als GeoPackage (punten met ruimtelijke index)
+#   procestransformatie: transformeren in meerdere werkprocessen
+# -----------------------------------------------------------------------------
+import codecs
+import functools
+import hashlib
+import io
+import itertools
+import json
+import os
+import sys
+from typing import Literal
+import numpy as np
+import pandas as pd
+import pyproj
+from pyproj import CRS, Transformer
+from pyproj.transformer import TransformerGroup
+from pathlib import Path
+import shutil
+import tempfile
+from shapely.geometry import Polygon
+from compressie import compressie, zonder_compressie, ontpakker, invoer_openen, uitvoer_openen
+from werkmap import is_werkmap, werkbladen, werkblad_rijen, werkblad_chunks
+from geopackage import is_geopackage, gpkg_openen, gpkg_punten, gpkg_polygoon, gpkg_afsluiten
+from procestransformatie import proces_transformer
+
+
+# =============================================================================
+# SNEL VOORBEELD VAN EEN INVOERBESTAND
+# =============================================================================
+# Voor het voorbeeld in de GUI zijn enkel de eerste regels nodig. In plaats
+# van het hele bestand in te lezen (wat bij een bestand van enkele GB de GUI
+# minutenlang laat bevriezen) lezen we maximaal VOORBEELD_MAX_BYTES bytes.
+# Zo is het selecteren van een bestand altijd meteen klaar, ongeacht de grootte.
+#
+# Uit datzelfde stukje worden ook afgeleid:
+#   - de codering (BOM, anders UTF-8, anders Windows-1252)
+#   - een schatting van het aantal rijen: bestandsgrootte gedeeld door de
+#     gemiddelde lengte (in bytes) van de volledige regels in het stukje.
+#     Past het hele bestand in het stukje, dan is het aantal exact.
+#
+# Een gecomprimeerd bestand (.gz, .zst, .xz) wordt uitgepakt tot er
+# max_bytes tekst is. De schatting gebruikt dan hoeveel gecomprimeerde
+# bytes daarvoor nodig waren.
+#
+# Van een Excel-werkmap worden de eerste rijen van het eerste werkblad
+# getoond (cellen gescheiden door een tab); het aantal rijen is dat van alle
+# werkbladen samen volgens de werkmap zelf.
+# -----------------------------------------------------------------------------
+VOORBEELD_MAX_BYTES = 64 * 1024
+
+# Volgorde is belangrijk: de UTF-32 BOM begint met dezelfde bytes als UTF-16 LE.
+BOM_CODERINGEN = (
+    (codecs.BOM_UTF8,     "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def codering_detecteren(data: bytes) -> str:
+    for bom, codering in BOM_CODERINGEN:
+        if data.startswith(bom):
+            return codering
+
+    # Zonder BOM: UTF-8 proberen. Het stukje kan midden in een teken van
+    # meerdere bytes afgebroken zijn, daarom de laatste 3 bytes niet meetellen.
+    try:
+        (data[:-3] if len(data) > 3 else data).decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        # De meeste oudere Windows-exports gebruiken cp1252 (Westeuropees)
+        return "cp1252"
+
+
+def snel_voorbeeld(pad, aantal_regels: int = 5, max_bytes: int = VOORBEELD_MAX_BYTES) -> dict:
+    grootte = Path(pad).stat().st_size
+    if is_werkmap(pad):
+        return _werkmap_voorbeeld(pad, aantal_regels, grootte)
+    soort = compressie(pad)
+    with open(pad, "rb") as f:
+        if soort is None:
+            data = f.read(max_bytes)
+            gelezen = len(data)
+            volledig = gelezen >= grootte   # past het hele bestand in het stukje?
+        else:
+            with ontpakker(f, soort) as stroom:
+                data = b""
+                while len(data) < max_bytes and (blok := stroom.read(max_bytes - len(data))):
+                    data += blok
+            gelezen = f.tell()
+            volledig = len(data) < max_bytes
+
+    codering = codering_detecteren(data)
+
+    # Decoderen met errors="replace": een voorbeeld mag nooit een fout geven
+    alle_regels = data.decode(codering, errors="replace").splitlines()
+
+    # De laatste regel is onvolledig als het stukje middenin het bestand stopt
+    if not volledig and len(alle_regels) > 1:
+        alle_regels = alle_regels[:-1]
+    regels = [regel.strip() for regel in alle_regels if regel.strip()]
+
+    if volledig:
+        geschatte_rijen = len(regels)
+    else:
+        # bestandsgrootte x (aantal regels per gelezen byte)
+        geschatte_rijen = round(grootte * len(alle_regels) / max(gelezen, 1))
+
+    return {
+        "regels":          regels[:aantal_regels],
+        "codering":        codering,
+        "compressie":      soort,
+        "grootte":         grootte,
+        "geschatte_rijen": geschatte_rijen,
+        "exact":           volledig,
+    }
+
+
+def _werkmap_voorbeeld(pad, aantal_regels: int, grootte: int) -> dict:
+    bladen = werkbladen(pad)
+    rijen = itertools.islice(werkblad_rijen(pad), aantal_regels)
+    return {
+        "regels":          ["\t".join("" if v is None else str(v) for v in rij) for rij in rijen],
+        "codering":        f"Excel, {len(bladen)} werkblad{'en' if len(bladen) != 1 else ''}",
+        "compressie":      None,
+        "grootte":         grootte,
+        "geschatte_rijen": None if None in bladen.values() else sum(bladen.values()),
+        "exact":           False,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Eén regel tekst met de samenvatting voor onder het voorbeeld in de GUI,
+# bijv. "utf-8 | 2,31 GB | ± 98.400.000 rijen"
+# -----------------------------------------------------------------------------
+def voorbeeld_info(voorbeeld: dict) -> str:
+    grootte = voorbeeld["grootte"]
+    if grootte >= 1_000_000_000:
+        grootte_tekst = f"{grootte / 1_000_000_000:.2f} GB"
+    elif grootte >= 1_000_000:
+        grootte_tekst = f"{grootte / 1_000_000:.1f} MB"
+    else:
+        grootte_tekst = f"{grootte / 1_000:.1f} kB"
+
+    if voorbeeld["geschatte_rijen"] is None:
+        rijen, teken = "?", ""   # werkmap zonder opgegeven afmetingen
+    else:
+        rijen = f"{voorbeeld['geschatte_rijen']:_}".replace("_", ".")
+        teken = "" if voorbeeld["exact"] else "± "
+    codering = voorbeeld["codering"]
+    if voorbeeld["compressie"]:
+        codering += f" | {voorbeeld['compressie']}"
+    return f"{codering} | {grootte_tekst.replace('.', ',')} | {teken}{rijen} rijen"
+
+
+# =============================================================================
+# FORMAAT AUTOMATISCH DETECTEREN
+# =============================================================================
+# Operators kiezen geregeld het verkeerde scheidingsteken of vergeten
+# "Negeer titelrij". Dat merk je pas als een conversie van een paar GB na
+# minuten mislukt. Daarom bekijken we vooraf de eerste regels van het bestand
+# (zelfde begrensde leesactie als het voorbeeld) en leiden we af:
+#   - scheidingsteken en decimaalteken (als label uit de dropdown)
+#   - of de eerste regel een titelrij is
+#   - of de eerste kolom een punt-ID bevat (None als dat niet zeker is,
+#     zie _punt_id_kolom: dan blijft de instelling gelden)
+#   - het aantal kolommen
+#
+# Werkwijze: elke keuze uit SCHEIDINGSTEKENS wordt uitgeprobeerd. Een keuze
+# is geldig als alle datarijen hetzelfde aantal velden (2 t/m 4) hebben en de
+# coördinaatvelden getallen zijn met het bijhorende decimaalteken. Bij
+# meerdere geldige keuzes wint de keuze met de meeste kolommen.
+# Geeft None terug als geen enkele keuze past; de GUI-instellingen blijven
+# dan gelden.
+#
+# Bij een Excel-werkblad (blad: naam, None = het eerste) is er geen
+# scheidingsteken: enkel titelrij, punt-ID en aantal kolommen worden op
+# dezelfde manier bepaald, en het decimaalteken voor getallen die als tekst
+# in een cel staan.
+# -----------------------------------------------------------------------------
+# Dezelfde labels als in de dropdowns van beide GUI's: (scheidingsteken, decimaalteken)
+SCHEIDINGSTEKENS = {
+    'komma(decimaal punt)':       (",",  "."),
+    'spatie(decimaal punt)':      (" ",  "."),
+    'tab(decimaal punt)':         ("\t", "."),
+    'punt-komma(decimaal komma)': (";",  ","),
+    'punt-komma(decimaal punt)':  (";",  "."),
+}
+
+DETECTIE_REGELS = 50
+
+
+def _is_getal(veld: str, decimal: str) -> bool:
+    veld = veld.strip()
+    if decimal == ",":
+        if "." in veld:
+            return False   # "1.234,5" (duizendtallen) ondersteunt de conversie niet
+        veld = veld.replace(",", ".")
+    try:
+        float(veld)
+        return True
+    except ValueError:
+        return False
+
+
+# Punt-nummers zijn kleiner dan elke X of Y die in de Belgische
+# projectiestelsels voorkomt (L72 X vanaf ± 20 000 aan de kust, L2008 en
+# UTM31 in de honderdduizenden).
+VOLGNUMMER_MAX = 10_000
+
+
+def _punt_id_kolom(velden: list, decimal: str):
+    # Een numerieke eerste kolom: punt-nummer of coördinaat?
+    #   True : oplopende gehele getallen onder VOLGNUMMER_MAX (1, 2, 3, ...)
+    #   False: getallen met decimalen, dus een coördinaat
+    #   None : gehele getallen die ook een coördinaat kunnen zijn, bijv. X van
+    #          een XYZ-raster met 1 m maaswijdte (150000, 150001, ...). Dan
+    #          blijft de instelling uit de GUI of het profiel gelden.
+    getallen = [float(str(v).strip().replace(decimal, ".")) for v in velden]
+    if not all(g.is_integer() for g in getallen):
+        return False
+    if (len(getallen) > 1 and all(0 <= g < VOLGNUMMER_MAX for g in getallen)
+            and all(a < b for a, b in zip(getallen, getallen[1:]))):
+        return True
+    return None
+
+
+def formaat_detecteren(pad, max_regels: int = DETECTIE_REGELS, blad=None):
+    if is_werkmap(pad):
+        return _werkblad_formaat(pad, max_regels, blad)
+    regels = snel_voorbeeld(pad, aantal_regels=max_regels)["regels"]
+    if not regels:
+        return None
+
+    beste = None
+    for label, (separator, decimal) in SCHEIDINGSTEKENS.items():
+        rijen = [regel.split(separator) for regel in regels]
+
+        # Titelrij: de eerste regel bevat velden die geen getal zijn, de rest wel
+        # (de eerste kolom telt niet mee, die kan een punt-ID zijn).
+        titelrij = len(rijen) > 1 and not all(_is_getal(v, decimal) for v in rijen[0][1:])
+        data = rijen[1:] if titelrij else rijen
+
+        aantal_kolommen = len(data[0])
+        if not 2 <= aantal_kolommen <= 4 or any(len(r) != aantal_kolommen for r in data):
+            continue
+        if not all(_is_getal(v, decimal) for r in data for v in r[1:]):
+            continue
+
+        eerste_kolom = [r[0] for r in data]
+        if not all(_is_getal(v, decimal) for v in eerste_kolom):
+            naam_kolom = True
+        elif aantal_kolommen < 3:
+            naam_kolom = False
+        else:
+            naam_kolom = _punt_id_kolom(eerste_kolom, decimal)
+        if naam_kolom and aantal_kolommen < 3:
+            continue   # punt-ID plus één coördinaat is geen geldig formaat
+
+        if beste is None or aantal_kolommen > beste["aantal_kolommen"]:
+            beste = {
+                "separator_label": label,
+                "separator":       separator,
+                "decimal":         decimal,
+                "header":          titelrij,
+                "naam_kolom":      naam_kolom,
+                "aantal_kolommen": aantal_kolommen,
+            }
+    return beste
+
+
+def _is_getal_cel(waarde, decimal: str) -> bool:
+    # Getalcellen zijn altijd goed; tekst moet een getal met dat decimaalteken zijn
+    if isinstance(waarde, (int, float)) and not isinstance(waarde, bool):
+        return True
+    return waarde is not None and _is_getal(str(waarde), decimal)
+
+
+def _werkblad_formaat(pad, max_regels: int, blad):
+    rijen = list(itertools.islice(werkblad_rijen(pad, blad), max_regels))
+    if not rijen:
+        return None
+    for decimal in (".", ","):
+        titelrij = len(rijen) > 1 and not all(_is_getal_cel(v, decimal) for v in rijen[0][1:])
+        data = rijen[1:] if titelrij else rijen
+        aantal_kolommen = max(len(r) for r in data)
+        if not 2 <= aantal_kolommen <= 4 or not all(_is_getal_cel(v, decimal) for r in data for v in r[1:]):
+            continue
+        eerste_kolom = [r[0] for r in data]
+        if not all(_is_getal_cel(v, decimal) for v in eerste_kolom):
+            naam_kolom = True
+        elif aantal_kolommen < 3:
+            naam_kolom = False
+        else:
+            naam_kolom = _punt_id_kolom(eerste_kolom, decimal)
+        if naam_kolom and aantal_kolommen < 3:
+            return None
+        return {
+            "separator_label": "Excel-werkblad",
+            "separator":       None,
+            "decimal":         decimal,
+            "header":          titelrij,
+            "naam_kolom":      naam_kolom,
+            "aantal_kolommen": aantal_kolommen,
+        }
+    return None
+
+
+# -----------------------------------------------------------------------------
+# Korte omschrijving van een gedetecteerd formaat voor in de GUI,
+# bijv. "spatie(decimaal punt), titelrij, point-id, 4 kolommen"
+# -----------------------------------------------------------------------------
+def formaat_info(formaat) -> str:
+    if formaat is None:
+        return "formaat niet herkend"
+    delen = [formaat["separator_label"]]
+    if formaat["header"]:
+        delen.append("titelrij")
+    if formaat["naam_kolom"]:
+        delen.append("point-id")
+    elif formaat["naam_kolom"] is None:
+        delen.append("point-id onzeker (instelling)")
+    delen.append(f"{formaat['aantal_kolommen']} kolommen")
+    return ", ".join(delen)
+
+
+# =============================================================================
+# CONTROLE VOORAF: LIGGEN DE PUNTEN IN HET VERWACHTE GEBIED?
+# =============================================================================
+# Een verkeerd gekozen invoerstelsel (bijv. L72-data aangeduid als UTM31)
+# geeft geen foutmelding: pyproj rekent gewoon verkeerde coördinaten uit.
+# Daarom transformeren we vóór de volledige conversie een steekproef van de
+# eerste VALIDATIE_STEEKPROEF punten naar WGS84 en kijken we of ze binnen
+#   1. het gebruiksgebied (area of use) van het invoer-CRS liggen, verruimd
+#      met VALIDATIE_MARGE_GRADEN: L72 en L2008 zijn officieel enkel
+#      "Belgium - onshore", maar worden ook op zee gebruikt;
+#   2. het WERKGEBIED: België met het Belgisch deel van de Noordzee en een
+#      ruime rand. Het gebruiksgebied van UTM31 (0°-6°O, 0°-84°N) en WGS84
+#      (de hele wereld) is te ruim om verwisselde stelsels te herkennen.
+# Zo'n controle duurt enkele tienden van een seconde, ook bij een bestand
+# van meerdere GB, omdat enkel het begin gelezen wordt.
+#
+# Het resultaat is een dictionary met het aantal punten in de steekproef,
+# het aantal buiten het gebied en het aantal dat niet te transformeren was
+# (inf/NaN). De GUI beslist wat ermee gebeurt.
+# -----------------------------------------------------------------------------
+VALIDATIE_STEEKPROEF = 1000
+VALIDATIE_MARGE_GRADEN = 1.0
+# (west, zuid, oost, noord) in graden
+WERKGEBIED = (1.5, 49.0, 7.0, 52.5)
+
+
+@functools.lru_cache(maxsize=None)
+def gebruiksgebied(crs_code: str) -> tuple:
+    # Gebruiksgebied van het CRS, verruimd met de marge en beperkt tot het werkgebied
+    gebied = CRS.from_user_input(crs_code).area_of_use
+    return (
+        max(gebied.west - VALIDATIE_MARGE_GRADEN, WERKGEBIED[0]),
+        max(gebied.south - VALIDATIE_MARGE_GRADEN, WERKGEBIED[1]),
+        min(gebied.east + VALIDATIE_MARGE_GRADEN, WERKGEBIED[2]),
+        min(gebied.north + VALIDATIE_MARGE_GRADEN, WERKGEBIED[3]),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _naar_wgs84(crs_code: str) -> Transformer:
+    # Zelfde asvolgorde als de conversie zelf (geen always_xy): voor WGS84
+    # geeft dit (breedtegraad, lengtegraad) terug.
+    return Transformer.from_crs(crs_code, "EPSG:4326")
+
+
+def steekproef_controleren(pad, instellingen: dict, blad=None) -> dict:
+    # Zelfde inleesopties als de conversie zelf (zie CONVERSIE-INSTELLINGEN)
+    if is_werkmap(pad):
+        df = next(werkblad_chunks(pad, blad, instellingen["titelrij_in"], instellingen["decimal_in"],
+                                  VALIDATIE_STEEKPROEF), pd.DataFrame(columns=[0, 1]))
+    else:
+        df = pd.read_csv(pad, delimiter=instellingen["separator_in"], decimal=instellingen["decimal_in"],
+                         header=None, skiprows=1 if instellingen["titelrij_in"] else 0,
+                         nrows=VALIDATIE_STEEKPROEF)
+    crs_code = CRS_CODES[instellingen["stelsel_in"]]
+    eerste = 1 if instellingen["naam_kolom"] else 0
+    lat, lon = _naar_wgs84(crs_code).transform(
+        pd.to_numeric(df.iloc[:, eerste], errors="coerce").values,
+        pd.to_numeric(df.iloc[:, eerste + 1], errors="coerce").values,
+    )
+
+    west, zuid, oost, noord = gebruiksgebied(crs_code)
+    eindig = np.isfinite(lat) & np.isfinite(lon)
+    binnen = eindig & (lon >= west) & (lon <= oost) & (lat >= zuid) & (lat <= noord)
+    return {
+        "aantal":      len(df),
+        "buiten":      int((eindig & ~binnen).sum()),
+        "niet_eindig": int((~eindig).sum()),
+        "gebied":      (west, zuid, oost, noord),
+    }
+
+
+# =============================================================================
+# STATISTIEK PER BESTAND TIJDENS DE CONVERSIE
+# =============================================================================
+# Tijdens de volledige conversie houden we per bestand bij:
+#   - het omhullende kader (bounding box) van de geconverteerde X/Y
+#   - het bereik van de Z-waarden
+#   - het aantal rijen met NaN (leeg/onleesbaar) of inf (niet te transformeren)
+# Per chunk zijn dat enkele numpy-bewerkingen op arrays die er al zijn, dus
+# dit kost nauwelijks rekentijd. Na afloop wordt alles als JSON-bestand naast
+# het uitvoerbestand geschreven (zelfde naam + ".samenvatting.json").
+# -----------------------------------------------------------------------------
+def statistiek_nieuw() -> dict:
+    return {
+        "rijen": 0,
+        "x_min": np.inf, "x_max": -np.inf,
+        "y_min": np.inf, "y_max": -np.inf,
+        "z_min": np.inf, "z_max": -np.inf,
+        "nan": 0,
+        "inf": 0,
+    }
+
+
+def statistiek_bijwerken(statistiek: dict, df_output: pd.DataFrame, x_header: str, y_header: str):
+    x = df_output[x_header].to_numpy(dtype=float)
+    y = df_output[y_header].to_numpy(dtype=float)
+    eindig = np.isfinite(x) & np.isfinite(y)
+
+    statistiek["rijen"] += len(x)
+    statistiek["nan"] += int((np.isnan(x) | np.isnan(y)).sum())
+    statistiek["inf"] += int((np.isinf(x) | np.isinf(y)).sum())
+    if eindig.any():
+        statistiek["x_min"] = min(statistiek["x_min"], float(x[eindig].min()))
+        statistiek["x_max"] = max(statistiek["x_max"], float(x[eindig].max()))
+        statistiek["y_min"] = min(statistiek["y_min"], float(y[eindig].min()))
+        statistiek["y_max"] = max(statistiek["y_max"], float(y[eindig].max()))
+
+    if "Z" in df_output.columns:
+        z = df_output["Z"].to_numpy(dtype=float)
+        statistiek["nan"] += int((np.isnan(z) & eindig).sum())   # niet dubbel tellen
+        z = z[np.isfinite(z)]
+        if len(z):
+            statistiek["z_min"] = min(statistiek["z_min"], float(z.min()))
+            statistiek["z_max"] = max(statistiek["z_max"], float(z.max()))
+
+
+def samenvatting_pad(output_pad) -> Path:
+    pad = zonder_compressie(output_pad)   # meting.asc.gz → meting.samenvatting.json
+    return pad.with_name(pad.stem + ".samenvatting.json")
+
+
+def statistiek_schrijven(statistiek: dict, output_pad, extra: dict = None):
+    # Niet gevonden minima/maxima (nog ±inf) worden null in de JSON
+    samenvatting = {k: (None if isinstance(v, float) and not np.isfinite(v) else v)
+                    for k, v in statistiek.items()}
+    samenvatting.update(extra or {})
+    with open(samenvatting_pad(output_pad), "w", encoding="utf-8") as f:
+        json.dump(samenvatting, f, indent=2, ensure_ascii=False)
+
+
+# =============================================================================
+# UITVOER IN TEGELS
+# =============================================================================
+# In plaats van één groot uitvoerbestand worden de geconverteerde punten
+# verdeeld over een regelmatig raster van vierkante tegels in het
+# uitvoerstelsel (tegelgrootte in meter, of in graden bij WGS84).
+# Elke tegel wordt een eigen bestand in de map "<naam>_tegels", met de
+# tegelnummers in de naam:  <naam>_<kolom>_<rij><extensie>
+#   kolom = floor(X / tegelgrootte), rij = floor(Y / tegelgrootte)
+#
+# Dit gebeurt tijdens het streamen: per chunk worden de punten gegroepeerd
+# per tegel en achteraan het bijhorende tegelbestand toegevoegd. Er staat dus
+# nooit meer dan één chunk in het geheugen, ongeacht het aantal tegels.
+#
+# tellers: dictionary (kolom, rij) → aantal punten. Die wordt per chunk
+#   bijgewerkt en onthoudt welke tegels al bestaan: een tegel die voor het
+#   eerst voorkomt wordt aangemaakt (mode 'w', met titelrij), daarna wordt er
+#   enkel aan toegevoegd. Zo worden tegels van een vorige run overschreven.
+#
+# Na afloop schrijft tegel_index_schrijven in dezelfde map een klein
+# indexbestand "<naam>_index.csv" met per tegel de bestandsnaam, de grenzen
+# van de tegel en het aantal punten. Verdere verwerking kan zo enkel de
+# nodige tegels lezen.
+# -----------------------------------------------------------------------------
+def tegel_map(output_pad) -> Path:
+    pad = Path(output_pad)
+    return pad.parent / (pad.stem + "_tegels")
+
+
+def _tegel_bestand(output_pad, kolom: int, rij: int) -> Path:
+    pad = Path(output_pad)
+    return tegel_map(pad) / f"{pad.stem}_{kolom}_{rij}{pad.suffix}"
+
+
+def tegels_schrijven(df_output: pd.DataFrame, x_header: str, y_header: str, tegel_grootte: float,
+                     output_pad, tellers: dict, separator: str, decimal: str, titelrij: bool):
+    tegel_map(output_pad).mkdir(parents=True, exist_ok=True)
+
+    # Tegelnummer per punt; punten die niet te transformeren waren (inf/NaN)
+    # krijgen geen tegel en worden overgeslagen.
+    x = df_output[x_header].to_numpy(dtype=float)
+    y = df_output[y_header].to_numpy(dtype=float)
+    eindig = np.isfinite(x) & np.isfinite(y)
+    kolommen = np.floor(x[eindig] / tegel_grootte).astype(np.int64)
+    rijen = np.floor(y[eindig] / tegel_grootte).astype(np.int64)
+
+    for (kolom, rij), groep in df_output[eindig].groupby([kolommen, rijen], sort=False):
+        sleutel = (int(kolom), int(rij))
+        nieuw = sleutel not in tellers
+        groep.to_csv(_tegel_bestand(output_pad, *sleutel), index=False, sep=separator,
+                     decimal=decimal, header=titelrij and nieuw, mode='w' if nieuw else 'a')
+        tellers[sleutel] = tellers.get(sleutel, 0) + len(groep)
+
+
+def tegel_index_schrijven(tellers: dict, tegel_grootte: float, output_pad, separator: str, decimal: str):
+    index = pd.DataFrame(
+        [(_tegel_bestand(output_pad, kolom, rij).name,
+          kolom * tegel_grootte, rij * tegel_grootte,
+          (kolom + 1) * tegel_grootte, (rij + 1) * tegel_grootte,
+          aantal)
+         for (kolom, rij), aantal in sorted(tellers.items())],
+        columns=["tegel", "x_min", "y_min", "x_max", "y_max", "punten"],
+    )
+    pad = Path(output_pad)
+    index.to_csv(tegel_map(pad) / f"{pad.stem}_index.csv", index=False, sep=separator, decimal=decimal)
+
+
+# =============================================================================
+# CRS-CODES EN KOLOMNAMEN
+# =============================================================================
+# pyproj gebruikt EPSG-codes om coördinaten te definiëren.
+# De dictionary koppelt de naam uit de dropdown aan de juiste EPSG-code.
+#   L72    = Belgisch Lambert 1972         (EPSG:31370)
+#   UTM31  = Universal Transverse Mercator zone 31N (EPSG:32631)
+#   WGS84  = Wereldwijd GPS-stelsel, in graden (EPSG:4326)
+#   L2008  = Belgisch Lambert 2008         (EPSG:3812)
+# -----------------------------------------------------------------------------
+CRS_CODES = {
+    "L72":   "EPSG:31370",
+    "UTM31": "EPSG:32631",
+    "WGS84": "EPSG:4326",
+    "L2008": "EPSG:3812",
+}
+
+# Afhankelijk van het gekozen uitvoerstelsel krijgen de X/Y-kolommen een
+# andere naam in het outputbestand.
+HEADERS = {
+    "L72":   ("x_L72",   "y_L72"),
+    "UTM31": ("x_UTM31", "y_UTM31"),
+    "WGS84": ("LAT",     "LON"),
+    "L2008": ("x_L2008", "y_L2008"),
+}
+
+
+# =============================================================================
+# CONVERSIE-INSTELLINGEN
+# =============================================================================
+# Alle opties die de conversie beïnvloeden zitten in één gewone dictionary.
+# De GUI bouwt die op uit zijn widgets (op de GUI-thread), de conversiedienst
+# uit de parameters van een verzoek. De conversiefuncties hieronder lezen dus
+# nooit rechtstreeks Tkinter-variabelen en kunnen zonder GUI draaien.
+#
+#   stelsel_in / stelsel_uit   : sleutel uit CRS_CODES, bijv. "L72"
+#   separator_in / decimal_in  : scheidings- en decimaalteken van de invoer
+#   separator_uit / decimal_uit: idem voor de uitvoer
+#   titelrij_in                : eerste rij van de invoer overslaan
+#   titelrij_uit               : kolomnamen in de uitvoer schrijven
+#   naam_kolom                 : eerste kolom bevat een punt-ID
+#   diepte                     : Z-waarden omdraaien van teken
+#   reductievlak_keuze         : 0=geen, 1=LAT→TAW, 2=TAW→LAT
+#   reductievlak_waarde        : sleutel uit REDUCTIEVLAK_WAARDES
+#   tegel_grootte              : None, of tegelgrootte voor tegeluitvoer
+#   uitdunnen                  : None, of methode uit UITDUN_METHODES
+#   uitdun_waarde              : N bij "elke_n", celgrootte bij de rastermethodes
+#   snel_raster                : correctieraster gebruiken (zie transformer_maken)
+#   hoogte_in / hoogte_uit     : None, of sleutel uit HOOGTE_STELSELS: Z mee
+#                                omzetten naar een ander hoogtestelsel
+#   sorteren                   : None, of methode uit SORTEER_METHODES
+#   geheugen_mb                : None, of geheugenbudget in MB (zie geheugen_verdeling)
+#   processen                  : None, of aantal werkprocessen voor de transformatie
+#                                (zie transformer_maken; met geheugen_mb begrensd,
+#                                zie geheugen_verdeling)
+# -----------------------------------------------------------------------------
+STANDAARD_INSTELLINGEN = {
+    "stelsel_in":          "UTM31",
+    "stelsel_uit":         "L72",
+    "separator_in":        " ",
+    "decimal_in":          ".",
+    "separator_uit":       ",",
+    "decimal_uit":         ".",
+    "titelrij_in":         False,
+    "titelrij_uit":        True,
+    "naam_kolom":          False,
+    "diepte":              False,
+    "reductievlak_keuze":  0,
+    "reductievlak_waarde": 0,
+    "tegel_grootte":       None,
+    "uitdunnen":           None,
+    "uitdun_waarde":       0,
+    "snel_raster":         False,
+    "hoogte_in":           None,
+    "hoogte_uit":          None,
+    "sorteren":            None,
+    "geheugen_mb":         None,
+    "processen":           None,
+}
+
+
+def formaat_toepassen(instellingen: dict, formaat) -> dict:
+    # Kopie van de instellingen met de invoeropties uit formaat_detecteren().
+    # Zonder herkend formaat blijven de instellingen ongewijzigd, en een
+    # onzekere punt-ID (None) laat de instelling naam_kolom staan.
+    if formaat is None:
+        return instellingen
+    return {
+        **instellingen,
+        "separator_in": formaat["separator"],
+        "decimal_in":   formaat["decimal"],
+        "titelrij_in":  formaat["header"],
+        "naam_kolom":   instellingen["naam_kolom"] if formaat["naam_kolom"] is None else formaat["naam_kolom"],
+    }
+
+
+# -----------------------------------------------------------------------------
+# Transformer aanmaken: berekent de wiskundige projectie tussen de twee stelsels.
+# always_xy=True wordt hier NIET gebruikt: pyproj volgt dan de officiële volgorde
+# van het CRS (bijv. lat/lon voor WGS84). In België/Europa is de notatie
+# 51.xxxx, 4.xxxx (breedtegraad eerst) gangbaarder, wat overeenkomt met die volgorde.
+# Een Transformer is niet thread-safe: elke thread gebruikt zijn eigen exemplaar.
+#
+# snel=True: tussen de Belgische stelsels (SNEL_STELSELS) een RasterTransformer
+# teruggeven als er een correctieraster beschikbaar is (zie hieronder). Die
+# heeft dezelfde transform()-methode, dus verwerk_chunk merkt geen verschil.
+# hoogte_in/hoogte_uit: een 3D-transformer die ook Z omzet (zie hieronder).
+# processen > 1: een ProcesTransformer die elke chunk over zoveel werkprocessen
+# verdeelt, over de werkgroep die alle stelsels en bestanden delen (zie
+# procestransformatie). Enkel vanuit een script met een __main__-bescherming.
+# -----------------------------------------------------------------------------
+def transformer_maken(stelsel_in: str, stelsel_uit: str, snel: bool = False,
+                      hoogte_in=None, hoogte_uit=None, processen=None):
+    if processen and processen > 1:
+        return proces_transformer((stelsel_in, stelsel_uit, snel, hoogte_in, hoogte_uit), processen)
+    if hoogte_in or hoogte_uit:
+        # Z gaat mee: altijd via PROJ (het correctieraster is enkel 2D)
+        return hoogte_transformer(stelsel_in, stelsel_uit, hoogte_in, hoogte_uit)
+    transformer = Transformer.from_crs(CRS_CODES[stelsel_in], CRS_CODES[stelsel_uit])
+    if snel:
+        raster = correctieraster(stelsel_in, stelsel_uit)
+        if raster is not None:
+            return RasterTransformer(raster, transformer)
+    return transformer
+
+
+# =============================================================================
+# HOOGTESTELSELS: Z MEE OMZETTEN
+# =============================================================================
+# Standaard blijft Z ongewijzigd; enkel de vaste LAT/TAW-verschuiving
+# (lat_to_taw) en het omdraaien van het teken (depth_toggle) bestaan. Met
+# hoogte_in en hoogte_uit wordt Z samen met X en Y omgezet, in dezelfde
+# gevectoriseerde transform()-oproep per chunk. Daarvoor krijgt elk stelsel
+# een derde as (een 3D- of samengesteld "compound" CRS):
+#   TAW        : orthometrische hoogte t.o.v. de Tweede Algemene Waterpassing
+#                (Oostende, EPSG:5710), bijv. L72 + TAW = EPSG:31370+5710
+#   LAT        : TAW met de reductievlakwaarde van de gekozen zone
+#                (REDUCTIEVLAK_WAARDES, LAT = TAW + waarde), voor en na PROJ
+#   ellipsoide : ellipsoïdale hoogte (GNSS) op de ellipsoïde van het stelsel
+#                (GRS80 voor L2008, WGS84 voor UTM31/WGS84, Hayford voor L72)
+# Z moet dan een hoogte zijn (positief naar boven); "diepte" draait het
+# resultaat daarna nog altijd om, zoals vroeger.
+#
+# Tussen TAW en ellipsoïdale hoogte is een geoïdemodel nodig (hBG18 van het
+# NGI, be_ign_hBG18.tif). PROJ zoekt zijn rasterbestanden onder meer in
+# GEOIDE_MAP, die met het programma meegeleverd wordt (ook in de .exe).
+# Ontbreekt het raster, dan zou PROJ stilzwijgend een "ballpark"-bewerking
+# kiezen die Z gewoon ongewijzigd laat. Dat wordt hier geweigerd met een
+# duidelijke melding: liever geen uitvoer dan hoogtes die tientallen meter
+# verkeerd zijn.
+# -----------------------------------------------------------------------------
+HOOGTE_STELSELS = {
+    "TAW":        "EPSG:5710",
+    "LAT":        "EPSG:5710",
+    "ellipsoide": None,
+}
+
+# Meegeleverde rasterbestanden: naast de scripts, of in de uitgepakte .exe
+GEOIDE_MAP = Path(getattr(sys, "_MEIPASS", Path(__file__).parent)) / "geoide"
+if GEOIDE_MAP.is_dir():
+    pyproj.datadir.append_data_dir(str(GEOIDE_MAP))
+
+
+def hoogte_controleren(instellingen: dict):
+    hoogte_in, hoogte_uit = instellingen.get("hoogte_in"), instellingen.get("hoogte_uit")
+    if not hoogte_in and not hoogte_uit:
+        return
+    for hoogte in (hoogte_in, hoogte_uit):
+        if hoogte not in HOOGTE_STELSELS:
+            raise ValueError(f"Kies zowel het hoogtestelsel van de invoer als van de uitvoer, "
+                             f"uit: {', '.join(HOOGTE_STELSELS)} (niet {hoogte!r}).")
+    if instellingen["reductievlak_keuze"] != 0:
+        raise ValueError("Reductievlakcorrectie en hoogte omzetten kunnen niet samen; "
+                         "kies LAT als hoogtestelsel.")
+
+
+def _crs_3d(stelsel: str, hoogte: str) -> CRS:
+    if HOOGTE_STELSELS[hoogte] is None:
+        return CRS(CRS_CODES[stelsel]).to_3d()
+    return CRS(f"{CRS_CODES[stelsel]}+{HOOGTE_STELSELS[hoogte].split(':')[1]}")
+
+
+def hoogte_transformer(stelsel_in: str, stelsel_uit: str, hoogte_in: str, hoogte_uit: str) -> Transformer:
+    groep = TransformerGroup(_crs_3d(stelsel_in, hoogte_in), _crs_3d(stelsel_uit, hoogte_uit))
+    # Tussen twee gelijke hoogtestelsels volstaat elke bewerking; anders
+    # moet er een echte hoogteomzetting (met geoïdemodel) in zitten
+    zelfde = (hoogte_in == "ellipsoide") == (hoogte_uit == "ellipsoide")
+    for transformer in groep.transformers:   # beste eerst
+        if zelfde or "ballpark vertical" not in transformer.description:
+            return transformer
+    # De bewerking die het minst ontbrekende rasters nodig heeft melden
+    ontbrekend = min(([raster.short_name for raster in bewerking.grids if not raster.available]
+                      for bewerking in groep.unavailable_operations), key=len, default=[])
+    raise RuntimeError(f"Hoogte {hoogte_in} → {hoogte_uit}: geoïderaster ontbreekt "
+                       f"({', '.join(ontbrekend) or 'geen bewerking gevonden'}). "
+                       f"Plaats het in {GEOIDE_MAP}.")
+
+
+# =============================================================================
+# SNELLE CONVERSIE VIA EEN CORRECTIERASTER
+# =============================================================================
+# Bijna al het verkeer loopt tussen L72, L2008 en UTM31. Dat zijn alle drie
+# conforme projecties in meter: over een afstand van enkele honderden meter
+# is de omzetting bijna lineair. In plaats van elk punt door PROJ te sturen,
+# rekenen we de omzetting één keer uit op de knooppunten van een raster over
+# het gebruiksgebied, en interpoleren we daarna bilineair met numpy (enkele
+# keren sneller dan PROJ, volledig gevectoriseerd).
+#
+# Nauwkeurigheid: na het opbouwen wordt het raster gecontroleerd op
+# SNEL_CONTROLE_PUNTEN willekeurige punten tegen pyproj. Enkel als de grootste
+# afwijking onder SNEL_MAX_FOUT (1 mm) blijft, wordt het raster gebruikt;
+# anders wordt een fijner raster geprobeerd en uiteindelijk gewoon pyproj.
+# (Willekeurige punten, niet de celmiddens: bij een conforme projectie heft
+# de interpolatiefout zich net in het midden van een cel op.)
+# Omdat de uitvoer op cm afgerond wordt, kan een waarde die vlak bij een
+# afrondingsgrens ligt heel uitzonderlijk 1 in het laatste cijfer verschillen.
+#
+# Punten buiten het raster, of in een cel waar PROJ geen resultaat gaf,
+# worden alsnog met pyproj omgezet.
+#
+# Het opbouwen duurt enkele seconden; het resultaat wordt bewaard in
+# snel_cache_map(). De bestandsnaam bevat een hash van het stelselpaar, de
+# pyproj/PROJ-versie en de gebruikte PROJ-bewerking: verandert er iets aan
+# PROJ (bijv. een nieuw datumraster), dan wordt het raster opnieuw opgebouwd.
+# -----------------------------------------------------------------------------
+SNEL_STELSELS = ("L72", "L2008", "UTM31")
+SNEL_RASTER_AFSTANDEN = (500.0, 250.0)   # in meter, eerst grof, zo nodig fijner
+SNEL_MAX_FOUT = 0.001                    # 1 mm
+SNEL_CONTROLE_PUNTEN = 200_000
+
+
+def snel_cache_map() -> Path:
+    # Windows: %LOCALAPPDATA%, elders ~/.cache
+    basis = os.environ.get("LOCALAPPDATA") or Path.home() / ".cache"
+    return Path(basis) / "coordinaat_conversie" / "correctierasters"
+
+
+def _raster_bouwen(transformer: Transformer, gebied: tuple, afstand: float) -> dict:
+    x_reeks = np.arange(gebied[0], gebied[2] + afstand, afstand)
+    y_reeks = np.arange(gebied[1], gebied[3] + afstand, afstand)
+    x, y = np.meshgrid(x_reeks, y_reeks)
+    u, v = transformer.transform(x, y)
+    return {"x0": x_reeks[0], "y0": y_reeks[0], "afstand": afstand,
+            "u": np.asarray(u, dtype=np.float64), "v": np.asarray(v, dtype=np.float64)}
+
+
+def _raster_fout(raster: dict, transformer: Transformer, gebied: tuple) -> float:
+    # Grootste afwijking (in meter) t.o.v. pyproj op vaste willekeurige punten
+    toeval = np.random.default_rng(31370)
+    x = toeval.uniform(gebied[0], gebied[2], SNEL_CONTROLE_PUNTEN)
+    y = toeval.uniform(gebied[1], gebied[3], SNEL_CONTROLE_PUNTEN)
+    u_ref, v_ref = transformer.transform(x, y)
+    u, v, binnen = _bilineair(raster, x, y)
+    afwijking = np.hypot(u - u_ref[binnen], v - v_ref[binnen])
+    afwijking = afwijking[np.isfinite(afwijking)]
+    return float(afwijking.max()) if len(afwijking) else float("inf")
+
+
+@functools.lru_cache(maxsize=None)
+def correctieraster(stelsel_in: str, stelsel_uit: str):
+    # Raster voor dit stelselpaar (uit de cache of nieuw), of None als het
+    # paar niet ondersteund wordt of de 1 mm-grens niet gehaald wordt.
+    if stelsel_in == stelsel_uit or stelsel_in not in SNEL_STELSELS or stelsel_uit not in SNEL_STELSELS:
+        return None
+    transformer = Transformer.from_crs(CRS_CODES[stelsel_in], CRS_CODES[stelsel_uit])
+    transformer.transform(150000.0, 200000.0)   # pas daarna is de gekozen PROJ-bewerking bekend
+
+    # Gebruiksgebied (lengte/breedte) omrekenen naar het invoerstelsel
+    gebied = Transformer.from_crs("EPSG:4326", CRS_CODES[stelsel_in], always_xy=True).transform_bounds(
+        *gebruiksgebied(CRS_CODES[stelsel_in]), densify_pts=21)
+
+    sleutel = "|".join([stelsel_in, stelsel_uit, pyproj.__version__, pyproj.proj_version_str,
+                        transformer.definition, repr(SNEL_RASTER_AFSTANDEN), repr(SNEL_MAX_FOUT)])
+    cache = snel_cache_map() / f"{stelsel_in}_{stelsel_uit}_{hashlib.sha1(sleutel.encode()).hexdigest()[:12]}.npz"
+    try:
+        with np.load(cache) as data:
+            x0, y0, afstand, fout = data["meta"]
+            if fout == -1:
+                return None   # eerder al vastgesteld dat de grens niet gehaald wordt
+            return {"x0": x0, "y0": y0, "afstand": afstand, "fout": fout,
+                    "u": data["u"], "v": data["v"]}
+    except (OSError, KeyError, ValueError):
+        pass
+
+    raster = None
+    for afstand in SNEL_RASTER_AFSTANDEN:
+        kandidaat = _raster_bouwen(transformer, gebied, afstand)
+        kandidaat["fout"] = _raster_fout(kandidaat, transformer, gebied)
+        if kandidaat["fout"] < SNEL_MAX_FOUT:
+            raster = kandidaat
+            break
+
+    # Bewaren voor een volgende keer (ook het negatieve resultaat). Lukt
+    # schrijven niet (geen rechten), dan wordt het raster gewoon opnieuw
+    # opgebouwd bij de volgende start.
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        tijdelijk = cache.with_suffix(".tmp.npz")
+        if raster is None:
+            np.savez(tijdelijk, meta=np.array([0, 0, 0, -1], dtype=np.float64))
+        else:
+            np.savez(tijdelijk, u=raster["u"], v=raster["v"], meta=np.array(
+                [raster["x0"], raster["y0"], raster["afstand"], raster["fout"]], dtype=np.float64))
+        os.replace(tijdelijk, cache)
+    except OSError:
+        pass
+    return raster
+
+
+def _bilineair(raster: dict, x: np.ndarray, y: np.ndarray):
+    # Bilineaire interpolatie voor de punten binnen het raster. Geeft
+    # (u, v, binnen) terug: u en v enkel voor de punten waar binnen True is.
+    u_raster, v_raster = raster["u"], raster["v"]
+    rijen, kolommen = u_raster.shape
+    fi = (x - raster["x0"]) / raster["afstand"]
+    fj = (y - raster["y0"]) / raster["afstand"]
+    binnen = (fi >= 0) & (fj >= 0) & (fi < kolommen - 1) & (fj < rijen - 1)
+    if not binnen.all():
+        fi, fj = fi[binnen], fj[binnen]
+    i, j = fi.astype(np.intp), fj.astype(np.intp)   # afkappen = floor, want fi, fj ≥ 0
+    fx, fy = fi - i, fj - j
+
+    # Eén plat indexnummer per punt; take() op de platte reeks is sneller
+    # dan indexeren met twee reeksen. Gewichten één keer, voor u en v samen.
+    k = j * kolommen + i
+    w00, w01 = (1 - fx) * (1 - fy), fx * (1 - fy)
+    w10, w11 = (1 - fx) * fy, fx * fy
+    resultaat = []
+    for plat in (u_raster.ravel(), v_raster.ravel()):
+        resultaat.append(w00 * plat.take(k) + w01 * plat.take(k + 1) +
+                         w10 * plat.take(k + kolommen) + w11 * plat.take(k + kolommen + 1))
+    return resultaat[0], resultaat[1], binnen
+
+
+class RasterTransformer:
+    # Zelfde gebruik als een pyproj Transformer: transform(x, y) → (x, y).
+    # transformer is de gewone pyproj Transformer voor de terugval.
+    def __init__(self, raster: dict, transformer: Transformer):
+        self.raster = raster
+        self.transformer = transformer
+
+    def transform(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        u = np.full(x.shape, np.nan)
+        v = np.full(x.shape, np.nan)
+        u_binnen, v_binnen, binnen = _bilineair(self.raster, x, y)
+        u[binnen], v[binnen] = u_binnen, v_binnen
+
+        # Terugval naar pyproj: buiten het raster, of geen geldig resultaat
+        # (NaN/inf op een knooppunt in de buurt, of NaN in de invoer)
+        terugval = ~np.isfinite(u) | ~np.isfinite(v)
+        if terugval.any():
+            u[terugval], v[terugval] = self.transformer.transform(x[terugval], y[terugval])
+        return u, v
+
+
+# =============================================================================
+# CGP-BESTAND INLEZEN
+# =============================================================================
+# Een *.cgp bestand heeft een eigen formaat met "=" als scheidingsteken en
+# een kopregel die overgeslagen moet worden. Deze functie zet het om naar
+# een standaard pandas DataFrame zodat de rest van de code het gewoon kan
+# verwerken. CGP-bestanden zijn doorgaans klein, dus chunking is hier niet nodig.
+# -----------------------------------------------------------------------------
+def cgp_to_dataframe(filename: str) -> pd.DataFrame:
+    # Ook gecomprimeerd (.cgp.gz, ...): invoer_openen pakt uit tijdens het lezen
+    with io.TextIOWrapper(invoer_openen(filename)[0], encoding="utf-8") as f:
+        # strip() verwijdert witruimte aan begin en einde van elke regel
+        # replace("=", ",") maakt van "naam=x=y" een komma-gescheiden rij
+        # de conditie "if line.strip()" slaat lege regels over
+        lines = [line.strip().replace("=", ",") for line in f if line.strip()]
+
+    lines = lines[1:]  # eerste regel is de kopregel, die slaan we over
+
+    # Elke tekstlijn splitsen op komma en van de resulterende lijsten een
+    # DataFrame maken. Elke deellijst wordt één rij in de tabel.
+    # dtype=object voorkomt dat pandas 2.x kolommen als StringDtype opslaat,
+    # zodat de float-conversie hieronder correct werkt.
+    df = pd.DataFrame([line.split(",") for line in lines], dtype=object)
+
+    # Spaties verwijderen uit de eerste kolom (bevat de puntnamen)
+    df.iloc[:, 0] = df.iloc[:, 0].str.replace(" ", "", regex=False)
+
+    # Kolommen 1 t/m einde zijn coördinaten: converteren naar float.
+    # Bij pd.read_csv gebeurt dit automatisch via de decimal-parameter,
+    # maar hier lezen we handmatig in als strings, dus we doen het expliciet.
+    df.iloc[:, 1:] = df.iloc[:, 1:].apply(pd.to_numeric)
+    return df
+
+
+# =============================================================================
+# DIEPTE OMDRAAIEN
+# =============================================================================
+# Vermenigvuldigt de Z-kolom met -1. Zo worden negatieve dieptewaarden
+# positief (of omgekeerd). Wordt enkel opgeroepen als de optie aanstaat.
+# -----------------------------------------------------------------------------
+def depth_toggle(df):
+    df['Z'] *= -1
+    return df
+
+
+# =============================================================================
+# REDUCTIEVLAK CORRECTIE (LAT ↔ TAW)
+# =============================================================================
+# Voegt een correctiewaarde toe aan of trekt ze af van de Z-kolom.
+# Elke haven of zone heeft een eigen offset tussen LAT (getijreferentievlak)
+# en TAW (Tweede Algemene Waterpassing, het Belgische hoogtestelsel).
+# De key in de dictionary stemt overeen met de waarde van de radiobutton.
+# keuze bepaalt de richting (1=LAT→TAW, 2=TAW→LAT).
+# waarde bepaalt welke correctiewaarde gebruikt wordt.
+# -----------------------------------------------------------------------------
+REDUCTIEVLAK_WAARDES = {
+    0: 0.69,  # EUT/NZT
+    1: 0.72,  # DUD
+    2: 0.73,  # VCS/BOS
+    3: 0.74,  # ROS
+    4: 0.75,  # SKO
+    5: 0.70,  # AVG Antwerpen
+    6: 0.25,  # ZB
+}
+
+
+def lat_to_taw(df, keuze: int, waarde: int):
+    conversie_waarde = REDUCTIEVLAK_WAARDES[waarde]
+
+    if keuze == 1:
+        df['Z'] -= conversie_waarde   # LAT naar TAW: aftrekken
+    elif keuze == 2:
+        df['Z'] += conversie_waarde   # TAW naar LAT: optellen
+    return df
+
+
+# =============================================================================
+# PUNT-ID'S COMPACT BEWAREN
+# =============================================================================
+# Een kolom met punt-ID's is voor pandas een kolom Python-strings: ± 65 bytes
+# per punt, tegen 8 bytes voor een coördinaat. Bij bestanden met een
+# naamkolom neemt die kolom zo meer geheugen in dan X, Y en Z samen. Omdat
+# de ID's ongewijzigd door de conversie gaan, worden ze zo compact mogelijk
+# bewaard:
+#   - numerieke ID's (1001, 1002, ...) leest pandas al als int64: 8 bytes
+#   - ID's die vaak terugkomen (lijnnamen, codes als "PT" of "kaaimuur")
+#     worden een categorische kolom: per punt een klein getal (1 à 2 bytes)
+#     dat verwijst naar een woordenboek met elke naam maar één keer
+#   - (bijna) unieke tekst-ID's ("P0001234") blijven gewone strings, want
+#     daar levert een woordenboek niets op. Met pyarrow geïnstalleerd
+#     bewaart pandas 3 die zelf al compact (één buffer voor alle tekst).
+# to_csv schrijft een categorische kolom gewoon als tekst; voor Parquet
+# worden ze vóór het schrijven teruggezet (zie _zonder_categorieen).
+# -----------------------------------------------------------------------------
+PUNT_ID_MAX_UNIEK = 0.5    # hoogstens de helft verschillend → woordenboek
+PUNT_ID_STEEKPROEF = 1000  # eerst de eerste rijen bekijken (goedkoop)
+
+
+def punt_ids(kolom: pd.Series):
+    if not (pd.api.types.is_string_dtype(kolom) or kolom.dtype == object):
+        return kolom.to_numpy()   # numeriek of al categorisch
+    # Unieke ID's herkennen zonder de hele chunk te hashen
+    steekproef = kolom.iloc[:PUNT_ID_STEEKPROEF]
+    if steekproef.nunique(dropna=False) > len(steekproef) * PUNT_ID_MAX_UNIEK:
+        return kolom.to_numpy()
+    codes, uniek = pd.factorize(kolom)
+    if len(uniek) > len(kolom) * PUNT_ID_MAX_UNIEK:
+        return kolom.to_numpy()
+    # factorize geeft -1 voor een ontbrekende ID; from_codes maakt daar NaN van
+    return pd.Categorical.from_codes(codes, uniek)
+
+
+def bron_kolom(label: str, aantal: int) -> pd.Categorical:
+    # Dezelfde tekst voor elke rij: één woordenboekwaarde, 1 byte per rij
+    return pd.Categorical.from_codes(np.zeros(aantal, dtype=np.int8), [label])
+
+
+def _zonder_categorieen(df: pd.DataFrame) -> pd.DataFrame:
+    # Categorische kolommen terug naar gewone waarden: pyarrow maakt er anders
+    # een dictionary-kolom van waarvan het type per chunk kan verschillen
+    # (int8- of int16-indexen), zodat de chunks niet in één Parquet-bestand passen
+    categorisch = [k for k in df.columns if isinstance(df[k].dtype, pd.CategoricalDtype)]
+    if not categorisch:
+        return df
+    return df.assign(**{k: df[k].astype(df[k].cat.categories.dtype) for k in categorisch})
+
+
+# =============================================================================
+# VERWERK ÉÉN DATAFRAME-CHUNK
+# =============================================================================
+# Dit is de kern van de conversie. De functie krijgt één stuk data binnen
+# (een volledige DataFrame voor kleine bestanden, of een "chunk" van 100.000
+# rijen voor grote bestanden) en geeft een getransformeerd DataFrame terug.
+#
+# Parameters:
+#   chunk        : het stukje data om te verwerken
+#   transformer  : het pyproj Transformer-object dat de wiskundige conversie doet
+#   instellingen : dictionary met de conversie-opties (zie STANDAARD_INSTELLINGEN)
+#
+# De functie houdt rekening met het aantal kolommen:
+#   2 kolommen : alleen X en Y
+#   3 kolommen : X, Y en Z  (of punt-ID, X, Y als eerste kolom punt is)
+#   4 kolommen : X, Y, Z en een extra variabele  (of punt-ID, X, Y, Z)
+#
+# heeft_naam_kolom: overschrijft de instelling. CGP-bestanden hebben altijd een
+#   naamkolom; die wordt dan automatisch correct behandeld ongeacht de optie.
+# -----------------------------------------------------------------------------
+def verwerk_chunk(chunk, transformer, instellingen: dict, heeft_naam_kolom=None):
+    aantal_kolommen = len(chunk.columns)
+    x_header, y_header = HEADERS[instellingen["stelsel_uit"]]
+
+    # heeft_naam_kolom: None = gebruik de instelling, anders forceer True/False.
+    # chunk.iloc[:, 0] betekent: alle rijen (:), kolom 0
+    # .values geeft een numpy-array terug, wat sneller werkt met pyproj
+    # transform() geeft twee arrays terug: de getransformeerde X en Y waarden
+    if heeft_naam_kolom is None:
+        heeft_naam_kolom = instellingen["naam_kolom"]
+    if instellingen.get("hoogte_in"):
+        # Z gaat mee door de transformer (3D, zie hoogte_transformer)
+        x_output, y_output, z_output = _hoogte_omzetten(chunk, transformer, instellingen, heeft_naam_kolom)
+    elif not heeft_naam_kolom:
+        # standaard: kolom 0 = X, kolom 1 = Y
+        x_output, y_output = transformer.transform(
+            chunk.iloc[:, 0].values,
+            chunk.iloc[:, 1].values
+        )
+    else:
+        # als eerste kolom een punt-ID is: kolom 1 = X, kolom 2 = Y
+        x_output, y_output = transformer.transform(
+            chunk.iloc[:, 1].values,
+            chunk.iloc[:, 2].values
+        )
+
+    # Nieuw DataFrame bouwen met de geconverteerde waarden.
+    # We gebruiken een dictionary: sleutel = kolomnaam, waarde = data.
+    if aantal_kolommen == 2:
+        df_output = pd.DataFrame({x_header: x_output, y_header: y_output})
+
+    elif aantal_kolommen == 3:
+        if not heeft_naam_kolom:
+            # kolom 2 is de Z-waarde (hoogte/diepte)
+            df_output = pd.DataFrame({
+                x_header: x_output,
+                y_header: y_output,
+                'Z': chunk.iloc[:, 2].values
+            })
+        else:
+            # kolom 0 is de punt-ID, geen Z aanwezig
+            df_output = pd.DataFrame({
+                'point': punt_ids(chunk.iloc[:, 0]),
+                x_header: x_output,
+                y_header: y_output
+            })
+
+    elif aantal_kolommen == 4:
+        if not heeft_naam_kolom:
+            # kolom 2 = Z, kolom 3 = extra variabele
+            df_output = pd.DataFrame({
+                x_header: x_output,
+                y_header: y_output,
+                'Z':   chunk.iloc[:, 2].values,
+                'VAR': chunk.iloc[:, 3].values
+            })
+        else:
+            # kolom 0 = punt-ID, kolom 3 = Z
+            df_output = pd.DataFrame({
+                'point': punt_ids(chunk.iloc[:, 0]),
+                x_header: x_output,
+                y_header: y_output,
+                'Z': chunk.iloc[:, 3].values
+            })
+
+    else:
+        raise ValueError(f"Onverwacht aantal kolommen: {aantal_kolommen}. Maximum is 4.")
+
+    if instellingen.get("hoogte_in"):
+        df_output['Z'] = z_output
+
+    # Afronden: WGS84 werkt in graden (kleine getallen), dus 6 decimalen.
+    # Andere stelsels werken in meters, 2 decimalen volstaat (cm-nauwkeurigheid).
+    if instellingen["stelsel_uit"] == "WGS84":
+        df_output[x_header] = df_output[x_header].round(6)
+        df_output[y_header] = df_output[y_header].round(6)
+    else:
+        df_output[x_header] = df_output[x_header].round(2)
+        df_output[y_header] = df_output[y_header].round(2)
+
+    # Z-kolom nabewerken als die aanwezig is
+    if 'Z' in df_output.columns:
+        df_output['Z'] = df_output['Z'].round(2)
+
+        # Diepte omdraaien indien de optie aanstaat
+        if instellingen["diepte"]:
+            df_output = depth_toggle(df_output)
+
+        # Reductievlak correctie indien een richting is gekozen (≠ 0)
+        if instellingen["reductievlak_keuze"] != 0:
+            df_output = lat_to_taw(df_output, instellingen["reductievlak_keuze"],
+                                   instellingen["reductievlak_waarde"])
+            df_output['Z'] = df_output['Z'].round(2)  # opnieuw afronden na correctie
+
+    return df_output
+
+
+def _hoogte_omzetten(chunk, transformer, instellingen: dict, heeft_naam_kolom: bool):
+    # Kolommen zoals in verwerk_chunk: met punt-ID is Z kolom 3, anders kolom 2
+    eerste = 1 if heeft_naam_kolom else 0
+    if len(chunk.columns) < eerste + 3:
+        raise ValueError("Hoogte omzetten vereist een Z-kolom.")
+    z = chunk.iloc[:, eerste + 2].to_numpy(dtype=float)
+    lat_waarde = REDUCTIEVLAK_WAARDES[instellingen["reductievlak_waarde"]]
+    if instellingen["hoogte_in"] == "LAT":
+        z = z - lat_waarde   # LAT → TAW, zoals lat_to_taw
+    x_output, y_output, z_output = transformer.transform(
+        chunk.iloc[:, eerste].values, chunk.iloc[:, eerste + 1].values, z)
+    if instellingen["hoogte_uit"] == "LAT":
+        z_output = z_output + lat_waarde   # TAW → LAT
+    return x_output, y_output, z_output
+
+
+# =============================================================================
+# DUBBELE PUNTEN VERWIJDEREN
+# =============================================================================
+# Samengevoegde meetlijnen bevatten veel punten op (bijna) dezelfde XY-positie.
+# Die worden hier in dezelfde doorgang verwijderd: het eerste punt op een
+# positie blijft, latere punten op dezelfde positie vervallen.
+#
+# Elke positie wordt een geheel getal (sleutel): X en Y gedeeld door de
+# tolerantie en afgerond, samen in één int64. Zonder tolerantie is dat de
+# afronding die verwerk_chunk al doet (2 decimalen, 6 bij WGS84), dus enkel
+# exact gelijke uitvoercoördinaten zijn dan dubbel. Met een tolerantie is het
+# een raster: punten in hetzelfde hok van tolerantie × tolerantie zijn dubbel
+# (twee punten vlak bij elkaar aan weerszijden van een hokgrens niet).
+#
+# De gekende sleutels staan in gesorteerde numpy-reeksen (8 bytes per punt,
+# opzoeken met searchsorted) in plaats van een Python-set (~70 bytes per punt):
+#   - per chunk komt er een kleine reeks bij; zijn er te veel, dan worden ze
+#     samengevoegd tot één reeks
+#   - boven ONTDUBBEL_MAX_SLEUTELS (of max_sleutels, zie geheugen_verdeling)
+#     gaat die reeks naar een .npy-bestand in een tijdelijke map en wordt ze
+#     vandaar gelezen via memory mapping
+#     (het besturingssysteem houdt enkel de gebruikte delen in het geheugen)
+#
+# De toestand hoort bij de oproeper (zoals statistiek): per bestand een
+# nieuwe, of één voor alle bestanden in samenvoegmodus. "verwijderd" telt
+# het aantal verwijderde punten op. Altijd afsluiten met ontdubbelen_sluiten.
+# -----------------------------------------------------------------------------
+ONTDUBBEL_MAX_SLEUTELS = 20_000_000   # ± 160 MB in het geheugen
+ONTDUBBEL_MAX_REEKSEN = 16
+
+
+def ontdubbelen_nieuw(stelsel_uit: str, tolerantie: float = 0,
+                      max_sleutels: int = ONTDUBBEL_MAX_SLEUTELS) -> dict:
+    if tolerantie < 0:
+        raise ValueError(f"Ontdubbelen: tolerantie mag niet negatief zijn, niet {tolerantie}.")
+    if not tolerantie:
+        tolerantie = 1e-6 if stelsel_uit == "WGS84" else 0.01
+    return {"tolerantie": tolerantie, "reeksen": [], "schijf": [], "map": None, "verwijderd": 0,
+            "max_sleutels": max_sleutels}
+
+
+def _sleutel_gekend(reeks: np.ndarray, sleutels: np.ndarray) -> np.ndarray:
+    positie = np.searchsorted(reeks, sleutels)
+    positie[positie == len(reeks)] = len(reeks) - 1
+    return reeks[positie] == sleutels
+
+
+def ontdubbelen_chunk(toestand: dict, df_output: pd.DataFrame, x_header: str, y_header: str) -> pd.DataFrame:
+    x = df_output[x_header].to_numpy(dtype=float)
+    y = df_output[y_header].to_numpy(dtype=float)
+    eindig = np.isfinite(x) & np.isfinite(y)   # niet-transformeerbare punten blijven staan
+    kx = np.rint(x[eindig] / toestand["tolerantie"]).astype(np.int64)
+    ky = np.rint(y[eindig] / toestand["tolerantie"]).astype(np.int64)
+    sleutels = (kx << 32) + (ky & 0xFFFFFFFF)
+
+    # Binnen de chunk: enkel het eerste punt per sleutel (unique is gesorteerd)
+    uniek, eerste = np.unique(sleutels, return_index=True)
+    nieuw = np.ones(len(uniek), dtype=bool)
+    for reeks in toestand["reeksen"] + toestand["schijf"]:
+        if len(reeks):
+            nieuw &= ~_sleutel_gekend(reeks, uniek)
+
+    behouden = np.ones(len(df_output), dtype=bool)
+    behouden_eindig = np.zeros(len(sleutels), dtype=bool)
+    behouden_eindig[eerste[nieuw]] = True
+    behouden[eindig] = behouden_eindig
+    toestand["verwijderd"] += int((~behouden).sum())
+
+    _sleutels_toevoegen(toestand, uniek[nieuw])
+    return df_output[behouden]
+
+
+def _sleutels_toevoegen(toestand: dict, sleutels: np.ndarray):
+    reeksen = toestand["reeksen"]
+    reeksen.append(sleutels)
+    if len(reeksen) > ONTDUBBEL_MAX_REEKSEN:
+        samen = np.concatenate(reeksen)
+        samen.sort()
+        reeksen[:] = [samen]
+    if sum(len(r) for r in reeksen) > toestand["max_sleutels"]:
+        # Geheugen vol: alles naar schijf en verder lezen via memory mapping
+        samen = np.concatenate(reeksen)
+        samen.sort()
+        if toestand["map"] is None:
+            toestand["map"] = tempfile.mkdtemp(prefix="ontdubbelen_")
+        pad = Path(toestand["map"]) / f"sleutels_{len(toestand['schijf'])}.npy"
+        np.save(pad, samen)
+        toestand["schijf"].append(np.load(pad, mmap_mode="r"))
+        reeksen.clear()
+
+
+def ontdubbelen_sluiten(toestand: dict):
+    # Eerst de memory maps loslaten, anders kan Windows de bestanden niet verwijderen
+    toestand["reeksen"].clear()
+    toestand["schijf"].clear()
+    if toestand["map"] is not None:
+        shutil.rmtree(toestand["map"], ignore_errors=True)
+        toestand["map"] = None
+
+
+# =============================================================================
+# UITDUNNEN TIJDENS DE CONVERSIE
+# =============================================================================
+# Voor overzichtsproducten zijn niet alle tientallen miljoenen punten nodig.
+# In plaats van achteraf uit te dunnen (nog een volledige ronde over de data)
+# gebeurt het hier per chunk, meteen na verwerk_chunk:
+#
+#   elke_n          : enkel elk N-de punt behouden (telt door over de chunks)
+#   raster_min/max/gemiddeld :
+#                     één punt per rastercel (celgrootte in eenheden van het
+#                     uitvoerstelsel) in het midden van de cel, met de
+#                     minimale, maximale of gemiddelde Z van de cel
+#   ondiepste       : per rastercel het echte punt met de hoogste Z behouden
+#                     (Z als hoogte, LAT negatief: hoogste Z = ondiepste punt),
+#                     inclusief punt-ID en eventuele extra kolommen. Met
+#                     "diepte" heeft verwerk_chunk het teken van Z al
+#                     omgedraaid (diepte positief): dan is de laagste Z het
+#                     ondiepste punt.
+#
+# Voor de rastermethodes wordt per cel enkel een kleine accumulator
+# bijgehouden (aantal, som, min, max, of het beste punt). Het geheugen hangt
+# dus af van het aantal bezette cellen, niet van het aantal punten. De cellen
+# worden pas na de laatste chunk weggeschreven (uitdunnen_afronden).
+# Punten zonder geldige X/Y of Z vallen in geen enkele cel en vervallen.
+# -----------------------------------------------------------------------------
+UITDUN_METHODES = {
+    "geen uitdunning":          None,
+    "elke N-de punt":           "elke_n",
+    "raster: minimum Z":        "raster_min",
+    "raster: maximum Z":        "raster_max",
+    "raster: gemiddelde Z":     "raster_gemiddeld",
+    "raster: ondiepste punt":   "ondiepste",
+}
+
+
+def uitdunnen_nieuw(instellingen: dict):
+    # Toestand voor één uitvoerbestand; None als er niet uitgedund wordt.
+    methode = instellingen.get("uitdunnen")
+    if not methode:
+        return None
+    waarde = instellingen["uitdun_waarde"]
+    if methode == "elke_n" and (int(waarde) != waarde or waarde < 1):
+        raise ValueError(f"Uitdunnen: N moet een geheel getal van 1 of meer zijn, niet {waarde}.")
+    if waarde <= 0:
+        raise ValueError(f"Uitdunnen: celgrootte moet groter dan 0 zijn, niet {waarde}.")
+    return {"methode": methode, "waarde": waarde, "teller": 0, "cellen": None,
+            "diepte": bool(instellingen["diepte"])}
+
+
+def _cel_sleutel(df: pd.DataFrame, x_header: str, y_header: str, grootte: float) -> np.ndarray:
+    # Kolom- en rijnummer samen in één int64, zodat groupby op één sleutel werkt
+    kolom = np.floor(df[x_header].to_numpy() / grootte).astype(np.int64)
+    rij = np.floor(df[y_header].to_numpy() / grootte).astype(np.int64)
+    return (kolom << 32) + (rij & 0xFFFFFFFF)
+
+
+def uitdunnen_chunk(toestand: dict, df_output: pd.DataFrame, x_header: str, y_header: str) -> pd.DataFrame:
+    # Geeft terug wat nu al weggeschreven kan worden (leeg bij de rastermethodes).
+    methode = toestand["methode"]
+    if methode == "elke_n":
+        n = int(toestand["waarde"])
+        volgnummers = toestand["teller"] + np.arange(len(df_output))
+        toestand["teller"] += len(df_output)
+        return df_output[volgnummers % n == 0]
+
+    if "Z" not in df_output.columns:
+        raise ValueError("Uitdunnen per raster vereist een Z-kolom.")
+    geldig = np.isfinite(df_output[x_header]) & np.isfinite(df_output[y_header]) & np.isfinite(df_output["Z"])
+    df = df_output[geldig]
+    sleutel = _cel_sleutel(df, x_header, y_header, toestand["waarde"])
+
+    if methode == "ondiepste":
+        # Beste punt per cel uit (vorige beste punten + deze chunk)
+        df = df.assign(_cel=sleutel)
+        if toestand["cellen"] is not None:
+            df = pd.concat([toestand["cellen"], df], ignore_index=True)
+        else:
+            df = df.reset_index(drop=True)
+        groepen = df.groupby("_cel", sort=False)["Z"]
+        toestand["cellen"] = df.loc[groepen.idxmin() if toestand["diepte"] else groepen.idxmax()]
+    else:
+        # Accumulator per cel: aantal, som, min en max van Z
+        deel = df["Z"].groupby(sleutel, sort=False).agg(["count", "sum", "min", "max"])
+        if toestand["cellen"] is not None:
+            deel = pd.concat([toestand["cellen"], deel]).groupby(level=0, sort=False).agg(
+                {"count": "sum", "sum": "sum", "min": "min", "max": "max"})
+        toestand["cellen"] = deel
+    return df_output.iloc[0:0]
+
+
+def uitdunnen_afronden(toestand: dict, x_header: str, y_header: str, stelsel_uit: str):
+    # Na de laatste chunk: de rastercellen als punten teruggeven (of None).
+    # Zonder één enkele chunk (bijv. een leeg werkblad) is er niets terug te geven.
+    cellen = toestand["cellen"]
+    if toestand["methode"] == "elke_n" or cellen is None:
+        return None
+    if toestand["methode"] == "ondiepste":
+        return cellen.drop(columns="_cel")
+
+    # Celmidden terugrekenen uit de sleutel (zelfde afronding als verwerk_chunk)
+    grootte = toestand["waarde"]
+    sleutel = cellen.index.to_numpy()
+    kolom = sleutel >> 32
+    rij = (sleutel & 0xFFFFFFFF).astype(np.int32)   # terug naar een getal met teken
+    decimalen = 6 if stelsel_uit == "WGS84" else 2
+    z = {"raster_min": cellen["min"], "raster_max": cellen["max"],
+         "raster_gemiddeld": cellen["sum"] / cellen["count"]}[toestand["methode"]]
+    return pd.DataFrame({
+        x_header: np.round((kolom + 0.5) * grootte, decimalen),
+        y_header: np.round((rij + 0.5) * grootte, decimalen),
+        "Z": np.round(z.to_numpy(), 2),
+    })
+
+
+# =============================================================================
+# RUIMTELIJK SORTEREN (OOK BESTANDEN GROTER DAN HET GEHEUGEN)
+# =============================================================================
+# Rastersoftware leest punten veel sneller als ze ruimtelijk geordend zijn:
+# punten die dicht bij elkaar liggen, staan dan ook dicht bij elkaar in het
+# bestand. Elk punt krijgt daarvoor een sleutel uit zijn uitvoercoördinaten:
+#   morton  : Z-volgorde, de bits van X en Y om beurten (snel te berekenen)
+#   hilbert : Hilbertkromme, nog betere nabijheid (geen sprongen tussen
+#             kwadranten), iets meer rekenwerk
+# X en Y worden eerst afgerond op een raster van 1 cm (1e-6 graden bij
+# WGS84), de afronding van verwerk_chunk, met 32 bits per as.
+#
+# Sorteren gebeurt extern ("external merge sort"), met een vaste bovengrens
+# voor het geheugen:
+#   1. de chunks worden verzameld tot ze samen SORTEER_GEHEUGEN bytes
+#      innemen (of minder, zie geheugen_verdeling); dat stuk wordt gesorteerd en als "run" in blokken van
+#      SORTEER_BLOK rijen naar een tijdelijke map geschreven
+#   2. na de laatste chunk worden alle runs samengevoegd: van elke run staat
+#      er telkens één blok in het geheugen. Alles tot de kleinste laatste
+#      sleutel van die blokken kan veilig weggeschreven worden (geen enkele
+#      run heeft daarna nog een kleinere sleutel); het blok dat zo opgebruikt
+#      is, wordt vervangen door het volgende blok van zijn run.
+# Past alles in het geheugen, dan komt er niets op schijf.
+#
+# Sorteren gebeurt per uitvoerbestand, na ontdubbelen en uitdunnen. In
+# samenvoegmodus delen alle invoerbestanden de sortering van het
+# samengevoegde bestand (zie tak_nieuw): de oproeper schrijft die pas weg
+# na het laatste bestand (sorteren_doel_afronden). Tegels worden in
+# gesorteerde volgorde gevuld. CGP-bestanden (polygonen) worden niet
+# gesorteerd: daar is de volgorde van de punten net de vorm.
+# Altijd afsluiten met sorteren_sluiten (ruimt de tijdelijke map op).
+# -----------------------------------------------------------------------------
+SORTEER_METHODES = {
+    "niet sorteren":       None,
+    "Morton (Z-volgorde)": "morton",
+    "Hilbert":             "hilbert",
+}
+SORTEER_GEHEUGEN = 256 * 1024 * 1024   # bytes aan punten per uitvoerbestand
+SORTEER_BLOK = 20_000                  # rijen per blok van een run op schijf
+SORTEER_BITS = 32
+_SLEUTEL = "_sleutel"
+
+
+def sorteren_nieuw(instellingen: dict, max_bytes: int = SORTEER_GEHEUGEN):
+    # Toestand voor één uitvoerbestand; None als er niet gesorteerd wordt.
+    # max_bytes: hoeveel punten er in het geheugen verzameld worden per run
+    methode = instellingen.get("sorteren")
+    if not methode:
+        return None
+    if methode not in SORTEER_METHODES.values():
+        raise ValueError(f"Onbekende sorteermethode {methode!r}. "
+                         f"Mogelijk: {', '.join(m for m in SORTEER_METHODES.values() if m)}")
+    return {"methode": methode, "resolutie": 1e-6 if instellingen["stelsel_uit"] == "WGS84" else 0.01,
+            "buffer": [], "bytes": 0, "max_bytes": max_bytes, "runs": [], "map": None}
+
+
+def _raster_positie(waarden: np.ndarray, resolutie: float) -> np.ndarray:
+    # Coördinaat → geheel getal van 0 tot 2^32 - 1 (0 ligt in het midden, dus
+    # ook negatieve coördinaten). NaN/inf achteraan.
+    maximum = 2 ** SORTEER_BITS - 1
+    positie = np.floor(waarden / resolutie) + 2 ** (SORTEER_BITS - 1)
+    positie = np.nan_to_num(positie, nan=maximum, posinf=maximum, neginf=0)
+    return np.clip(positie, 0, maximum).astype(np.uint64)
+
+
+def _bits_spreiden(v: np.ndarray) -> np.ndarray:
+    # 32 bits naar de even bitposities van een 64-bitsgetal
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def _hilbert(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    # Afstand langs de Hilbertkromme (klassiek algoritme "xy2d", per bit
+    # van hoog naar laag, voor alle punten tegelijk)
+    x, y = x.copy(), y.copy()
+    n_min_1 = np.uint64(2 ** SORTEER_BITS - 1)
+    d = np.zeros(len(x), dtype=np.uint64)
+    for bit in range(SORTEER_BITS - 1, -1, -1):
+        s = np.uint64(1 << bit)
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += (s * s) * ((3 * rx.astype(np.uint64)) ^ ry.astype(np.uint64))
+        # Kwadrant draaien zodat de deelkromme weer dezelfde vorm heeft
+        spiegelen = rx & ~ry
+        x[spiegelen] = n_min_1 - x[spiegelen]
+        y[spiegelen] = n_min_1 - y[spiegelen]
+        wisselen = ~ry
+        x[wisselen], y[wisselen] = y[wisselen], x[wisselen].copy()
+    return d
+
+
+def sorteer_sleutel(df: pd.DataFrame, x_header: str, y_header: str, methode: str,
+                    resolutie: float) -> np.ndarray:
+    x = _raster_positie(df[x_header].to_numpy(dtype=float), resolutie)
+    y = _raster_positie(df[y_header].to_numpy(dtype=float), resolutie)
+    if methode == "hilbert":
+        return _hilbert(x, y)
+    return _bits_spreiden(x) | (_bits_spreiden(y) << np.uint64(1))
+
+
+def sorteren_chunk(toestand: dict, df_output: pd.DataFrame, x_header: str, y_header: str):
+    sleutel = sorteer_sleutel(df_output, x_header, y_header, toestand["methode"], toestand["resolutie"])
+    df_output = df_output.assign(**{_SLEUTEL: sleutel})
+    toestand["buffer"].append(df_output)
+    toestand["bytes"] += int(df_output.memory_usage(deep=True).sum())
+    if toestand["bytes"] >= toestand["max_bytes"]:
+        _run_wegschrijven(toestand)
+
+
+def _buffer_gesorteerd(toestand: dict) -> pd.DataFrame:
+    df = pd.concat(toestand["buffer"], ignore_index=True)
+    toestand["buffer"].clear()
+    toestand["bytes"] = 0
+    return df.sort_values(_SLEUTEL, kind="stable", ignore_index=True)
+
+
+def _run_wegschrijven(toestand: dict):
+    df = _buffer_gesorteerd(toestand)
+    if toestand["map"] is None:
+        toestand["map"] = tempfile.mkdtemp(prefix="sorteren_")
+    run = []
+    for begin in range(0, len(df), SORTEER_BLOK):
+        pad = Path(toestand["map"]) / f"run_{len(toestand['runs'])}_{len(run)}.pkl"
+        df.iloc[begin:begin + SORTEER_BLOK].to_pickle(pad)
+        run.append(pad)
+    toestand["runs"].append(run)
+
+
+def sorteren_afronden(toestand: dict):
+    # Generator: de punten in gesorteerde volgorde, in blokken (zonder sleutel)
+    if not toestand["runs"]:
+        if toestand["buffer"]:
+            df = _buffer_gesorteerd(toestand).drop(columns=_SLEUTEL)
+            for begin in range(0, len(df), CHUNK_RIJEN):
+                yield df.iloc[begin:begin + CHUNK_RIJEN]
+        return
+    if toestand["buffer"]:
+        _run_wegschrijven(toestand)
+
+    # Samenvoegen: per run een iterator over de blokken en het huidige blok
+    runs = [iter(run) for run in toestand["runs"]]
+    blokken = [pd.read_pickle(next(run)) for run in runs]
+    while runs:
+        grens = min(blok[_SLEUTEL].iloc[-1] for blok in blokken)
+        delen = []
+        for i, blok in enumerate(blokken):
+            n = int(np.searchsorted(blok[_SLEUTEL].to_numpy(), grens, side="right"))
+            delen.append(blok.iloc[:n])
+            blokken[i] = blok.iloc[n:]
+        # Opgebruikte blokken vervangen door het volgende blok van hun run
+        for i in reversed(range(len(runs))):
+            if len(blokken[i]) == 0:
+                volgend = next(runs[i], None)
+                if volgend is None:
+                    del runs[i], blokken[i]
+                else:
+                    blokken[i] = pd.read_pickle(volgend)
+        yield pd.concat(delen, ignore_index=True).sort_values(
+            _SLEUTEL, kind="stable", ignore_index=True).drop(columns=_SLEUTEL)
+
+
+def uitdunnen_doel_afronden(toestand: dict, doel: dict, instellingen: dict, statistiek=None,
+                            sortering=None, schrijver=None):
+    # Samenvoegmodus: de gedeelde rastercellen na het laatste invoerbestand
+    # in het samengevoegde doel schrijven, of bij sorteren eerst aan de
+    # gedeelde sortering geven (die schrijft sorteren_doel_afronden weg).
+    x_header, y_header = HEADERS[instellingen["stelsel_uit"]]
+    df_output = uitdunnen_afronden(toestand, x_header, y_header, instellingen["stelsel_uit"])
+    if df_output is None or not len(df_output):
+        return
+    if statistiek is not None:
+        statistiek_bijwerken(statistiek, df_output, x_header, y_header)
+    if sortering is not None:
+        sorteren_chunk(sortering, df_output, x_header, y_header)
+        return
+    doel_schrijven(doel, df_output, instellingen, None if doel["parquet"] or doel["vector"] else schrijver)
+    if schrijver is not None:
+        schrijver.wacht()
+
+
+def sorteren_doel_afronden(toestand: dict, doel: dict, instellingen: dict, schrijver=None):
+    # Samenvoegmodus: de gedeelde sortering na het laatste invoerbestand in
+    # het samengevoegde doel schrijven. Bij terugkeer staat alles op schijf.
+    for df_output in sorteren_afronden(toestand):
+        doel_schrijven(doel, df_output, instellingen, None if doel["parquet"] or doel["vector"] else schrijver)
+    if schrijver is not None:
+        schrijver.wacht()
+
+
+def sorteren_sluiten(toestand: dict):
+    toestand["buffer"].clear()
+    toestand["runs"].clear()
+    if toestand["map"] is not None:
+        shutil.rmtree(toestand["map"], ignore_errors=True)
+        toestand["map"] = None
+
+
+# =============================================================================
+# UITVOERDOEL: ÉÉN BESTAND PER INVOER OF ALLES SAMENGEVOEGD
+# =============================================================================
+# Een uitvoerdoel is een dictionary die bijhoudt waar de chunks naartoe gaan:
+#   pad     : het uitvoerbestand
+#   parquet : True bij extensie .parquet (kolomformaat, via pyarrow)
+#   gestart : er is al iets geschreven (bepaalt mode 'w'/'a' en de titelrij)
+#   writer  : pyarrow ParquetWriter, pas geopend bij de eerste chunk
+#   stroom  : open gecomprimeerd tekstbestand (zie compressie.uitvoer_openen)
+#             als er zonder schrijf-thread geschreven wordt
+#   vector  : True bij extensie .gpkg (GeoPackage, zie geopackage)
+#   gpkg    : open GeoPackage, pas aangemaakt bij de eerste chunk
+#
+# Normaal maakt conversie_een_bestand per invoerbestand een eigen doel aan.
+# In samenvoegmodus geeft de oproeper één doel mee voor ALLE bestanden: de
+# titelrij komt dan maar één keer bovenaan en de bestanden volgen elkaar op
+# in de volgorde waarin ze aangeboden worden. Zo is er geen aparte
+# samenvoegstap (nog een volledige lees- en schrijfronde) meer nodig.
+# De oproeper sluit een eigen doel af met doel_afsluiten().
+#
+# Eindigt het pad op .gz, .zst of .xz, dan wordt de tekst tijdens het
+# schrijven ingepakt: door de schrijf-thread als die er is (het inpakken
+# overlapt dan met de conversie), anders via doel["stroom"].
+#
+# Parquet is optioneel: pyarrow wordt pas geïmporteerd als het nodig is.
+# Alle chunks moeten dezelfde kolommen hebben; bestanden met een andere
+# indeling (bijv. wel/geen punt-ID) kunnen niet in één Parquet-bestand.
+# Hetzelfde geldt voor een GeoPackage: de punten komen in één tabel met de
+# overige kolommen (punt-ID, Z, VAR, bron) als attributen. De ruimtelijke
+# index wordt pas bij doel_afsluiten opgebouwd.
+# -----------------------------------------------------------------------------
+BRON_KOLOM = "bron"
+
+
+def uitvoer_doel(pad) -> dict:
+    parquet = zonder_compressie(pad).suffix.lower() == ".parquet"
+    if parquet and compressie(pad):
+        raise ValueError("Parquet is zelf al gecomprimeerd; kies geen extra .gz/.zst/.xz.")
+    vector = is_geopackage(zonder_compressie(pad))
+    if vector and compressie(pad):
+        raise ValueError("Een GeoPackage kan niet gecomprimeerd worden; kies geen extra .gz/.zst/.xz.")
+    return {"pad": str(pad), "parquet": parquet, "gestart": False, "writer": None, "stroom": None,
+            "vector": vector, "gpkg": None}
+
+
+def doel_schrijven(doel: dict, df_output: pd.DataFrame, instellingen: dict, schrijver=None):
+    if doel["parquet"]:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Voor Parquet-uitvoer is het pakket pyarrow nodig.") from None
+        tabel = pa.Table.from_pandas(_zonder_categorieen(df_output), preserve_index=False)
+        if doel["writer"] is None:
+            doel["writer"] = pq.ParquetWriter(doel["pad"], tabel.schema)
+        elif tabel.schema != doel["writer"].schema:
+            raise ValueError("Kolommen verschillen van de vorige bestanden: "
+                             f"{tabel.schema.names} i.p.v. {doel['writer'].schema.names}")
+        doel["writer"].write_table(tabel)   # elke chunk wordt een row group
+        doel["gestart"] = True
+        return
+
+    if doel["vector"]:
+        # GeoPackage: elke chunk is één transactie
+        if doel["gpkg"] is None:
+            doel["gpkg"] = gpkg_openen(doel["pad"], CRS_CODES[instellingen["stelsel_uit"]])
+        gpkg_punten(doel["gpkg"], _zonder_categorieen(df_output), *HEADERS[instellingen["stelsel_uit"]])
+        doel["gestart"] = True
+        return
+
+    # Tekstuitvoer:
+    #   eerste chunk → 'w': nieuw bestand aanmaken (overschrijft bestaand)
+    #   volgende chunks → 'a': achteraan toevoegen aan het bestand
+    # De header (kolomnamen) schrijven we enkel bij de eerste chunk.
+    schrijf_header = instellingen["titelrij_uit"] and not doel["gestart"]
+    mode: Literal["w", "a"] = 'a' if doel["gestart"] else 'w'
+    if schrijver is not None:
+        # Tekst aanmaken en het schrijven aan de schrijf-thread overlaten
+        schrijver.schrijf(doel["pad"], mode, df_output.to_csv(
+            index=False, sep=instellingen["separator_uit"], decimal=instellingen["decimal_uit"],
+            header=schrijf_header))
+    elif compressie(doel["pad"]):
+        # Gecomprimeerd: het bestand blijft open tot doel_afsluiten
+        if doel["stroom"] is None:
+            doel["stroom"] = uitvoer_openen(doel["pad"], mode)
+        doel["stroom"].write(df_output.to_csv(
+            index=False, sep=instellingen["separator_uit"], decimal=instellingen["decimal_uit"],
+            header=schrijf_header).encode("utf-8"))
+    else:
+        df_output.to_csv(doel["pad"], index=False, sep=instellingen["separator_uit"],
+                         decimal=instellingen["decimal_uit"], header=schrijf_header, mode=mode)
+    doel["gestart"] = True
+
+
+def doel_afsluiten(doel: dict):
+    # Parquet houdt een bestand open (de writer schrijft de footer bij het
+    # sluiten), net als gecomprimeerde tekst zonder schrijf-thread. Een
+    # GeoPackage krijgt bij het sluiten nog zijn ruimtelijke index.
+    if doel["gpkg"] is not None:
+        gpkg_afsluiten(doel["gpkg"])
+        doel["gpkg"] = None
+    if doel["writer"] is not None:
+        doel["writer"].close()
+        doel["writer"] = None
+    if doel["stroom"] is not None:
+        doel["stroom"].close()
+        doel["stroom"] = None
+
+
+# =============================================================================
+# CONVERSIE VAN ÉÉN BESTAND
+# =============================================================================
+# Verwerkt één invoerbestand volledig en schrijft het resultaat weg.
+# Voor grote bestanden wordt pandas' chunksize-functie gebruikt:
+# in plaats van het hele bestand in één keer in te laden, leest pandas
+# telkens 100.000 rijen. Elke batch wordt direct weggeschreven, waarna
+# het geheugen vrijgegeven wordt. Zo blijft het RAM-gebruik laag.
+#
+# Het uitvoerbestand wordt chunk per chunk opgebouwd via doel_schrijven.
+#
+# Geeft het aantal verwerkte rijen terug. Optionele parameters:
+# statistiek: dictionary van statistiek_nieuw(). Per chunk worden bounding
+#   box, Z-bereik en NaN/inf-tellingen erin bijgewerkt.
+# voortgang: dictionary met tellers "rijen" en "bytes" die na elke chunk
+#   verhoogd worden (de GUI leest die uit voor de snelheidsweergave).
+# stop_event: threading.Event; is het gezet, dan wordt na de huidige chunk
+#   ConversieGeannuleerd opgeworpen. De oproeper ruimt de uitvoer op.
+# invoer_data: de volledige inhoud van het invoerbestand als bytes, als die
+#   al vooruit gelezen werd (zie batch_planner). Dan wordt niet van schijf gelezen.
+# schrijver: een batch_planner.AchtergrondSchrijver. De chunks worden dan als
+#   tekst aan de schrijf-thread doorgegeven in plaats van zelf weggeschreven.
+#   Bij terugkeer staat alles op schijf (schrijver.wacht()).
+# doel: uitvoerdoel van uitvoer_doel() voor de samenvoegmodus. Alle
+#   bestanden worden dan achter elkaar in doel["pad"] geschreven en
+#   output_pad wordt niet gebruikt. De oproeper sluit het doel af.
+# bron_label: indien opgegeven wordt een kolom "bron" met deze tekst
+#   toegevoegd, zodat elke rij in een samengevoegd bestand herleidbaar blijft.
+# ontdubbeling: toestand van ontdubbelen_nieuw(). Dubbele punten worden dan
+#   verwijderd (vóór het uitdunnen); het aantal staat in ontdubbeling["verwijderd"].
+# blad: bij een Excel-werkmap (.xlsx, .xlsm) het werkblad dat geconverteerd
+#   wordt; None = het eerste. De batch roept dit op per werkblad.
+#
+# Met instellingen["tegel_grootte"] wordt de uitvoer per chunk verdeeld over
+# tegelbestanden in de map "<naam>_tegels" (zie tegels_schrijven) in plaats
+# van één uitvoerbestand. Dat geldt niet voor CGP-bestanden (die zijn klein).
+# Met instellingen["uitdunnen"] gaat elke chunk eerst door uitdunnen_chunk.
+# Met instellingen["sorteren"] wordt de uitvoer ruimtelijk geordend (zie
+# sorteren_chunk); er wordt dan pas na de laatste chunk geschreven.
+# Uitdunnen en ontdubbelen gelden niet voor CGP-bestanden: de punten van een
+# werkgebied (polygoon) moeten allemaal blijven.
+# Het teruggegeven aantal rijen is dan het aantal weggeschreven punten.
+# -----------------------------------------------------------------------------
+CHUNK_RIJEN = 100_000
+
+
+class ConversieGeannuleerd(Exception):
+    # Wordt opgeworpen wanneer de gebruiker op Stop klikt tijdens een bestand.
+    pass
+
+
+def conversie_een_bestand(input_pad, output_pad, instellingen: dict, statistiek=None,
+                          voortgang=None, stop_event=None, invoer_data=None, schrijver=None,
+                          doel=None, bron_label=None, ontdubbeling=None, blad=None) -> int:
+    tak = tak_nieuw(instellingen, output_pad, statistiek, doel, ontdubbeling)
+    return conversie_meerdere_stelsels(input_pad, [tak], voortgang, stop_event,
+                                       invoer_data, schrijver, bron_label, blad)[0]
+
+
+# =============================================================================
+# GEHEUGENBUDGET
+# =============================================================================
+# Op de veldlaptops (8 GB, met andere programma's open) mag een nachtelijke
+# batch niet door een tekort aan geheugen afgebroken worden. Met
+# instellingen["geheugen_mb"] wordt één budget voor het hele proces verdeeld
+# over alles wat met de grootte van de invoer meegroeit:
+#   vooruit     : voorgelezen invoerbestanden (batch_planner)
+#   schrijven   : tekst die nog op de schrijf-thread wacht (back-pressure)
+#   chunks      : de ingelezen chunk plus de tussenresultaten van elke tak
+#   sorteren    : punten die per run in het geheugen gesorteerd worden
+#   ontdubbelen : gekende sleutels; daarboven via memory mapping van schijf
+# Het vaste deel (Python, pandas, pyproj met zijn rasters) telt als
+# GEHEUGEN_BASIS_MB mee. Sorteren en ontdubbelen houden per uitvoerstelsel
+# een eigen toestand bij, de chunks een eigen resultaat per tak: die
+# aandelen worden over het aantal takken verdeeld.
+#
+# Werkprocessen voor de transformatie (instellingen["processen"], zie
+# procestransformatie) laden elk zelf Python, pandas en PROJ en kosten elk
+# GEHEUGEN_PROCES_MB. Ze gaan eerst van het budget af; er worden er niet
+# meer gestart dan er passen met minstens GEHEUGEN_MIN_MB voor het
+# hoofdproces. Past er geen tweede meer, dan transformeert het hoofdproces
+# zelf (processen None in de verdeling).
+#
+# Een klein budget maakt de conversie trager (kleinere chunks, meer runs en
+# sleutels op schijf, minder vooruit lezen), niet fout: de uitvoer blijft
+# identiek. Zonder budget (None) gelden de vaste standaardwaarden.
+# -----------------------------------------------------------------------------
+GEHEUGEN_BASIS_MB = 150
+GEHEUGEN_MIN_MB = 256
+GEHEUGEN_AANDELEN = {
+    "vooruit":     0.20,
+    "schrijven":   0.10,
+    "chunks":      0.25,
+    "sorteren":    0.25,
+    "ontdubbelen": 0.20,
+}
+GEHEUGEN_PER_RIJ = 400         # bytes per rij in een chunk, met tussenresultaten (gemeten ± 250)
+GEHEUGEN_PER_SLEUTEL = 16      # 8 bytes per sleutel, plus een kopie tijdens het samenvoegen
+GEHEUGEN_PROCES_MB = 120       # per werkproces (gemeten ± 90, zonder geoïdemodel)
+CHUNK_MIN_RIJEN = 5_000
+
+
+def geheugen_verdeling(geheugen_mb=None, takken: int = 1, processen=None) -> dict:
+    # Grenzen in rijen/bytes/sleutels, en het aantal werkprocessen (None:
+    # in het hoofdproces). vooruit en schrijven zijn None zonder budget: de
+    # batch gebruikt dan zijn eigen instellingen.
+    processen = processen if processen and processen > 1 else None
+    if not geheugen_mb:
+        return {"chunk_rijen": CHUNK_RIJEN, "sorteer_bytes": SORTEER_GEHEUGEN,
+                "ontdubbel_sleutels": ONTDUBBEL_MAX_SLEUTELS, "vooruit_bytes": None, "schrijf_bytes": None,
+                "processen": processen}
+    if geheugen_mb < GEHEUGEN_MIN_MB:
+        raise ValueError(f"Geheugenbudget: geef minstens {GEHEUGEN_MIN_MB} MB op, niet {geheugen_mb}.")
+    if processen:
+        processen = min(processen, (geheugen_mb - GEHEUGEN_MIN_MB) // GEHEUGEN_PROCES_MB)
+        processen = processen if processen > 1 else None
+    vrij = (geheugen_mb - GEHEUGEN_BASIS_MB - (processen or 0) * GEHEUGEN_PROCES_MB) * 1024 * 1024
+    takken = max(takken, 1)
+
+    def aandeel(soort, per_tak=False):
+        return int(vrij * GEHEUGEN_AANDELEN[soort] / (takken if per_tak else 1))
+
+    # De ingelezen chunk plus per tak een resultaat van dezelfde grootte
+    chunk_rijen = aandeel("chunks") // (GEHEUGEN_PER_RIJ * (1 + takken))
+    return {
+        "chunk_rijen":        max(CHUNK_MIN_RIJEN, min(CHUNK_RIJEN, chunk_rijen)),
+        "sorteer_bytes":      min(SORTEER_GEHEUGEN, aandeel("sorteren", per_tak=True)),
+        "ontdubbel_sleutels": min(ONTDUBBEL_MAX_SLEUTELS, aandeel("ontdubbelen", per_tak=True) // GEHEUGEN_PER_SLEUTEL),
+        "vooruit_bytes":      aandeel("vooruit"),
+        "schrijf_bytes":      aandeel("schrijven"),
+        "processen":          processen,
+    }
+
+
+# =============================================================================
+# ÉÉN KEER LEZEN, NAAR MEERDERE STELSELS SCHRIJVEN
+# =============================================================================
+# Dezelfde levering is vaak nodig in L72, L2008 én WGS84. Het inlezen (CSV
+# ontleden) is de duurste stap, dus in plaats van het bestand drie keer te
+# converteren wordt elke chunk één keer gelezen en daarna per "tak" omgezet
+# en weggeschreven. Een tak is één uitvoer, een dictionary met:
+#   instellingen : conversie-instellingen van deze uitvoer (met eigen
+#                  stelsel_uit; kolomnamen en afronding volgen daaruit)
+#   output_pad   : uitvoerbestand (bij tegels: basis voor de tegelmap)
+#   statistiek, doel, ontdubbeling : zoals bij conversie_een_bestand
+#   uitdunning   : samenvoegmodus met uitdunnen: de toestand van
+#                  uitdunnen_nieuw() voor het samengevoegde bestand, gedeeld
+#                  door alle invoerbestanden (één punt per cel over alle
+#                  bestanden samen). De oproeper schrijft de cellen na het
+#                  laatste bestand weg (uitdunnen_doel_afronden).
+#   sortering    : samenvoegmodus met sorteren: de toestand van
+#                  sorteren_nieuw() voor het samengevoegde bestand, gedeeld
+#                  door alle invoerbestanden. De punten worden daar enkel
+#                  verzameld; de oproeper schrijft ze na het laatste bestand
+#                  weg (sorteren_doel_afronden) en sluit ze (sorteren_sluiten).
+# De invoeropties (stelsel_in, scheidingsteken, titelrij, ...) komen uit de
+# eerste tak en moeten voor alle takken gelijk zijn.
+#
+# Geeft per tak het aantal weggeschreven rijen terug, in dezelfde volgorde.
+# -----------------------------------------------------------------------------
+def tak_nieuw(instellingen: dict, output_pad, statistiek=None, doel=None, ontdubbeling=None,
+              sortering=None, uitdunning=None) -> dict:
+    return {"instellingen": instellingen, "output_pad": output_pad, "statistiek": statistiek,
+            "doel": doel, "ontdubbeling": ontdubbeling, "sortering": sortering, "uitdunning": uitdunning}
+
+
+def conversie_meerdere_stelsels(input_pad, takken: list, voortgang=None, stop_event=None,
+                                invoer_data=None, schrijver=None, bron_label=None, blad=None) -> list:
+    if voortgang is None:
+        voortgang = {"rijen": 0, "bytes": 0}
+
+    # Werktoestand per tak: de tak van de oproeper zelf blijft ongewijzigd
+    verdeling = geheugen_verdeling(takken[0]["instellingen"].get("geheugen_mb"), len(takken),
+                                   takken[0]["instellingen"].get("processen"))
+    werk = []
+    try:
+        for tak in takken:
+            werk.append(_tak_voorbereiden(tak, verdeling))
+        _conversie_naar_takken(input_pad, werk, voortgang, stop_event, invoer_data,
+                               schrijver, bron_label, verdeling["chunk_rijen"], blad)
+    finally:
+        for t in werk:
+            if t["sortering"] is not None and t["eigen_sortering"]:
+                sorteren_sluiten(t["sortering"])
+            if t["eigen_doel"]:
+                doel_afsluiten(t["doel"])
+    return [t["rijen"] for t in werk]
+
+
+def _tak_voorbereiden(tak: dict, verdeling: dict) -> dict:
+    instellingen = tak["instellingen"]
+    tegel_grootte = instellingen["tegel_grootte"]
+    doel = tak["doel"]
+    if doel is not None and tegel_grootte:
+        raise ValueError("Tegeluitvoer en samenvoegen kunnen niet samen.")
+    if doel is not None and zonder_compressie(doel["pad"]).suffix.lower() == ".wkt":
+        raise ValueError("WKT-uitvoer bevat één polygoon per bestand en kan niet samengevoegd worden.")
+    eigen_doel = doel is None
+    if eigen_doel:
+        doel = uitvoer_doel(tak["output_pad"])
+    if tegel_grootte and (doel["parquet"] or doel["vector"]):
+        raise ValueError("Tegeluitvoer is enkel mogelijk als tekstbestand, niet als Parquet of GeoPackage.")
+    if tegel_grootte and compressie(doel["pad"]):
+        raise ValueError("Tegeluitvoer kan niet gecomprimeerd worden.")
+    hoogte_controleren(instellingen)
+
+    x_header, y_header = HEADERS[instellingen["stelsel_uit"]]
+    eigen_sortering = tak.get("sortering") is None
+    eigen_uitdunning = tak.get("uitdunning") is None
+    return {
+        **tak,
+        "doel":          doel,
+        "eigen_doel":    eigen_doel,
+        "x_header":      x_header,
+        "y_header":      y_header,
+        "transformer":   transformer_maken(instellingen["stelsel_in"], instellingen["stelsel_uit"],
+                                           instellingen.get("snel_raster", False),
+                                           instellingen.get("hoogte_in"), instellingen.get("hoogte_uit"),
+                                           verdeling["processen"]),
+        "uitdunning":    uitdunnen_nieuw(instellingen) if eigen_uitdunning else tak["uitdunning"],
+        "eigen_uitdunning": eigen_uitdunning,
+        "sortering":     (sorteren_nieuw(instellingen, verdeling["sorteer_bytes"]) if eigen_sortering
+                          else tak["sortering"]),
+        "eigen_sortering": eigen_sortering,
+        "tegel_tellers": {},   # (kolom, rij) → aantal punten, enkel bij tegeluitvoer
+        "rijen":         0,
+    }
+
+
+def _tak_schrijven(t: dict, df_output: pd.DataFrame, schrijver):
+    # Statistiek en rijen meteen bijwerken: ook bij sorteren, waar het
+    # wegschrijven (bij samenvoegen pas na het laatste bestand) later volgt
+    if t["statistiek"] is not None:
+        statistiek_bijwerken(t["statistiek"], df_output, t["x_header"], t["y_header"])
+    t["rijen"] += len(df_output)
+    if t["sortering"] is not None:
+        # Eerst alles verzamelen; na de laatste chunk gesorteerd wegschrijven
+        sorteren_chunk(t["sortering"], df_output, t["x_header"], t["y_header"])
+        return
+    _tak_wegschrijven(t, df_output, schrijver)
+
+
+def _tak_wegschrijven(t: dict, df_output: pd.DataFrame, schrijver):
+    instellingen = t["instellingen"]
+    if instellingen["tegel_grootte"]:
+        # Tegeluitvoer: punten verdelen over de tegelbestanden
+        tegels_schrijven(df_output, t["x_header"], t["y_header"], instellingen["tegel_grootte"],
+                         t["output_pad"], t["tegel_tellers"], instellingen["separator_uit"],
+                         instellingen["decimal_uit"], instellingen["titelrij_uit"])
+    else:
+        # Parquet en GeoPackage worden altijd meteen geschreven (geen tekst
+        # voor de schrijf-thread)
+        doel_schrijven(t["doel"], df_output, instellingen,
+                       None if t["doel"]["parquet"] or t["doel"]["vector"] else schrijver)
+
+
+def _conversie_naar_takken(input_pad, werk, voortgang, stop_event, invoer_data, schrijver, bron_label,
+                           chunk_rijen, blad):
+    instellingen = werk[0]["instellingen"]   # invoeropties, gelijk voor alle takken
+
+    # CGP-bestanden hebben een apart inleesformaat en zijn doorgaans klein:
+    # die lezen we in één keer in zonder chunking.
+    if zonder_compressie(input_pad).suffix.lower() == ".cgp":
+        df = cgp_to_dataframe(input_pad)
+        for t in werk:
+            # CGP heeft altijd een naamkolom (kolom 0), ongeacht de optie
+            df_output = verwerk_chunk(df, t["transformer"], t["instellingen"], heeft_naam_kolom=True)
+            if bron_label is not None:
+                df_output[BRON_KOLOM] = bron_kolom(bron_label, len(df_output))
+
+            # WKT-EXPORT (Well-Known Text) — optie voor PDS2000-gebruikers
+            # ---------------------------------------------------------------
+            # WKT is een standaard tekstformaat om geometrieën te beschrijven,
+            # bijv. POLYGON ((4.123 51.456, 4.124 51.457, ...))
+            # Dit is een niche-optie die enkel gebruikt wordt in het hydrografisch
+            # programma PDS2000 (Teledyne RESON). Daarin definieert een CGP-bestand
+            # een werkgebied (polygon) en kan dat als WKT worden geïmporteerd.
+            # De WKT wordt opgebouwd uit de geconverteerde X- en Y-kolommen.
+            if zonder_compressie(t["doel"]["pad"]).suffix.lower() == ".wkt":
+                if t["statistiek"] is not None:
+                    statistiek_bijwerken(t["statistiek"], df_output, t["x_header"], t["y_header"])
+                coords = list(df_output[[t["x_header"], t["y_header"]]].itertuples(index=False, name=None))
+                poly = Polygon(coords)
+                with uitvoer_openen(t["doel"]["pad"], 'w') as f:
+                    f.write(poly.wkt.encode("utf-8"))
+                t["doel"]["gestart"] = True
+                t["rijen"] += len(df_output)
+            elif t["doel"]["vector"]:
+                # In een GeoPackage wordt het werkgebied ook een polygoon
+                if t["statistiek"] is not None:
+                    statistiek_bijwerken(t["statistiek"], df_output, t["x_header"], t["y_header"])
+                if t["doel"]["gpkg"] is None:
+                    t["doel"]["gpkg"] = gpkg_openen(t["doel"]["pad"], CRS_CODES[t["instellingen"]["stelsel_uit"]])
+                gpkg_polygoon(t["doel"]["gpkg"], df_output[t["x_header"]].to_numpy(dtype=float),
+                              df_output[t["y_header"]].to_numpy(dtype=float))
+                t["doel"]["gestart"] = True
+                t["rijen"] += len(df_output)
+            else:
+                doel_schrijven(t["doel"], df_output, t["instellingen"])
+                if t["statistiek"] is not None:
+                    statistiek_bijwerken(t["statistiek"], df_output, t["x_header"], t["y_header"])
+                t["rijen"] += len(df_output)
+        voortgang["rijen"] += len(df)
+        voortgang["bytes"] += Path(input_pad).stat().st_size
+        return  # klaar, geen verdere verwerking nodig
+
+    # Excel-werkmap: één werkblad (blad, None = het eerste), rij per rij
+    # gelezen (zie werkmap). Het zip-bestand geeft geen bruikbare
+    # leespositie, dus de bytes tellen pas mee op het einde.
+    if is_werkmap(input_pad):
+        for chunk in werkblad_chunks(input_pad, blad, instellingen["titelrij_in"], instellingen["decimal_in"],
+                                     chunk_rijen, invoer_data):
+            _chunk_naar_takken(chunk, werk, stop_event, schrijver, bron_label)
+            voortgang["rijen"] += len(chunk)
+        voortgang["bytes"] += len(invoer_data) if invoer_data is not None else Path(input_pad).stat().st_size
+        _takken_afronden(werk, schrijver)
+        return
+
+    # Voor alle andere bestandstypes: sla de titelrij over als de optie aanstaat.
+    # skiprows=1 slaat de eerste rij over vóór het inlezen begint.
+    skiprows = 1 if instellingen["titelrij_in"] else 0
+
+    # pd.read_csv met chunksize geeft geen DataFrame terug, maar een iterator.
+    # Telkens we "for chunk in chunk_iter" doen, leest pandas de volgende
+    # 100.000 rijen in (minder met een klein geheugenbudget). Dit is het sleutelconcept voor geheugenefficiëntie.
+    # Het bestand wordt binair geopend zodat ruw.tell() goedkoop aangeeft hoeveel
+    # bytes er al van schijf gelezen zijn (nodig voor de MB/s-weergave).
+    # Vooruit gelezen data wordt via BytesIO als een bestand aangeboden.
+    # Gecomprimeerde invoer wordt in een eigen thread uitgepakt (zie compressie).
+    bron, ruw = invoer_openen(input_pad, invoer_data)
+    with bron as f:
+        chunk_iter = pd.read_csv(
+            f,
+            delimiter=instellingen["separator_in"],
+            decimal=instellingen["decimal_in"],
+            header=None,          # geen kolomnamen in het bestand zelf inlezen
+            skiprows=skiprows,
+            chunksize=chunk_rijen  # standaard maximaal 100.000 rijen tegelijk in het geheugen
+        )
+
+        gelezen = 0
+        for chunk in chunk_iter:
+            _chunk_naar_takken(chunk, werk, stop_event, schrijver, bron_label)
+
+            # Tellers bijwerken voor de snelheidsweergave in de GUI
+            # (ingelezen rijen, niet weggeschreven rijen)
+            voortgang["rijen"] += len(chunk)
+            positie = ruw.tell()
+            voortgang["bytes"] += positie - gelezen
+            gelezen = positie
+
+    _takken_afronden(werk, schrijver)
+
+
+def _chunk_naar_takken(chunk, werk, stop_event, schrijver, bron_label):
+    # Stop gevraagd: onmiddellijk stoppen, de oproeper ruimt op
+    if stop_event is not None and stop_event.is_set():
+        raise ConversieGeannuleerd()
+
+    # Dezelfde ingelezen chunk door elke tak sturen
+    for t in werk:
+        df_output = verwerk_chunk(chunk, t["transformer"], t["instellingen"])
+        if bron_label is not None:
+            df_output[BRON_KOLOM] = bron_kolom(bron_label, len(df_output))
+        if t["ontdubbeling"] is not None:
+            df_output = ontdubbelen_chunk(t["ontdubbeling"], df_output, t["x_header"], t["y_header"])
+        if t["uitdunning"] is not None:
+            df_output = uitdunnen_chunk(t["uitdunning"], df_output, t["x_header"], t["y_header"])
+        if len(df_output):
+            _tak_schrijven(t, df_output, schrijver)
+
+        # Expliciete del: geef het geheugen onmiddellijk vrij na het schrijven.
+        # Python's garbage collector doet dit normaal automatisch, maar bij
+        # grote DataFrames is het veiliger om het zelf te doen.
+        del df_output
+
+
+def _takken_afronden(werk, schrijver):
+    for t in werk:
+        # Rastercellen van het uitdunnen pas nu wegschrijven. Ook als er geen
+        # enkele cel is, zodat het uitvoerbestand (met titelrij) toch bestaat.
+        # Gedeelde cellen (samenvoegen) schrijft de oproeper na het laatste bestand.
+        if t["uitdunning"] is not None and t["eigen_uitdunning"]:
+            df_output = uitdunnen_afronden(t["uitdunning"], t["x_header"], t["y_header"],
+                                           t["instellingen"]["stelsel_uit"])
+            if df_output is not None and (len(df_output) or not t["doel"]["gestart"]):
+                _tak_schrijven(t, df_output, schrijver)
+        if t["sortering"] is not None and t["eigen_sortering"]:
+            for df_output in sorteren_afronden(t["sortering"]):
+                _tak_wegschrijven(t, df_output, schrijver)
+
+    if schrijver is not None:
+        schrijver.wacht()   # pas klaar als alles op schijf staat
+    for t in werk:
+        tegel_grootte = t["instellingen"]["tegel_grootte"]
+        if tegel_grootte:
+            tegel_index_schrijven(t["tegel_tellers"], tegel_grootte, t["output_pad"],
+                                  t["instellingen"]["separator_uit"], t["instellingen"]["decimal_uit"])
@@ -0,0 +1,194 @@
+# =============================================================================
+# PIJPMODUS: CONVERTEREN VAN STDIN NAAR STDOUT
+# =============================================================================
+# Op de Linux-verwerkingsnodes staat de converter midden in een pijplijn:
+#
+#   zcat tegel.xyz.gz | python conversie_pijp.py --van UTM31 --naar L72 | gridder
+#
+# De invoer komt van stdin, de geconverteerde rijen gaan naar stdout. Er
+# komen geen tijdelijke bestanden aan te pas en het geheugen blijft
+# constant, hoe groot de stroom ook is:
+#   - pandas leest stdin per chunk van CHUNK_RIJEN rijen (zoals de batch)
+#   - elke chunk gaat door verwerk_chunk, dezelfde conversie als de batch en
+#     de conversiedienst
+#   - de tekst gaat via een AchtergrondSchrijver met PIJP_BLOKKEN blokken
+#     naar stdout: het schrijven overlapt met de volgende chunk, en als het
+#     volgende programma trager leest, wacht de conversie (back-pressure)
+#
+# Scheidingstekens worden gekozen met dezelfde labels als de dropdowns van
+# de GUI's (SCHEIDINGSTEKENS, zie scheidingsteken_ophalen/-geven), bijv.
+# --invoer "tab(decimaal punt)" --uitvoer "punt-komma(decimaal komma)".
+# Met --profiel gelden de instellingen van een batchprofiel, ook het
+# ontdubbelen; opties op de opdrachtregel gaan daar boven.
+#
+# Enkel opties die rij per rij werken zijn mogelijk: tegels, sorteren en
+# uitdunnen hebben alle punten nodig en passen niet in een stroom. Ontdubbelen
+# kan wel (de gekende posities gaan zo nodig naar schijf, zie conversie_kern).
+# Er is één uitvoerstroom, dus één uitvoerstelsel: een profiel met meerdere
+# stelsels_uit vraagt een keuze met --naar.
+#
+# Meldingen gaan naar stderr; stdout bevat enkel de gegevens (bij lege
+# invoer niets, ook geen titelrij). Afsluitcode 0
+# als alles geconverteerd is, 1 bij een fout. Sluit het volgende programma
+# de pijp vroeger (bijv. head), dan stopt de conversie stil.
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   argparse       : opdrachtregelopties
+#   os             : stdout omleiden na een gebroken pijp
+#   sys            : stdin, stdout, stderr en de afsluitcode
+#   pandas         : stdin per chunk lezen
+#   conversie_kern : de gedeelde conversielogica
+#   batch_planner  : begrensd schrijven in een aparte thread
+#   batch_taak     : instellingen uit een profiel
+# -----------------------------------------------------------------------------
+import argparse
+import os
+import sys
+import pandas as pd
+from conversie_kern import (CRS_CODES, HEADERS, SCHEIDINGSTEKENS, STANDAARD_INSTELLINGEN, HOOGTE_STELSELS,
+                            CHUNK_RIJEN, transformer_maken, verwerk_chunk, hoogte_controleren,
+                            geheugen_verdeling, ontdubbelen_nieuw, ontdubbelen_chunk, ontdubbelen_sluiten)
+from batch_planner import AchtergrondSchrijver
+from batch_taak import profiel_laden
+
+
+PIJP_BLOKKEN = 2   # geconverteerde blokken die op stdout mogen wachten
+
+
+def pijp_converteren(invoer, uitvoer, instellingen: dict, chunk_rijen: int = CHUNK_RIJEN,
+                     ontdubbeling=None) -> int:
+    # invoer/uitvoer: binaire stromen. Geeft het aantal rijen terug.
+    # ontdubbeling: toestand van ontdubbelen_nieuw(); de oproeper sluit ze af.
+    if instellingen["tegel_grootte"] or instellingen["sorteren"] or instellingen["uitdunnen"]:
+        raise ValueError("Tegels, sorteren en uitdunnen zijn niet mogelijk in pijpmodus.")
+    hoogte_controleren(instellingen)
+    x_header, y_header = HEADERS[instellingen["stelsel_uit"]]
+    # Werkprocessen binnen het geheugenbudget (zie geheugen_verdeling)
+    processen = geheugen_verdeling(instellingen["geheugen_mb"], processen=instellingen["processen"])["processen"]
+    transformer = transformer_maken(instellingen["stelsel_in"], instellingen["stelsel_uit"],
+                                    instellingen["snel_raster"], instellingen["hoogte_in"],
+                                    instellingen["hoogte_uit"], processen)
+    try:
+        chunk_iter = pd.read_csv(invoer, delimiter=instellingen["separator_in"],
+                                 decimal=instellingen["decimal_in"], header=None,
+                                 skiprows=1 if instellingen["titelrij_in"] else 0,
+                                 chunksize=chunk_rijen)
+    except pd.errors.EmptyDataError:
+        chunk_iter = []   # lege invoer
+
+    schrijver = AchtergrondSchrijver(max_blokken=PIJP_BLOKKEN, stroom=uitvoer)
+    rijen, titelrij = 0, instellingen["titelrij_uit"]
+    try:
+        for chunk in chunk_iter:
+            df_output = verwerk_chunk(chunk, transformer, instellingen)
+            if ontdubbeling is not None:
+                df_output = ontdubbelen_chunk(ontdubbeling, df_output, x_header, y_header)
+            schrijver.schrijf(None, "a", df_output.to_csv(
+                index=False, sep=instellingen["separator_uit"], decimal=instellingen["decimal_uit"],
+                header=titelrij))
+            rijen += len(df_output)
+            titelrij = False
+        # Lege invoer: ook geen titelrij. Zonder rijen is niet te zien of er
+        # een Z-kolom is, en een titelrij met andere kolommen dan bij een
+        # niet-lege stroom zou het volgende programma in de war brengen.
+        schrijver.wacht()
+    finally:
+        schrijver.sluiten()
+    return rijen
+
+
+def instellingen_uit_opties(args, profiel=None) -> dict:
+    if profiel is not None and len(profiel["stelsels_uit"]) > 1 and not args.naar:
+        raise ValueError(f"Het profiel heeft meerdere uitvoerstelsels ({', '.join(profiel['stelsels_uit'])}); "
+                         "in pijpmodus is er één uitvoer: kies er één met --naar.")
+    instellingen = dict(profiel["instellingen"] if profiel is not None else STANDAARD_INSTELLINGEN)
+    if args.van:
+        instellingen["stelsel_in"] = args.van
+    if args.naar:
+        instellingen["stelsel_uit"] = args.naar
+    if args.invoer:
+        instellingen["separator_in"], instellingen["decimal_in"] = SCHEIDINGSTEKENS[args.invoer]
+    if args.uitvoer:
+        instellingen["separator_uit"], instellingen["decimal_uit"] = SCHEIDINGSTEKENS[args.uitvoer]
+    if args.titelrij_in:
+        instellingen["titelrij_in"] = True
+    if args.zonder_titelrij_uit:
+        instellingen["titelrij_uit"] = False
+    if args.point_id:
+        instellingen["naam_kolom"] = True
+    if args.diepte:
+        instellingen["diepte"] = True
+    if args.reductievlak_keuze is not None:
+        instellingen["reductievlak_keuze"] = args.reductievlak_keuze
+    if args.reductievlak_waarde is not None:
+        instellingen["reductievlak_waarde"] = args.reductievlak_waarde
+    if args.hoogte_in:
+        instellingen["hoogte_in"] = args.hoogte_in
+    if args.hoogte_uit:
+        instellingen["hoogte_uit"] = args.hoogte_uit
+    if args.snel:
+        instellingen["snel_raster"] = True
+    if args.processen:
+        instellingen["processen"] = args.processen
+    return instellingen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coördinaten converteren van stdin naar stdout")
+    parser.add_argument("--profiel", help="instellingen uit een batchprofiel (.json/.toml)")
+    parser.add_argument("--van", choices=CRS_CODES, help="stelsel van de invoer")
+    parser.add_argument("--naar", choices=CRS_CODES, help="stelsel van de uitvoer")
+    parser.add_argument("--invoer", choices=SCHEIDINGSTEKENS, metavar="LABEL",
+                        help="scheidingsteken van de invoer, bijv. 'spatie(decimaal punt)'")
+    parser.add_argument("--uitvoer", choices=SCHEIDINGSTEKENS, metavar="LABEL",
+                        help="scheidingsteken van de uitvoer, bijv. 'komma(decimaal punt)'")
+    parser.add_argument("--titelrij-in", action="store_true", help="eerste regel van de invoer overslaan")
+    parser.add_argument("--zonder-titelrij-uit", action="store_true", help="geen kolomnamen schrijven")
+    parser.add_argument("--point-id", action="store_true", help="eerste kolom is een punt-ID")
+    parser.add_argument("--diepte", action="store_true", help="teken van Z omdraaien")
+    parser.add_argument("--reductievlak-keuze", type=int, choices=(0, 1, 2))
+    parser.add_argument("--reductievlak-waarde", type=int)
+    parser.add_argument("--hoogte-in", choices=HOOGTE_STELSELS)
+    parser.add_argument("--hoogte-uit", choices=HOOGTE_STELSELS)
+    parser.add_argument("--snel", action="store_true", help="correctieraster (L72/L2008/UTM31)")
+    parser.add_argument("--processen", type=int, help="aantal werkprocessen voor de transformatie")
+    parser.add_argument("--ontdubbelen", action="store_true", help="punten op dezelfde XY-positie verwijderen")
+    parser.add_argument("--ontdubbel-tolerantie", type=float,
+                        help="hokgrootte voor dezelfde positie (standaard exact na afronding)")
+    parser.add_argument("--chunk-rijen", type=int, default=CHUNK_RIJEN, help="rijen per chunk")
+    args = parser.parse_args()
+    if args.chunk_rijen < 1:
+        parser.error("--chunk-rijen moet minstens 1 zijn")
+
+    ontdubbeling = None
+    try:
+        profiel = profiel_laden(args.profiel) if args.profiel else None
+        instellingen = instellingen_uit_opties(args, profiel)
+        if args.ontdubbelen or (profiel is not None and profiel["ontdubbelen"]):
+            tolerantie = args.ontdubbel_tolerantie
+            if tolerantie is None:
+                tolerantie = profiel["ontdubbel_tolerantie"] if profiel is not None else 0.0
+            ontdubbeling = ontdubbelen_nieuw(instellingen["stelsel_uit"], tolerantie,
+                                             geheugen_verdeling(instellingen["geheugen_mb"])["ontdubbel_sleutels"])
+        pijp_converteren(sys.stdin.buffer, sys.stdout.buffer, instellingen, args.chunk_rijen, ontdubbeling)
+        if ontdubbeling is not None and ontdubbeling["verwijderd"]:
+            print(f"conversie_pijp: {ontdubbeling['verwijderd']} dubbele punten verwijderd", file=sys.stderr)
+    except BrokenPipeError:
+        # Het volgende programma leest niet meer: stil stoppen. stdout naar
+        # devnull, anders faalt ook het doorspoelen bij het afsluiten.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(0)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    except Exception as e:
+        print(f"conversie_pijp: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if ontdubbeling is not None:
+            ontdubbelen_sluiten(ontdubbeling)
+
+
+if __name__ == "__main__":
+    main()
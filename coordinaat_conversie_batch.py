@@ -11,29 +11,35 @@
 # Elke library heeft een specifiek doel:
 #   tkinter       : standaard Python GUI-toolkit, ingebouwd in Python
 #   tkinter.ttk   : verbeterde widgets (Combobox heeft betere opmaak dan tk)
-#   pandas        : inlezen en bewerken van tabulaire data (CSV, enz.)
 #   filedialog    : dialoogvensters voor bestand- en mapselectie
 #   StringVar     : speciale variabele die Tkinter-widgets automatisch updatet
 #   os            : hulpmiddelen voor het besturingssysteem (hier: bestanden openen)
 #   sys           : toegang tot systeeminfo (hier: PyInstaller detectie)
 #   threading     : meerdere taken tegelijk uitvoeren (GUI + conversie)
-#   pyproj        : coördinatenconversie via PROJ-bibliotheek
+#   time          : tijdmeting voor de voortgang (punten/s, MB/s)
 #   pathlib       : objectgeoriënteerde bestandspaden (veiliger dan strings)
-#   shapely       : geometrie-bewerkingen (hier: WKT polygon export)
+#   conversie_kern: de eigenlijke conversie (pandas, pyproj, shapely) en
+#                   gedeelde hulpfuncties, zonder GUI-code
+#   batch_planner : standaardwaarden voor het vooruit lezen
+#   batch_taak    : de batch zelf (zonder GUI) en de taakprofielen
+#   compressie    : gecomprimeerde invoerbestanden herkennen (.gz, .zst, .xz)
 # -----------------------------------------------------------------------------
 import tkinter as tk
 from tkinter.ttk import Combobox
-import pandas as pd
 import tkinter.messagebox
 from tkinter import filedialog
 from tkinter import StringVar
 import sys
 import threading
 import functools
-from typing import Literal
-from pyproj import Transformer
+import time
 from pathlib import Path
-from shapely.geometry import Polygon
+from conversie_kern import (snel_voorbeeld, voorbeeld_info, formaat_detecteren, formaat_info,
+                            SCHEIDINGSTEKENS, UITDUN_METHODES, HOOGTE_STELSELS, SORTEER_METHODES)
+from batch_planner import VOORUIT_BESTANDEN, VOORUIT_MAX_BYTES
+from compressie import zonder_compressie
+from batch_taak import (profiel_maken, profiel_laden, profiel_opslaan, profiel_controleren,
+                        taak_uitvoeren, resultaat_tekst, getal_tekst)
 
 
 # =============================================================================
@@ -82,10 +88,24 @@ root.grid_rowconfigure(0, weight=1)
 # output_dir: StringVar die het pad van de uitvoermap bijhoudt.
 #   StringVar is een speciale Tkinter-variabele: widgets die eraan gekoppeld
 #   zijn (via textvariable=...) updaten automatisch als de waarde wijzigt.
+#
+# invoer_map: gekozen invoermap (leeg = losse bestanden via "Invoer"). Bij een
+#   map wordt input_files pas tijdens de batch gevuld, naarmate de bestanden
+#   gevonden worden. De mappenstructuur wordt onder output_dir nagebouwd.
+# patroon_var: bestandsnaampatronen voor de invoermap, gescheiden door ";"
+# recursief_switch: ook in de submappen van de invoermap zoeken
+# profiel_processen: "processen" uit het laatst geladen profiel. De GUI
+#   gebruikt geen werkprocessen (spawn zou dit script opnieuw importeren),
+#   maar bij het opslaan blijft de waarde zo behouden.
 # -----------------------------------------------------------------------------
 input_files = []
+profiel_processen = None
 
 output_dir = StringVar()
+
+invoer_map       = StringVar()
+patroon_var      = StringVar(value="*.xyz;*.txt;*.asc;*.csv;*.pts;*.cgp;*.xlsx;*.xlsm;*.gz;*.zst;*.xz")
+recursief_switch = tk.BooleanVar(value=True)
 output_dir.set("")
 
 # Lijsten voor de dropdown-keuzes in de comboboxen
@@ -97,35 +117,14 @@ lst_separator_output = ('komma(decimaal punt)', 'spatie(decimaal punt)', 'tab(de
                         'punt-komma(decimaal komma)', 'punt-komma(decimaal punt)')
 # Beschikbare uitvoerextensies: de bestandsnaam blijft gelijk, enkel de
 # extensie wordt vervangen door de keuze van de gebruiker.
-lst_extensies = ('.asc', '.xyz', '.txt', '.csv', '.pts', '.wkt')
-
-# -----------------------------------------------------------------------------
-# CRS-CODES (Coordinate Reference System)
-# pyproj gebruikt EPSG-codes om coördinaten te definiëren.
-# De dictionary koppelt de naam uit de dropdown aan de juiste EPSG-code.
-#   L72    = Belgisch Lambert 1972         (EPSG:31370)
-#   UTM31  = Universal Transverse Mercator zone 31N (EPSG:32631)
-#   WGS84  = Wereldwijd GPS-stelsel, in graden (EPSG:4326)
-#   L2008  = Belgisch Lambert 2008         (EPSG:3812)
-# -----------------------------------------------------------------------------
-CRS_CODES = {
-    "L72":   "EPSG:31370",
-    "UTM31": "EPSG:32631",
-    "WGS84": "EPSG:4326",
-    "L2008": "EPSG:3812",
-}
-
-# -----------------------------------------------------------------------------
-# KOLOMNAMEN UITVOERBESTAND
-# Afhankelijk van het gekozen uitvoerstelsel krijgen de X/Y-kolommen een
-# andere naam in het outputbestand.
-# -----------------------------------------------------------------------------
-HEADERS = {
-    "L72":   ("x_L72",   "y_L72"),
-    "UTM31": ("x_UTM31", "y_UTM31"),
-    "WGS84": ("LAT",     "LON"),
-    "L2008": ("x_L2008", "y_L2008"),
-}
+# .parquet is een kolomformaat (vereist het pakket pyarrow).
+# .gpkg is een GeoPackage met ruimtelijke index, rechtstreeks te openen in een GIS.
+lst_extensies = ('.asc', '.xyz', '.txt', '.csv', '.pts', '.wkt', '.parquet', '.gpkg')
+# Compressie van de uitvoer: de extensie komt achter de gekozen extensie,
+# bijv. meting.asc.gz. .zst vereist het pakket zstandard.
+lst_compressies = ('geen', '.gz', '.zst', '.xz')
+# Hoogtestelsels om Z mee om te zetten (zie HOOGTE_STELSELS in conversie_kern)
+lst_hoogtes = ('geen',) + tuple(HOOGTE_STELSELS)
 
 # -----------------------------------------------------------------------------
 # TKINTER SCHAKELAAR-VARIABELEN (BooleanVar / IntVar)
@@ -137,17 +136,74 @@ HEADERS = {
 #   header_input_switch      : eerste rij van het invoerbestand overslaan
 #   header_output_switch     : kolomnamen schrijven in het uitvoerbestand
 #   eerste_kolom_naam_switch : eerste kolom bevat een punt-ID (geen coördinaat)
+#   auto_formaat_switch      : scheidingsteken, titelrij en punt-ID per bestand
+#                              automatisch detecteren (overschrijft de 3 opties)
+#   validatie_switch         : steekproef vooraf controleren op het werkgebied
+#   samenvatting_switch      : per bestand een .samenvatting.json wegschrijven
+#   logboek_switch           : logboek en metrieken van de batch in de uitvoermap
+#   tegel_switch             : uitvoer verdelen over tegels i.p.v. één bestand
+#   tegel_grootte_var        : zijde van een tegel in eenheden van het uitvoerstelsel
+#   uitdun_waarde_var        : N (elke N-de punt) of celgrootte voor het uitdunnen
+#   ontdubbel_switch         : punten op dezelfde XY-positie verwijderen
+#   ontdubbel_tolerantie_var : hokgrootte voor "dezelfde positie" (0 = exact)
+#   snel_raster_switch       : L72/L2008/UTM31 via een correctieraster omzetten
+#   extra_stelsel_switches   : per stelsel: ook naar dit stelsel converteren
+#                              (zelfde leesbeurt, één uitvoerbestand per stelsel)
+#   samenvoegen_switch       : alle bestanden in één uitvoerbestand schrijven
+#   samenvoeg_naam_var       : naam (zonder extensie) van dat samengevoegde bestand
+#   bron_kolom_switch        : bij samenvoegen per rij het bronbestand vermelden
+#   vooruit_var              : aantal volgende bestanden dat al gelezen wordt (0 = uit)
+#   vooruit_mb_var           : maximaal aantal MB dat voorgelezen in het geheugen staat
+#   geheugen_var             : geheugenbudget van de hele batch in MB (0 = geen)
 #   reductievlak_conversie_keuze : 0=geen, 1=LAT→TAW, 2=TAW→LAT
 #   reductievlak_waarde      : welke correctiewaarde gebruiken (per haven/zone)
 #   status_var               : tekst die in het statuslabel getoond wordt
+#   snelheid_var             : actuele doorvoersnelheid tijdens de batch
+#   voorbeeld_info_var       : codering, grootte en geschatte rijen van het
+#                              geselecteerde bestand
 # -----------------------------------------------------------------------------
 diepte_switch                = tk.BooleanVar(value=False)
 header_input_switch          = tk.BooleanVar(value=False)
 header_output_switch         = tk.BooleanVar(value=True)
 eerste_kolom_naam_switch     = tk.BooleanVar(value=False)
+auto_formaat_switch          = tk.BooleanVar(value=True)
+validatie_switch             = tk.BooleanVar(value=True)
+samenvatting_switch          = tk.BooleanVar(value=False)
+logboek_switch               = tk.BooleanVar(value=False)
+tegel_switch                 = tk.BooleanVar(value=False)
+tegel_grootte_var            = tk.StringVar(value="1000")
+uitdun_waarde_var            = tk.StringVar(value="10")
+ontdubbel_switch             = tk.BooleanVar(value=False)
+ontdubbel_tolerantie_var     = tk.StringVar(value="0")
+snel_raster_switch           = tk.BooleanVar(value=False)
+extra_stelsel_switches       = {stelsel: tk.BooleanVar(value=False) for stelsel in lst_conversies_output}
+samenvoegen_switch           = tk.BooleanVar(value=False)
+samenvoeg_naam_var           = tk.StringVar(value="samengevoegd")
+bron_kolom_switch            = tk.BooleanVar(value=True)
+vooruit_var                  = tk.StringVar(value=str(VOORUIT_BESTANDEN))
+vooruit_mb_var               = tk.StringVar(value=str(VOORUIT_MAX_BYTES // (1024 * 1024)))
+geheugen_var                 = tk.StringVar(value="0")
 reductievlak_conversie_keuze = tk.IntVar(value=0)
 reductievlak_waarde          = tk.IntVar(value=0)
 status_var                   = tk.StringVar(value="")
+snelheid_var                 = tk.StringVar(value="")
+voorbeeld_info_var           = tk.StringVar(value="")
+
+
+# -----------------------------------------------------------------------------
+# ANNULEREN EN VOORTGANG
+# stop_event: threading.Event dat de Stop-knop zet. De batch-thread kijkt na
+#   elke chunk of het event gezet is en stopt dan netjes.
+# voortgang: gewone dictionary die de batch-thread bijwerkt (aantal rijen en
+#   gelezen bytes). De GUI-thread leest die periodiek uit via root.after.
+#   Enkel gehele getallen toekennen is veilig tussen threads (GIL), dus een
+#   Lock is hier niet nodig.
+# VOORTGANG_INTERVAL_MS: hoe vaak (in ms) de snelheidsweergave ververst wordt.
+#   Zo blijft het aantal GUI-updates begrensd, hoe snel de conversie ook loopt.
+# -----------------------------------------------------------------------------
+stop_event = threading.Event()
+voortgang = {"rijen": 0, "bytes": 0, "bezig": False}
+VOORTGANG_INTERVAL_MS = 500
 
 
 # =============================================================================
@@ -184,298 +240,175 @@ def scheidingsteken_geven():
 
 
 # =============================================================================
-# CGP-BESTAND INLEZEN
-# =============================================================================
-# Een *.cgp bestand heeft een eigen formaat met "=" als scheidingsteken en
-# een kopregel die overgeslagen moet worden. Deze functie zet het om naar
-# een standaard pandas DataFrame zodat de rest van de code het gewoon kan
-# verwerken. CGP-bestanden zijn doorgaans klein, dus chunking is hier niet nodig.
-# -----------------------------------------------------------------------------
-def cgp_to_dataframe(filename: str) -> pd.DataFrame:
-    with open(filename, "r", encoding="utf-8") as f:
-        # strip() verwijdert witruimte aan begin en einde van elke regel
-        # replace("=", ",") maakt van "naam=x=y" een komma-gescheiden rij
-        # de conditie "if line.strip()" slaat lege regels over
-        lines = [line.strip().replace("=", ",") for line in f if line.strip()]
-
-    lines = lines[1:]  # eerste regel is de kopregel, die slaan we over
-
-    # Elke tekstlijn splitsen op komma en van de resulterende lijsten een
-    # DataFrame maken. Elke deellijst wordt één rij in de tabel.
-    # dtype=object voorkomt dat pandas 2.x kolommen als StringDtype opslaat,
-    # zodat de float-conversie hieronder correct werkt.
-    df = pd.DataFrame([line.split(",") for line in lines], dtype=object)
-
-    # Spaties verwijderen uit de eerste kolom (bevat de puntnamen)
-    df.iloc[:, 0] = df.iloc[:, 0].str.replace(" ", "", regex=False)
-
-    # Kolommen 1 t/m einde zijn coördinaten: converteren naar float.
-    # Bij pd.read_csv gebeurt dit automatisch via de decimal-parameter,
-    # maar hier lezen we handmatig in als strings, dus we doen het expliciet.
-    df.iloc[:, 1:] = df.iloc[:, 1:].apply(pd.to_numeric)
-    return df
-
-
-# =============================================================================
-# DIEPTE OMDRAAIEN
+# INSTELLINGEN UIT DE GUI OPHALEN
 # =============================================================================
-# Vermenigvuldigt de Z-kolom met -1. Zo worden negatieve dieptewaarden
-# positief (of omgekeerd). Wordt enkel opgeroepen als de checkbox aanstaat.
+# De conversie zelf (conversie_kern.conversie_een_bestand) leest geen widgets:
+# ze krijgt een dictionary met alle opties mee. Die wordt hier één keer per
+# batch opgebouwd, op de GUI-thread, vóór de achtergrond-thread start.
+# Zo leest de achtergrond-thread nooit rechtstreeks Tkinter-variabelen.
 # -----------------------------------------------------------------------------
-def depth_toggle(df):
-    df['Z'] *= -1
-    return df
-
-
-# =============================================================================
-# REDUCTIEVLAK CORRECTIE (LAT ↔ TAW)
-# =============================================================================
-# Voegt een correctiewaarde toe aan of trekt ze af van de Z-kolom.
-# Elke haven of zone heeft een eigen offset tussen LAT (getijreferentievlak)
-# en TAW (Tweede Algemene Waterpassing, het Belgische hoogtestelsel).
-# De key in de dictionary stemt overeen met de waarde van de radiobutton.
-# reductievlak_conversie_keuze bepaalt de richting (1=LAT→TAW, 2=TAW→LAT).
-# reductievlak_waarde bepaalt welke correctiewaarde gebruikt wordt.
-# -----------------------------------------------------------------------------
-def lat_to_taw(df):
-    conversie_waardes = {
-        0: 0.69,  # EUT/NZT
-        1: 0.72,  # DUD
-        2: 0.73,  # VCS/BOS
-        3: 0.74,  # ROS
-        4: 0.75,  # SKO
-        5: 0.70,  # AVG Antwerpen
-        6: 0.25,  # ZB
+def instellingen_ophalen():
+    separator_in,  decimal_in  = scheidingsteken_ophalen()
+    separator_uit, decimal_uit = scheidingsteken_geven()
+    return {
+        "stelsel_in":          combo_conv_in.get(),
+        "stelsel_uit":         combo_conv_out.get(),
+        "separator_in":        separator_in,
+        "decimal_in":          decimal_in,
+        "separator_uit":       separator_uit,
+        "decimal_uit":         decimal_uit,
+        "titelrij_in":         header_input_switch.get(),
+        "titelrij_uit":        header_output_switch.get(),
+        "naam_kolom":          eerste_kolom_naam_switch.get(),
+        "diepte":              diepte_switch.get(),
+        "reductievlak_keuze":  reductievlak_conversie_keuze.get(),
+        "reductievlak_waarde": reductievlak_waarde.get(),
+        "tegel_grootte":       _tegel_grootte() if tegel_switch.get() else None,
+        "uitdunnen":           UITDUN_METHODES[combo_uitdunnen.get()],
+        "uitdun_waarde":       _uitdun_waarde(),
+        "snel_raster":         snel_raster_switch.get(),
+        "hoogte_in":           _hoogte(combo_hoogte_in),
+        "hoogte_uit":          _hoogte(combo_hoogte_uit),
+        "sorteren":            SORTEER_METHODES[combo_sorteren.get()],
+        "geheugen_mb":         _geheugen_mb() or None,
     }
-    conversie_waarde = conversie_waardes[reductievlak_waarde.get()]
 
-    if reductievlak_conversie_keuze.get() == 1:
-        df['Z'] -= conversie_waarde   # LAT naar TAW: aftrekken
-    elif reductievlak_conversie_keuze.get() == 2:
-        df['Z'] += conversie_waarde   # TAW naar LAT: optellen
-    return df
+
+def _hoogte(combo):
+    return None if combo.get() == "geen" else combo.get()
 
 
 # =============================================================================
-# VERWERK ÉÉN DATAFRAME-CHUNK
+# TAAKPROFIEL UIT DE GUI / NAAR DE GUI
 # =============================================================================
-# Dit is de kern van de conversie. De functie krijgt één stuk data binnen
-# (een volledige DataFrame voor kleine bestanden, of een "chunk" van 100.000
-# rijen voor grote bestanden) en geeft een getransformeerd DataFrame terug.
-#
-# Parameters:
-#   chunk       : het stukje data om te verwerken
-#   transformer : het pyproj Transformer-object dat de wiskundige conversie doet
-#   x_header    : naam van de X-kolom in het uitvoerbestand
-#   y_header    : naam van de Y-kolom in het uitvoerbestand
-#
-# De functie houdt rekening met het aantal kolommen:
-#   2 kolommen : alleen X en Y
-#   3 kolommen : X, Y en Z  (of punt-ID, X, Y als eerste kolom punt is)
-#   4 kolommen : X, Y, Z en een extra variabele  (of punt-ID, X, Y, Z)
-#
-# heeft_naam_kolom: overschrijft de checkbox. CGP-bestanden hebben altijd een
-#   naamkolom; die wordt dan automatisch correct behandeld ongeacht de checkbox.
-# -----------------------------------------------------------------------------
-def _verwerk_chunk(chunk, transformer, x_header, y_header, heeft_naam_kolom=None):
-    aantal_kolommen = len(chunk.columns)
-
-    # heeft_naam_kolom: None = gebruik de checkbox-waarde, anders forceer True/False.
-    # chunk.iloc[:, 0] betekent: alle rijen (:), kolom 0
-    # .values geeft een numpy-array terug, wat sneller werkt met pyproj
-    # transform() geeft twee arrays terug: de getransformeerde X en Y waarden
-    if heeft_naam_kolom is None:
-        heeft_naam_kolom = eerste_kolom_naam_switch.get()
-    if not heeft_naam_kolom:
-        # standaard: kolom 0 = X, kolom 1 = Y
-        x_output, y_output = transformer.transform(
-            chunk.iloc[:, 0].values,
-            chunk.iloc[:, 1].values
-        )
-    else:
-        # als eerste kolom een punt-ID is: kolom 1 = X, kolom 2 = Y
-        x_output, y_output = transformer.transform(
-            chunk.iloc[:, 1].values,
-            chunk.iloc[:, 2].values
-        )
-
-    # Nieuw DataFrame bouwen met de geconverteerde waarden.
-    # We gebruiken een dictionary: sleutel = kolomnaam, waarde = data.
-    if aantal_kolommen == 2:
-        df_output = pd.DataFrame({x_header: x_output, y_header: y_output})
-
-    elif aantal_kolommen == 3:
-        if not heeft_naam_kolom:
-            # kolom 2 is de Z-waarde (hoogte/diepte)
-            df_output = pd.DataFrame({
-                x_header: x_output,
-                y_header: y_output,
-                'Z': chunk.iloc[:, 2].values
-            })
-        else:
-            # kolom 0 is de punt-ID, geen Z aanwezig
-            df_output = pd.DataFrame({
-                'point': chunk.iloc[:, 0].values,
-                x_header: x_output,
-                y_header: y_output
-            })
-
-    elif aantal_kolommen == 4:
-        if not heeft_naam_kolom:
-            # kolom 2 = Z, kolom 3 = extra variabele
-            df_output = pd.DataFrame({
-                x_header: x_output,
-                y_header: y_output,
-                'Z':   chunk.iloc[:, 2].values,
-                'VAR': chunk.iloc[:, 3].values
-            })
-        else:
-            # kolom 0 = punt-ID, kolom 3 = Z
-            df_output = pd.DataFrame({
-                'point': chunk.iloc[:, 0].values,
-                x_header: x_output,
-                y_header: y_output,
-                'Z': chunk.iloc[:, 3].values
-            })
-
-    else:
-        raise ValueError(f"Onverwacht aantal kolommen: {aantal_kolommen}. Maximum is 4.")
-
-    # Afronden: WGS84 werkt in graden (kleine getallen), dus 6 decimalen.
-    # Andere stelsels werken in meters, 2 decimalen volstaat (cm-nauwkeurigheid).
-    if combo_conv_out.get() == "WGS84":
-        df_output[x_header] = df_output[x_header].round(6)
-        df_output[y_header] = df_output[y_header].round(6)
-    else:
-        df_output[x_header] = df_output[x_header].round(2)
-        df_output[y_header] = df_output[y_header].round(2)
-
-    # Z-kolom nabewerken als die aanwezig is
-    if 'Z' in df_output.columns:
-        df_output['Z'] = df_output['Z'].round(2)
-
-        # Diepte omdraaien indien de checkbox aanstaat
-        if diepte_switch.get():
-            df_output = depth_toggle(df_output)
-
-        # Reductievlak correctie indien een richting is gekozen (≠ 0)
-        if reductievlak_conversie_keuze.get() != 0:
-            df_output = lat_to_taw(df_output)
-            df_output['Z'] = df_output['Z'].round(2)  # opnieuw afronden na correctie
-
-    return df_output
-
-
-# =============================================================================
-# CONVERSIE VAN ÉÉN BESTAND
-# =============================================================================
-# Verwerkt één invoerbestand volledig en schrijft het resultaat weg.
-# Voor grote bestanden wordt pandas' chunksize-functie gebruikt:
-# in plaats van het hele bestand in één keer in te laden, leest pandas
-# telkens 100.000 rijen. Elke batch wordt direct weggeschreven, waarna
-# het geheugen vrijgegeven wordt. Zo blijft het RAM-gebruik laag.
+# Een profiel (zie batch_taak) bevat de instellingen hierboven plus alle
+# batchopties en de invoer- en uitvoerlocaties. profiel_ophalen bouwt het op
+# uit de widgets (voor de batch, of om op te slaan); profiel_toepassen zet de
+# widgets terug volgens een geladen profiel.
 #
-# Het uitvoerbestand wordt als volgt opgebouwd:
-#   - eerste chunk : mode='w' (nieuw bestand aanmaken), header optioneel
-#   - volgende chunks: mode='a' (toevoegen aan bestaand bestand), geen header
+# De scheidingstekens staan in het profiel als tekens (bijv. ";" en ","),
+# niet als het label uit de dropdown; dat label wordt hier teruggezocht.
 # -----------------------------------------------------------------------------
-def conversie_een_bestand(input_pad, output_pad: str):
-    separator_in,  decimal_in  = scheidingsteken_ophalen()
-    separator_out, decimal_out = scheidingsteken_geven()
-
-    # De geselecteerde stelselnamen ophalen en omzetten naar EPSG-codes
-    coord_in  = CRS_CODES[combo_conv_in.get()]
-    coord_out = CRS_CODES[combo_conv_out.get()]
-
-    # De kolomnamen voor het uitvoerbestand ophalen
-    x_header, y_header = HEADERS[combo_conv_out.get()]
-
-    # Transformer aanmaken: berekent de wiskundige projectie tussen de twee stelsels.
-    # always_xy=True wordt hier NIET gebruikt: pyproj volgt dan de officiële volgorde
-    # van het CRS (bijv. lat/lon voor WGS84). In België/Europa is de notatie
-    # 51.xxxx, 4.xxxx (breedtegraad eerst) gangbaarder, wat overeenkomt met die volgorde.
-    transformer = Transformer.from_crs(coord_in, coord_out)
-
-    # CGP-bestanden hebben een apart inleesformaat en zijn doorgaans klein:
-    # die lezen we in één keer in zonder chunking.
-    if Path(input_pad).suffix.lower() == ".cgp":
-        df = cgp_to_dataframe(input_pad)
-        # CGP heeft altijd een naamkolom (kolom 0), ongeacht de checkbox
-        df_output = _verwerk_chunk(df, transformer, x_header, y_header, heeft_naam_kolom=True)
-
-        # WKT-EXPORT (Well-Known Text) — optie voor PDS2000-gebruikers
-        # ---------------------------------------------------------------
-        # WKT is een standaard tekstformaat om geometrieën te beschrijven,
-        # bijv. POLYGON ((4.123 51.456, 4.124 51.457, ...))
-        # Dit is een niche-optie die enkel gebruikt wordt in het hydrografisch
-        # programma PDS2000 (Teledyne RESON). Daarin definieert een CGP-bestand
-        # een werkgebied (polygon) en kan dat als WKT worden geïmporteerd.
-        # De WKT wordt opgebouwd uit de geconverteerde X- en Y-kolommen.
-        if Path(output_pad).suffix.lower() == ".wkt":
-            coords = list(df_output[[x_header, y_header]].itertuples(index=False, name=None))
-            poly = Polygon(coords)
-            with open(output_pad, 'w') as f:
-                f.write(poly.wkt)
-            return  # klaar, geen CSV-schrijven meer nodig
-
-        df_output.to_csv(output_pad, index=False, sep=separator_out,
-                         decimal=decimal_out, header=header_output_switch.get())
-        return  # klaar, geen verdere verwerking nodig
-
-    # Voor alle andere bestandstypes: sla de titelrij over als de checkbox aanstaat.
-    # skiprows=1 slaat de eerste rij over vóór het inlezen begint.
-    skiprows = 1 if header_input_switch.get() else 0
-
-    # pd.read_csv met chunksize geeft geen DataFrame terug, maar een iterator.
-    # Telkens we "for chunk in chunk_iter" doen, leest pandas de volgende
-    # 100.000 rijen in. Dit is het sleutelconcept voor geheugenefficiëntie.
-    chunk_iter = pd.read_csv(
-        input_pad,
-        delimiter=separator_in,
-        decimal=decimal_in,
-        header=None,       # geen kolomnamen in het bestand zelf inlezen
-        skiprows=skiprows,
-        chunksize=100_000  # maximaal 100.000 rijen tegelijk in het geheugen
+def profiel_ophalen(naam=""):
+    vooruit_bestanden, vooruit_mb = _vooruit_lezen()
+    return profiel_maken(
+        instellingen_ophalen(), naam,
+        bestanden=[] if invoer_map.get() else list(input_files),
+        invoer_map=invoer_map.get(),
+        patronen=patroon_var.get(),
+        recursief=recursief_switch.get(),
+        uitvoer_map=output_dir.get(),
+        extensie=combo_extensie_out.get(),
+        uitvoer_compressie="" if combo_compressie_out.get() == "geen" else combo_compressie_out.get(),
+        stelsels_uit=uitvoer_stelsels(),
+        auto_formaat=auto_formaat_switch.get(),
+        validatie=validatie_switch.get(),
+        samenvatting=samenvatting_switch.get(),
+        logboek=logboek_switch.get(),
+        vooruit_bestanden=vooruit_bestanden,
+        vooruit_mb=vooruit_mb,
+        samenvoeg_naam=samenvoeg_naam_var.get().strip() if samenvoegen_switch.get() else "",
+        bron_kolom=bron_kolom_switch.get(),
+        ontdubbelen=ontdubbel_switch.get(),
+        ontdubbel_tolerantie=_ontdubbel_tolerantie() or 0.0,
     )
 
-    eerste_chunk = True
-    for chunk in chunk_iter:
-        # Verwerk dit stuk data
-        df_output = _verwerk_chunk(chunk, transformer, x_header, y_header)
-
-        # Schrijfmodus bepalen:
-        #   eerste chunk → 'w': nieuw bestand aanmaken (overschrijft bestaand)
-        #   volgende chunks → 'a': achteraan toevoegen aan het bestand
-        # De header (kolomnamen) schrijven we enkel bij de eerste chunk.
-        schrijf_header = header_output_switch.get() and eerste_chunk
-        mode: Literal["w", "a"] = 'w' if eerste_chunk else 'a'
-
-        df_output.to_csv(output_pad, index=False, sep=separator_out,
-                         decimal=decimal_out, header=schrijf_header, mode=mode)
 
-        # Expliciete del: geef het geheugen onmiddellijk vrij na het schrijven.
-        # Python's garbage collector doet dit normaal automatisch, maar bij
-        # grote DataFrames is het veiliger om het zelf te doen.
-        del df_output
-        eerste_chunk = False
+def _scheiding_label(separator, decimal):
+    for label, tekens in SCHEIDINGSTEKENS.items():
+        if tekens == (separator, decimal):
+            return label
+    raise ValueError(f"Scheidingsteken {separator!r} met decimaalteken {decimal!r} "
+                     f"staat niet in de keuzelijst.")
+
+
+def profiel_toepassen(profiel):
+    global input_files, profiel_processen
+    instellingen = profiel["instellingen"]
+
+    # Eerst alles opzoeken wat kan mislukken, zodat een ongeldig profiel
+    # de GUI niet half aanpast
+    separator_in_label  = _scheiding_label(instellingen["separator_in"], instellingen["decimal_in"])
+    separator_uit_label = _scheiding_label(instellingen["separator_uit"], instellingen["decimal_uit"])
+    uitdun_labels = {code: label for label, code in UITDUN_METHODES.items()}
+    if instellingen["uitdunnen"] not in uitdun_labels:
+        raise ValueError(f"Onbekende uitdunmethode {instellingen['uitdunnen']!r}.")
+    sorteer_labels = {code: label for label, code in SORTEER_METHODES.items()}
+    if instellingen["sorteren"] not in sorteer_labels:
+        raise ValueError(f"Onbekende sorteermethode {instellingen['sorteren']!r}.")
+
+    combo_conv_in.set(instellingen["stelsel_in"])
+    combo_conv_out.set(instellingen["stelsel_uit"])
+    combo_separator_in.set(separator_in_label)
+    combo_separator_out.set(separator_uit_label)
+    header_input_switch.set(instellingen["titelrij_in"])
+    header_output_switch.set(instellingen["titelrij_uit"])
+    eerste_kolom_naam_switch.set(instellingen["naam_kolom"])
+    diepte_switch.set(instellingen["diepte"])
+    reductievlak_conversie_keuze.set(instellingen["reductievlak_keuze"])
+    reductievlak_waarde.set(instellingen["reductievlak_waarde"])
+    tegel_switch.set(bool(instellingen["tegel_grootte"]))
+    if instellingen["tegel_grootte"]:
+        tegel_grootte_var.set(f"{instellingen['tegel_grootte']:g}")
+    combo_uitdunnen.set(uitdun_labels[instellingen["uitdunnen"]])
+    if instellingen["uitdunnen"]:
+        uitdun_waarde_var.set(f"{instellingen['uitdun_waarde']:g}")
+    snel_raster_switch.set(instellingen["snel_raster"])
+    combo_hoogte_in.set(instellingen["hoogte_in"] or "geen")
+    combo_hoogte_uit.set(instellingen["hoogte_uit"] or "geen")
+    combo_sorteren.set(sorteer_labels[instellingen["sorteren"]])
+    geheugen_var.set(str(instellingen["geheugen_mb"] or 0))
+    profiel_processen = instellingen["processen"]
+
+    auto_formaat_switch.set(profiel["auto_formaat"])
+    validatie_switch.set(profiel["validatie"])
+    samenvatting_switch.set(profiel["samenvatting"])
+    logboek_switch.set(profiel["logboek"])
+    vooruit_var.set(str(profiel["vooruit_bestanden"]))
+    vooruit_mb_var.set(str(profiel["vooruit_mb"]))
+    patroon_var.set(profiel["patronen"])
+    recursief_switch.set(profiel["recursief"])
+    output_dir.set(profiel["uitvoer_map"])
+    combo_extensie_out.set(profiel["extensie"])
+    combo_compressie_out.set(profiel["uitvoer_compressie"] or "geen")
+    for stelsel, switch in extra_stelsel_switches.items():
+        switch.set(stelsel in profiel["stelsels_uit"][1:])
+    samenvoegen_switch.set(bool(profiel["samenvoeg_naam"]))
+    if profiel["samenvoeg_naam"]:
+        samenvoeg_naam_var.set(profiel["samenvoeg_naam"])
+    bron_kolom_switch.set(profiel["bron_kolom"])
+    ontdubbel_switch.set(profiel["ontdubbelen"])
+    ontdubbel_tolerantie_var.set(f"{profiel['ontdubbel_tolerantie']:g}")
+
+    # Invoer: ofwel een map (bestanden worden pas tijdens de batch gezocht),
+    # ofwel een lijst met bestanden
+    invoer_map.set(profiel["invoer_map"])
+    input_files = list(profiel["bestanden"])
+    lb_bestanden.delete(0, tk.END)
+    for f in input_files:
+        lb_bestanden.insert(tk.END, Path(f).name)
+    txt_voorbeeld.config(state="normal")
+    txt_voorbeeld.delete("1.0", tk.END)
+    txt_voorbeeld.config(state="disabled")
+    voorbeeld_info_var.set(f"Invoermap: {profiel['invoer_map']}\nDe bestanden worden opgezocht tijdens "
+                           f"de conversie." if profiel["invoer_map"] else "")
 
 
 # =============================================================================
-# UITVOERBESTANDSNAAM GENEREREN
+# UITVOERSTELSELS
 # =============================================================================
-# In de batch-versie is er geen dialoog om per bestand een naam te kiezen.
-# De naam wordt automatisch samengesteld uit:
-#   - de originele bestandsnaam zonder extensie (.stem)
-#   - de extensie die de gebruiker koos in de combobox
-#   - in de uitvoermap die de gebruiker selecteerde
+# De uitvoerbestanden krijgen de naam van het invoerbestand met de gekozen
+# extensie, in de uitvoermap (zie batch_taak.uitvoer_pad).
 #
 # Voorbeeld: invoer = C:\data\meting_01.txt, map = C:\output, extensie = .asc
 #            uitvoer = C:\output\meting_01.asc
+# Bij meerdere uitvoerstelsels komt het stelsel in de naam: meting_01_L72.asc
 # -----------------------------------------------------------------------------
-def output_bestandsnaam(input_pad):
-    naam     = Path(input_pad).stem       # bestandsnaam zonder extensie
-    extensie = combo_extensie_out.get()   # gekozen extensie uit de combobox
-    return str(Path(output_dir.get()) / (naam + extensie))
+def uitvoer_stelsels():
+    # Hoofdstelsel (combobox) eerst, daarna de aangevinkte extra stelsels
+    stelsels = [combo_conv_out.get()]
+    stelsels += [s for s, switch in extra_stelsel_switches.items() if switch.get() and s not in stelsels]
+    return stelsels
 
 
 # =============================================================================
@@ -486,18 +419,164 @@ def output_bestandsnaam(input_pad):
 # vermijden. Na afloop (of bij fout) wordt de knop terug ingeschakeld.
 # -----------------------------------------------------------------------------
 def run_batch():
-    if not input_files:
-        tkinter.messagebox.showwarning("Geen bestanden", "Selecteer eerst invoerbestanden.")
-        return
-    if not output_dir.get():
-        tkinter.messagebox.showwarning("Geen uitvoermap", "Selecteer eerst een uitvoermap.")
+    # Eerst de invoervelden, daarna het volledige profiel controleren
+    # (zie batch_taak.profiel_controleren)
+    fout = _velden_controleren()
+    if fout is None:
+        try:
+            profiel = profiel_ophalen()
+            profiel_controleren(profiel)
+        except ValueError as e:
+            fout = str(e)
+    if fout:
+        tkinter.messagebox.showwarning("Ongeldige instellingen", fout)
         return
 
-    btn_run.config(state="disabled")  # knop blokkeren tijdens verwerking
+    btn_run.config(state="disabled")    # knop blokkeren tijdens verwerking
+    btn_input.config(state="disabled")  # bestandenlijst niet wijzigen tijdens verwerking
+    btn_invoer_map.config(state="disabled")
+    btn_profiel_laden.config(state="disabled")
+    btn_stop.config(state="normal")     # stoppen is nu mogelijk
+
+    # Alle bestanden in de listbox als "wacht" markeren. Bij een invoermap
+    # wordt de lijst opnieuw opgebouwd terwijl de bestanden gevonden worden.
+    if invoer_map.get():
+        input_files.clear()
+        lb_bestanden.delete(0, tk.END)
+    for i in range(len(input_files)):
+        _markeer_bestand(i, "wacht")
+
+    # Annuleer-vlag en tellers resetten, daarna de periodieke
+    # snelheidsweergave starten (die stopt zichzelf als de batch klaar is).
+    stop_event.clear()
+    voortgang.update(rijen=0, bytes=0, bezig=True)
+    _toon_voortgang(voortgang["rijen"], voortgang["bytes"], time.perf_counter())
 
     # De eigenlijke verwerking starten in een aparte achtergrond-thread.
     # daemon=True betekent: als het hoofdprogramma sluit, stopt ook deze thread.
-    threading.Thread(target=_batch_thread, daemon=True).start()
+    threading.Thread(target=_batch_thread, args=(profiel,), daemon=True).start()
+
+
+def _velden_controleren():
+    # Getallen in de invoervelden nakijken; geeft een foutmelding of None
+    if tegel_switch.get() and _tegel_grootte() is None:
+        return "Geef een tegelgrootte groter dan 0 op."
+    if UITDUN_METHODES[combo_uitdunnen.get()] and _uitdun_waarde() is None:
+        return "Uitdunnen: geef een N (geheel getal) of celgrootte groter dan 0 op."
+    if ontdubbel_switch.get() and _ontdubbel_tolerantie() is None:
+        return "Ontdubbelen: geef een tolerantie van 0 of meer op."
+    if samenvoegen_switch.get() and not samenvoeg_naam_var.get().strip():
+        return "Geef een naam op voor het samengevoegde bestand."
+    if _vooruit_lezen() is None:
+        return "Vooruit lezen: geef gehele getallen van 0 of meer op."
+    if _geheugen_mb() is None:
+        return "Geheugenbudget: geef een geheel aantal MB op (0 = geen grens)."
+    return None
+
+
+def _tegel_grootte():
+    # Tegelgrootte uit het invoerveld; None als die ongeldig is.
+    # Komma als decimaalteken wordt ook aanvaard.
+    try:
+        grootte = float(tegel_grootte_var.get().replace(",", "."))
+    except ValueError:
+        return None
+    return grootte if grootte > 0 else None
+
+
+def _uitdun_waarde():
+    # N of celgrootte uit het invoerveld; None als die ongeldig is.
+    # Bij "elke N-de punt" moet het een geheel getal zijn.
+    try:
+        waarde = float(uitdun_waarde_var.get().replace(",", "."))
+    except ValueError:
+        return None
+    if waarde <= 0 or (UITDUN_METHODES[combo_uitdunnen.get()] == "elke_n" and waarde != int(waarde)):
+        return None
+    return waarde
+
+
+def _ontdubbel_tolerantie():
+    # Tolerantie uit het invoerveld; None als die ongeldig is (0 = exact)
+    try:
+        tolerantie = float(ontdubbel_tolerantie_var.get().replace(",", "."))
+    except ValueError:
+        return None
+    return tolerantie if tolerantie >= 0 else None
+
+
+def _vooruit_lezen():
+    # (aantal bestanden, max MB) uit de invoervelden; None als ongeldig.
+    try:
+        aantal = int(vooruit_var.get())
+        max_mb = int(vooruit_mb_var.get())
+    except ValueError:
+        return None
+    if aantal < 0 or max_mb < 0:
+        return None
+    return aantal, max_mb
+
+
+def _geheugen_mb():
+    # Geheugenbudget in MB uit het invoerveld (0 = geen); None als ongeldig
+    try:
+        waarde = int(geheugen_var.get())
+    except ValueError:
+        return None
+    return waarde if waarde >= 0 else None
+
+
+def stop_batch():
+    # Enkel de vlag zetten: de batch-thread merkt dit na de huidige chunk op.
+    stop_event.set()
+    btn_stop.config(state="disabled")
+    status_var.set("Stoppen...")
+
+
+# =============================================================================
+# VOORTGANG TONEN (draait op de GUI-thread)
+# =============================================================================
+# Wordt om de VOORTGANG_INTERVAL_MS opnieuw ingepland via root.after, zolang
+# de batch bezig is. De snelheid wordt berekend over het laatste interval
+# (verschil in rijen en bytes sinds de vorige oproep), zodat een bestand dat
+# traag loopt meteen zichtbaar wordt.
+# -----------------------------------------------------------------------------
+def _toon_voortgang(vorige_rijen, vorige_bytes, vorige_tijd):
+    nu = time.perf_counter()
+    rijen, gelezen = voortgang["rijen"], voortgang["bytes"]
+    verstreken = max(nu - vorige_tijd, 1e-6)
+
+    punten_per_s = (rijen - vorige_rijen) / verstreken
+    mb_per_s = f"{(gelezen - vorige_bytes) / verstreken / 1_000_000:.1f}".replace(".", ",")
+    snelheid_var.set(f"{getal_tekst(punten_per_s)} punten/s   {mb_per_s} MB/s   "
+                     f"totaal {getal_tekst(rijen)} rijen")
+
+    if voortgang["bezig"]:
+        root.after(VOORTGANG_INTERVAL_MS, _toon_voortgang, rijen, gelezen, nu)
+
+
+# =============================================================================
+# STATUS PER BESTAND IN DE LISTBOX
+# =============================================================================
+# Een Listbox-item kan niet rechtstreeks hernoemd worden: we verwijderen het
+# item en voegen op dezelfde plaats de nieuwe tekst in. De kleur geeft in één
+# oogopslag de toestand weer. Enkel oproepen vanop de GUI-thread.
+# -----------------------------------------------------------------------------
+STATUS_KLEUREN = {
+    "wacht":   "gray40",
+    "bezig":   "blue",
+    "klaar":   "darkgreen",
+    "fout":    "#b30000",
+    "gestopt": "darkorange3",
+    "afgekeurd": "purple",
+}
+
+
+def _markeer_bestand(index, status, detail=""):
+    tekst = f"[{status}{' ' + detail if detail else ''}]  {Path(input_files[index]).name}"
+    lb_bestanden.delete(index)
+    lb_bestanden.insert(index, tekst)
+    lb_bestanden.itemconfig(index, fg=STATUS_KLEUREN[status])
 
 
 # =============================================================================
@@ -510,39 +589,62 @@ def run_batch():
 # dit plant de functie in op de hoofdthread (de GUI-thread), die hem zo snel
 # mogelijk uitvoert. Zo blijft alles gesynchroniseerd.
 #
-# In de for-lus wordt elk bestand volledig verwerkt (alle chunks weggeschreven)
-# vóór het volgende begint. Zo staat er nooit een half bestand op schijf.
+# De verwerking zelf zit in batch_taak.taak_uitvoeren (dezelfde code als bij
+# het uitvoeren van een profiel vanaf de opdrachtregel): elk bestand wordt
+# volledig verwerkt vóór het volgende begint, met vooruit lezen en schrijven
+# op de achtergrond, samenvoegen en meerdere uitvoerstelsels. De status per
+# bestand komt terug via _melden, gevonden bestanden (invoermap) via _gevonden.
 # -----------------------------------------------------------------------------
-def _batch_thread():
-    totaal = len(input_files)
+def _batch_thread(profiel):
+    try:
+        resultaat = taak_uitvoeren(profiel, _melden, stop_event, voortgang, _gevonden)
+    except Exception as e:
+        # Fout vóór het eerste bestand, bijv. uitvoermap kan niet aangemaakt worden
+        root.after(0, functools.partial(tkinter.messagebox.showerror, 'Foutje', str(e)))  # type: ignore[arg-type]
+        root.after(0, functools.partial(status_var.set, ""))  # type: ignore[arg-type]
+        return
+    finally:
+        _batch_einde()
 
-    # Uitvoermap aanmaken als die nog niet bestaat.
-    # parents=True : ook tussenliggende mappen aanmaken indien nodig
-    # exist_ok=True : geen fout als de map al bestaat
-    Path(output_dir.get()).mkdir(parents=True, exist_ok=True)
+    root.after(0, functools.partial(status_var.set, resultaat_tekst(resultaat)))  # type: ignore[arg-type]
+    if resultaat["status"] == "fout":
+        naam = Path(resultaat["bestand"]).name
+        root.after(0, functools.partial(tkinter.messagebox.showerror, 'Foutje',  # type: ignore[arg-type]
+                                        f'Fout bij bestand:\n{naam}\n\n{resultaat["fout"]}'))
 
-    for i, bestand in enumerate(input_files, start=1):
-        try:
-            # Status updaten via root.after: veilige manier om GUI aan te passen
-            # vanuit een thread. De string wordt meteen berekend en via partial
-            # doorgegeven als nul-argumenten callable (thread-safe, type-correct).
-            root.after(0, functools.partial(status_var.set, f"Bezig... {i}/{totaal}"))  # type: ignore[arg-type]
-
-            output_pad = output_bestandsnaam(bestand)
-            conversie_een_bestand(bestand, output_pad)
-
-        except Exception as e:
-            # Bij een fout: foutmelding tonen en de batch stopzetten.
-            # We geven de bestandsnaam en foutmelding mee in de lambda.
-            naam = Path(bestand).name
-            root.after(0, functools.partial(tkinter.messagebox.showerror, 'Foutje', f'Fout bij bestand:\n{naam}\n\n{e}'))  # type: ignore[arg-type]
-            root.after(0, functools.partial(status_var.set, f"Fout bij bestand {i}/{totaal}"))  # type: ignore[arg-type]
-            root.after(0, functools.partial(btn_run.config, state="normal"))  # type: ignore[arg-type]
-            return  # stop de lus, ga niet verder met de rest
-
-    # Alle bestanden succesvol verwerkt
-    root.after(0, functools.partial(status_var.set, f"Klaar! {totaal}/{totaal} bestanden geconverteerd."))  # type: ignore[arg-type]
+
+def _melden(index, status, detail):
+    # Status van één bestand, opgeroepen vanuit de batch-thread.
+    # De string wordt meteen berekend en via partial doorgegeven als
+    # nul-argumenten callable (thread-safe, type-correct).
+    if status == "bezig":
+        # Bij een invoermap groeit de lijst nog tijdens de batch
+        root.after(0, functools.partial(status_var.set, f"Bezig... {index + 1}/{len(input_files)}"))  # type: ignore[arg-type]
+    if status == "fout":
+        detail = ""   # de foutmelding komt in een apart venster
+    root.after(0, functools.partial(_markeer_bestand, index, status, detail))  # type: ignore[arg-type]
+
+
+def _gevonden(pad):
+    # Elk gevonden bestand meteen aan input_files en de listbox toevoegen,
+    # zodat het in de lijst staat vóór de batch het verwerkt.
+    input_files.append(pad)
+    root.after(0, functools.partial(_bestand_toevoegen, len(input_files) - 1))  # type: ignore[arg-type]
+
+
+def _bestand_toevoegen(index):
+    lb_bestanden.insert(index, "")
+    _markeer_bestand(index, "wacht")
+
+
+def _batch_einde():
+    # Knoppen terugzetten en de periodieke snelheidsweergave laten uitlopen.
+    voortgang["bezig"] = False
     root.after(0, functools.partial(btn_run.config, state="normal"))  # type: ignore[arg-type]
+    root.after(0, functools.partial(btn_input.config, state="normal"))  # type: ignore[arg-type]
+    root.after(0, functools.partial(btn_invoer_map.config, state="normal"))  # type: ignore[arg-type]
+    root.after(0, functools.partial(btn_profiel_laden.config, state="normal"))  # type: ignore[arg-type]
+    root.after(0, functools.partial(btn_stop.config, state="disabled"))  # type: ignore[arg-type]
 
 
 # =============================================================================
@@ -558,11 +660,14 @@ def open_files():
     # aanmaken en de globale lijst niet updaten.
     global input_files
     status_var.set("")
+    invoer_map.set("")   # losse bestanden in plaats van een invoermap
 
     bestanden = filedialog.askopenfilenames(
         filetypes=[('txt Bestanden', '.txt'), ('xyz Bestanden', '.xyz'),
                    ('pts Bestanden', '.pts'), ('csv Bestanden', '.csv'),
                    ('asc Bestanden', '.asc'), ('cgp Bestanden', '.cgp'),
+                   ('Excel-werkmappen', '.xlsx .xlsm'),
+                   ('Gecomprimeerd', '.gz .zst .xz'),
                    ('All Files', '.*')]
     )
 
@@ -576,6 +681,47 @@ def open_files():
             lb_bestanden.insert(tk.END, Path(f).name)
 
 
+def open_invoer_map():
+    # Een volledige map als invoer kiezen. De bestanden worden nog niet
+    # opgezocht: dat gebeurt pas tijdens de batch (zie _gevonden_bestanden),
+    # zodat ook mappen met tienduizenden bestanden meteen bruikbaar zijn.
+    global input_files
+    status_var.set("")
+    pad = filedialog.askdirectory()
+    if pad:
+        invoer_map.set(pad)
+        input_files = []
+        lb_bestanden.delete(0, tk.END)
+        txt_voorbeeld.config(state="normal")
+        txt_voorbeeld.delete("1.0", tk.END)
+        txt_voorbeeld.config(state="disabled")
+        voorbeeld_info_var.set(f"Invoermap: {pad}\nDe bestanden worden opgezocht tijdens de conversie.")
+
+
+def toon_voorbeeld(event=None):
+    # Voorbeeld van het (eerste) geselecteerde bestand in de listbox tonen.
+    # snel_voorbeeld leest enkel het begin van het bestand, dus ook bij
+    # bestanden van meerdere GB blijft de GUI direct reageren.
+    selectie = lb_bestanden.curselection()
+    if not selectie:
+        return
+    try:
+        bestand = input_files[selectie[0]]
+        voorbeeld = snel_voorbeeld(bestand)
+        tekst, info = "\n".join(voorbeeld["regels"]), voorbeeld_info(voorbeeld)
+        # Bij automatische detectie ook tonen welk formaat herkend werd
+        if auto_formaat_switch.get() and zonder_compressie(bestand).suffix.lower() != ".cgp":
+            info += "\n" + formaat_info(formaat_detecteren(bestand))
+    except (OSError, RuntimeError, ValueError) as e:
+        tekst, info = "", f"Kan bestand niet lezen: {e}"
+
+    txt_voorbeeld.config(state="normal")
+    txt_voorbeeld.delete("1.0", tk.END)
+    txt_voorbeeld.insert("1.0", tekst)
+    txt_voorbeeld.config(state="disabled")
+    voorbeeld_info_var.set(info)
+
+
 def open_output_dir():
     # askdirectory opent een dialoog voor het selecteren van een map (geen bestand).
     status_var.set("")
@@ -584,6 +730,40 @@ def open_output_dir():
         output_dir.set(pad)  # StringVar updaten → het tekstveld in de GUI updatet automatisch
 
 
+def open_profiel():
+    # Een opgeslagen taakprofiel (JSON of TOML) laden en alle widgets invullen
+    pad = filedialog.askopenfilename(filetypes=[('Taakprofielen', '.json .toml'), ('All Files', '.*')])
+    if not pad:
+        return
+    try:
+        profiel_toepassen(profiel_laden(pad))
+    except (OSError, ValueError) as e:
+        tkinter.messagebox.showerror("Profiel", f"Kan profiel niet laden:\n{pad}\n\n{e}")
+        return
+    status_var.set(f"Profiel geladen: {Path(pad).name}")
+
+
+def bewaar_profiel():
+    # Alle huidige keuzes als taakprofiel (JSON) opslaan. Zo'n profiel kan
+    # later opnieuw geladen worden, of zonder GUI uitgevoerd worden:
+    #   python batch_taak.py profiel.json
+    fout = _velden_controleren()
+    if fout:
+        tkinter.messagebox.showwarning("Ongeldige instellingen", fout)
+        return
+    pad = filedialog.asksaveasfilename(filetypes=[('Taakprofiel', '.json')], defaultextension='.json')
+    if not pad:
+        return
+    try:
+        profiel = profiel_ophalen(Path(pad).stem)
+        profiel["instellingen"]["processen"] = profiel_processen   # enkel bewaren, niet gebruiken
+        profiel_opslaan(profiel, pad)
+    except (OSError, ValueError) as e:
+        tkinter.messagebox.showerror("Profiel", f"Kan profiel niet opslaan:\n\n{e}")
+        return
+    status_var.set(f"Profiel opgeslagen: {Path(pad).name}")
+
+
 # =============================================================================
 # RECHTERMUISKLIK-MENU (knippen/kopiëren/plakken)
 # =============================================================================
@@ -616,7 +796,7 @@ def show_context_menu(event, entry_widget):
 #   f1/f2  : knoppen/opties voor de invoerbestanden
 #   f3/f4  : knoppen/opties voor de uitvoermap
 #   f5/f6  : reductievlak-instellingen
-#   f7/f8  : de converteerknop
+#   f7/f8  : de converteer- en stopknop
 #   f9/f10 : het statuslabel
 #
 # LabelFrame: een Frame met een zichtbare rand en een titel.
@@ -653,7 +833,7 @@ f5.grid(row=2, column=0, sticky=tk.NW, padx=2, pady=3)
 f6 = tk.LabelFrame(root, relief="groove", text="Reductievlak (LAT Negatief!!)")
 f6.grid(row=2, column=1, sticky=tk.NW, padx=2, pady=3)
 
-# --- Rij 3: Converteerknop ---
+# --- Rij 3: Converteer- en stopknop ---
 f7 = tk.Frame(root)
 f7.grid(row=3, column=0, sticky=tk.NW, padx=2, pady=5)
 
@@ -676,6 +856,10 @@ f10.grid(row=4, column=1, sticky=tk.NW, padx=2, pady=3)
 btn_input = tk.Button(f1, text="Invoer", command=open_files, font="bold", width=10, height=2)
 btn_input.grid(row=0, column=0, sticky=tk.NE, pady=2, padx=2)
 
+# Knop om een volledige map (met submappen) als invoer te kiezen
+btn_invoer_map = tk.Button(f1, text="Map", command=open_invoer_map, font="bold", width=10, height=2)
+btn_invoer_map.grid(row=1, column=0, sticky=tk.NE, pady=2, padx=2)
+
 # Subframe voor de listbox + scrollbar samen.
 # De listbox en scrollbar worden naast elkaar geplaatst via een eigen grid.
 # frame_lb fungeert als een container zodat de scrollbar netjes naast de
@@ -697,26 +881,80 @@ lb_bestanden.grid(row=0, column=0, sticky="nsew")
 scrollbar_lb = tk.Scrollbar(frame_lb, orient="vertical", command=lb_bestanden.yview)
 scrollbar_lb.grid(row=0, column=1, sticky="ns")
 lb_bestanden.config(yscrollcommand=scrollbar_lb.set)
+# Bij het selecteren van een bestand het voorbeeld eronder bijwerken
+lb_bestanden.bind("<<ListboxSelect>>", toon_voorbeeld)
+
+# Tekstveld met de eerste regels van het geselecteerde bestand (alleen-lezen)
+# en daaronder een label met codering, bestandsgrootte en geschatte rijen.
+txt_voorbeeld = tk.Text(f2, relief="sunken", width=70, height=5, bg="lightyellow", state="disabled")
+txt_voorbeeld.grid(row=1, column=0, sticky="ew", pady=2, padx=2)
+lbl_voorbeeld_info = tk.Label(f2, textvariable=voorbeeld_info_var, fg="gray30", justify=tk.LEFT)
+lbl_voorbeeld_info.grid(row=2, column=0, sticky=tk.W, pady=0, padx=2)
 
 # Combobox: dropdown voor het invoercoördinatenstelsel
 combo_conv_in = Combobox(f2, values=lst_conversies_input, height=10, width=30)
-combo_conv_in.grid(row=1, column=0, sticky=tk.W, pady=2, padx=2)
+combo_conv_in.grid(row=3, column=0, sticky=tk.W, pady=2, padx=2)
 combo_conv_in.set('UTM31')  # standaardwaarde
 
 # Combobox: dropdown voor het scheidingsteken van het invoerbestand
 combo_separator_in = Combobox(f2, values=lst_separator_input, height=10, width=30)
-combo_separator_in.grid(row=2, column=0, sticky=tk.W, pady=2, padx=2)
+combo_separator_in.grid(row=4, column=0, sticky=tk.W, pady=2, padx=2)
 combo_separator_in.set('spatie(decimaal punt)')
 
 # Checkbox: eerste kolom bevat een punt-ID in plaats van een coördinaat
 checkbox_eerste_kolom = tk.Checkbutton(f2, text="Eerste kolom bevat point-id",
                                         variable=eerste_kolom_naam_switch)
-checkbox_eerste_kolom.grid(row=3, column=0, sticky=tk.W, pady=2, padx=2)
+checkbox_eerste_kolom.grid(row=5, column=0, sticky=tk.W, pady=2, padx=2)
 
 # Checkbox: eerste rij van het invoerbestand is een titelrij en moet overgeslagen worden
 checkbox_header_input = tk.Checkbutton(f2, text="Negeer titelrij",
                                         variable=header_input_switch)
-checkbox_header_input.grid(row=4, column=0, sticky=tk.W, pady=2, padx=2)
+checkbox_header_input.grid(row=6, column=0, sticky=tk.W, pady=2, padx=2)
+
+# Checkbox: formaat per bestand automatisch detecteren. Wanneer aangevinkt
+# worden scheidingsteken, titelrij en punt-ID uit de eerste regels van elk
+# bestand afgeleid; de drie opties hierboven gelden dan enkel nog als
+# terugval voor bestanden waarvan het formaat niet herkend wordt.
+checkbox_auto_formaat = tk.Checkbutton(f2, text="Formaat automatisch detecteren",
+                                        variable=auto_formaat_switch, command=toon_voorbeeld)
+checkbox_auto_formaat.grid(row=7, column=0, sticky=tk.W, pady=2, padx=2)
+
+# Checkbox: steekproef vooraf transformeren en controleren of de punten in
+# het gebied van het gekozen invoerstelsel liggen. Afwijkende bestanden worden
+# overgeslagen en als "afgekeurd" gemarkeerd.
+checkbox_validatie = tk.Checkbutton(f2, text="Controleer werkgebied vooraf",
+                                     variable=validatie_switch)
+checkbox_validatie.grid(row=8, column=0, sticky=tk.W, pady=2, padx=2)
+
+# Vooruit lezen: hoeveel volgende bestanden al ingelezen worden terwijl het
+# huidige geconverteerd wordt, en hoeveel MB dat maximaal mag innemen.
+# Vooral nuttig op netwerkschijven. 0 bestanden = uitgeschakeld.
+frame_vooruit = tk.Frame(f2)
+frame_vooruit.grid(row=9, column=0, sticky=tk.W, pady=2, padx=2)
+tk.Label(frame_vooruit, text="Vooruit lezen: bestanden").grid(row=0, column=0, sticky=tk.W)
+txt_vooruit = tk.Entry(frame_vooruit, textvariable=vooruit_var, width=4)
+txt_vooruit.grid(row=0, column=1, sticky=tk.W, padx=2)
+tk.Label(frame_vooruit, text="max. MB").grid(row=0, column=2, sticky=tk.W)
+txt_vooruit_mb = tk.Entry(frame_vooruit, textvariable=vooruit_mb_var, width=6)
+txt_vooruit_mb.grid(row=0, column=3, sticky=tk.W, padx=2)
+
+# Welke bestanden uit een invoermap genomen worden ("Map"-knop)
+frame_patroon = tk.Frame(f2)
+frame_patroon.grid(row=10, column=0, sticky=tk.W, pady=2, padx=2)
+tk.Label(frame_patroon, text="Patroon (map):").grid(row=0, column=0, sticky=tk.W)
+txt_patroon = tk.Entry(frame_patroon, textvariable=patroon_var, width=40)
+txt_patroon.grid(row=0, column=1, sticky=tk.W, padx=2)
+checkbox_recursief = tk.Checkbutton(frame_patroon, text="Submappen", variable=recursief_switch)
+checkbox_recursief.grid(row=0, column=2, sticky=tk.W, padx=2)
+
+# Geheugenbudget voor de hele batch (chunks, vooruit lezen, schrijven,
+# sorteren, ontdubbelen). Een klein budget maakt de batch trager, niet fout.
+# 0 = geen grens (de vaste standaardwaarden).
+frame_geheugen = tk.Frame(f2)
+frame_geheugen.grid(row=11, column=0, sticky=tk.W, pady=2, padx=2)
+tk.Label(frame_geheugen, text="Geheugenbudget (MB, 0 = geen):").grid(row=0, column=0, sticky=tk.W)
+txt_geheugen = tk.Entry(frame_geheugen, textvariable=geheugen_var, width=6)
+txt_geheugen.grid(row=0, column=1, sticky=tk.W, padx=2)
 
 
 # =============================================================================
@@ -750,10 +988,17 @@ combo_separator_out.set('komma(decimaal punt)')
 # Label + combobox voor de uitvoerextensie.
 # In de batch-versie kiezen we de extensie eenmalig voor alle bestanden.
 # De bestandsnaam blijft gelijk aan de invoernaam, enkel de extensie wijzigt.
+# Ernaast de compressie: de uitvoer wordt tijdens het schrijven ingepakt.
 tk.Label(f4, text="Uitvoer extensie:").grid(row=3, column=0, sticky=tk.W, pady=(4, 0), padx=2)
-combo_extensie_out = Combobox(f4, values=lst_extensies, height=10, width=15)
-combo_extensie_out.grid(row=4, column=0, sticky=tk.W, pady=2, padx=2)
+frame_extensie = tk.Frame(f4)
+frame_extensie.grid(row=4, column=0, sticky=tk.W, pady=2, padx=2)
+combo_extensie_out = Combobox(frame_extensie, values=lst_extensies, height=10, width=15)
+combo_extensie_out.grid(row=0, column=0, sticky=tk.W)
 combo_extensie_out.set('.asc')
+tk.Label(frame_extensie, text="Compressie:").grid(row=0, column=1, sticky=tk.W, padx=(8, 2))
+combo_compressie_out = Combobox(frame_extensie, values=lst_compressies, height=10, width=8, state="readonly")
+combo_compressie_out.grid(row=0, column=2, sticky=tk.W)
+combo_compressie_out.set('geen')
 
 # Checkbox: Z-waarden omdraaien van teken (positief ↔ negatief)
 checkbox_diepte_hoogte = tk.Checkbutton(f4, text="Wissel hoogte/diepte",
@@ -765,6 +1010,105 @@ checkbox_header_output = tk.Checkbutton(f4, text="Titelrij toevoegen",
                                          variable=header_output_switch)
 checkbox_header_output.grid(row=6, column=0, sticky=tk.W, pady=2, padx=2)
 
+# Checkbox: per uitvoerbestand een samenvatting (bounding box, Z-bereik,
+# NaN/inf-tellingen) als JSON-bestand met dezelfde naam wegschrijven.
+# Daarnaast: een logboek van de hele batch (zie logboek), zodat een fout
+# tijdens een nachtelijke batch ook zonder het foutvenster terug te vinden is.
+frame_verslag = tk.Frame(f4)
+frame_verslag.grid(row=7, column=0, sticky=tk.W, pady=2, padx=2)
+checkbox_samenvatting = tk.Checkbutton(frame_verslag, text="Samenvatting per bestand (.json)",
+                                        variable=samenvatting_switch)
+checkbox_samenvatting.grid(row=0, column=0, sticky=tk.W)
+checkbox_logboek = tk.Checkbutton(frame_verslag, text="Logboek (.jsonl)", variable=logboek_switch)
+checkbox_logboek.grid(row=0, column=1, sticky=tk.W, padx=(8, 0))
+
+# Tegeluitvoer: checkbox en tegelgrootte naast elkaar in een subframe.
+# De grootte is in de eenheid van het uitvoerstelsel: meter, of graden bij WGS84.
+frame_tegels = tk.Frame(f4)
+frame_tegels.grid(row=8, column=0, sticky=tk.W, pady=2, padx=2)
+checkbox_tegels = tk.Checkbutton(frame_tegels, text="Uitvoer in tegels, grootte (m / graden):",
+                                  variable=tegel_switch)
+checkbox_tegels.grid(row=0, column=0, sticky=tk.W)
+txt_tegel_grootte = tk.Entry(frame_tegels, textvariable=tegel_grootte_var, width=10)
+txt_tegel_grootte.grid(row=0, column=1, sticky=tk.W, padx=2)
+
+# Samenvoegen: alle invoerbestanden in één uitvoerbestand (naam + gekozen
+# extensie in de uitvoermap), eventueel met een kolom "bron" per rij.
+frame_samenvoegen = tk.Frame(f4)
+frame_samenvoegen.grid(row=9, column=0, sticky=tk.W, pady=2, padx=2)
+checkbox_samenvoegen = tk.Checkbutton(frame_samenvoegen, text="Samenvoegen in één bestand:",
+                                       variable=samenvoegen_switch)
+checkbox_samenvoegen.grid(row=0, column=0, sticky=tk.W)
+txt_samenvoeg_naam = tk.Entry(frame_samenvoegen, textvariable=samenvoeg_naam_var, width=20)
+txt_samenvoeg_naam.grid(row=0, column=1, sticky=tk.W, padx=2)
+checkbox_bron_kolom = tk.Checkbutton(frame_samenvoegen, text="Kolom met bronbestand",
+                                      variable=bron_kolom_switch)
+checkbox_bron_kolom.grid(row=0, column=2, sticky=tk.W, padx=2)
+
+# Uitdunnen tijdens de conversie: methode en waarde (N of celgrootte in
+# eenheden van het uitvoerstelsel). Zie UITDUN_METHODES in conversie_kern.
+frame_uitdunnen = tk.Frame(f4)
+frame_uitdunnen.grid(row=10, column=0, sticky=tk.W, pady=2, padx=2)
+tk.Label(frame_uitdunnen, text="Uitdunnen:").grid(row=0, column=0, sticky=tk.W)
+combo_uitdunnen = Combobox(frame_uitdunnen, values=list(UITDUN_METHODES), height=10, width=25,
+                           state="readonly")
+combo_uitdunnen.grid(row=0, column=1, sticky=tk.W, padx=2)
+combo_uitdunnen.set("geen uitdunning")
+tk.Label(frame_uitdunnen, text="N / celgrootte:").grid(row=0, column=2, sticky=tk.W)
+txt_uitdun_waarde = tk.Entry(frame_uitdunnen, textvariable=uitdun_waarde_var, width=8)
+txt_uitdun_waarde.grid(row=0, column=3, sticky=tk.W, padx=2)
+
+# Ontdubbelen: punten op dezelfde XY-positie (binnen de tolerantie, in
+# eenheden van het uitvoerstelsel) maar één keer wegschrijven.
+frame_ontdubbelen = tk.Frame(f4)
+frame_ontdubbelen.grid(row=11, column=0, sticky=tk.W, pady=2, padx=2)
+checkbox_ontdubbelen = tk.Checkbutton(frame_ontdubbelen, text="Dubbele punten verwijderen, tolerantie (0 = exact):",
+                                       variable=ontdubbel_switch)
+checkbox_ontdubbelen.grid(row=0, column=0, sticky=tk.W)
+txt_ontdubbel_tolerantie = tk.Entry(frame_ontdubbelen, textvariable=ontdubbel_tolerantie_var, width=8)
+txt_ontdubbel_tolerantie.grid(row=0, column=1, sticky=tk.W, padx=2)
+
+# Snelle conversie tussen L72, L2008 en UTM31 via een vooraf berekend
+# correctieraster (afwijking < 1 mm). De eerste keer wordt het raster
+# opgebouwd (enkele seconden), daarna komt het uit de cache.
+checkbox_snel_raster = tk.Checkbutton(f4, text="Snelle conversie via correctieraster (L72/L2008/UTM31)",
+                                       variable=snel_raster_switch)
+checkbox_snel_raster.grid(row=12, column=0, sticky=tk.W, pady=2, padx=2)
+
+# Hoogte: Z samen met X en Y omzetten naar een ander hoogtestelsel (TAW,
+# LAT of ellipsoïdale hoogte). LAT gebruikt de zone van het reductievlak
+# hieronder; de reductievlakcorrectie zelf moet dan op NONE staan.
+frame_hoogte = tk.Frame(f4)
+frame_hoogte.grid(row=13, column=0, sticky=tk.W, pady=2, padx=2)
+tk.Label(frame_hoogte, text="Hoogte omzetten van:").grid(row=0, column=0, sticky=tk.W)
+combo_hoogte_in = Combobox(frame_hoogte, values=lst_hoogtes, height=10, width=10, state="readonly")
+combo_hoogte_in.grid(row=0, column=1, sticky=tk.W, padx=2)
+combo_hoogte_in.set("geen")
+tk.Label(frame_hoogte, text="naar:").grid(row=0, column=2, sticky=tk.W)
+combo_hoogte_uit = Combobox(frame_hoogte, values=lst_hoogtes, height=10, width=10, state="readonly")
+combo_hoogte_uit.grid(row=0, column=3, sticky=tk.W, padx=2)
+combo_hoogte_uit.set("geen")
+
+# Ruimtelijk sorteren: punten die dicht bij elkaar liggen komen ook dicht bij
+# elkaar in het uitvoerbestand (sneller inlezen in rastersoftware). Werkt
+# ook voor bestanden groter dan het geheugen (via tijdelijke bestanden).
+frame_sorteren = tk.Frame(f4)
+frame_sorteren.grid(row=15, column=0, sticky=tk.W, pady=2, padx=2)
+tk.Label(frame_sorteren, text="Uitvoer sorteren:").grid(row=0, column=0, sticky=tk.W)
+combo_sorteren = Combobox(frame_sorteren, values=list(SORTEER_METHODES), height=10, width=20,
+                          state="readonly")
+combo_sorteren.grid(row=0, column=1, sticky=tk.W, padx=2)
+combo_sorteren.set("niet sorteren")
+
+# Extra uitvoerstelsels: elk bestand wordt één keer gelezen en naar elk
+# aangevinkt stelsel geschreven (naam_L72.asc, naam_WGS84.asc, ...).
+frame_extra_stelsels = tk.Frame(f4)
+frame_extra_stelsels.grid(row=14, column=0, sticky=tk.W, pady=2, padx=2)
+tk.Label(frame_extra_stelsels, text="Ook naar:").grid(row=0, column=0, sticky=tk.W)
+for kolom, stelsel in enumerate(lst_conversies_output, start=1):
+    tk.Checkbutton(frame_extra_stelsels, text=stelsel,
+                   variable=extra_stelsel_switches[stelsel]).grid(row=0, column=kolom, sticky=tk.W)
+
 
 # =============================================================================
 # WIDGETS: REDUCTIEVLAK (f5 / f6)
@@ -817,6 +1161,19 @@ radio_button_reductievlak_waarde.grid(row=6, column=1, sticky=tk.W, pady=2, padx
 btn_run = tk.Button(f8, text="Converteer batch", font="bold", command=run_batch, width=15, height=2)
 btn_run.grid(row=0, column=0, sticky=tk.E, pady=2, padx=2)
 
+# Stop-knop: enkel actief terwijl een batch loopt. Het lopende bestand wordt
+# na de huidige chunk afgebroken en het onvolledige uitvoerbestand verwijderd.
+btn_stop = tk.Button(f8, text="Stop", font="bold", command=stop_batch, width=10, height=2,
+                     state="disabled")
+btn_stop.grid(row=0, column=1, sticky=tk.E, pady=2, padx=2)
+
+# Taakprofiel laden of opslaan (zie batch_taak): alle keuzes hierboven,
+# inclusief invoer en uitvoermap, in één bestand.
+btn_profiel_laden = tk.Button(f8, text="Profiel laden", command=open_profiel, width=12, height=2)
+btn_profiel_laden.grid(row=0, column=2, sticky=tk.E, pady=2, padx=(12, 2))
+btn_profiel_opslaan = tk.Button(f8, text="Profiel opslaan", command=bewaar_profiel, width=12, height=2)
+btn_profiel_opslaan.grid(row=0, column=3, sticky=tk.E, pady=2, padx=2)
+
 
 # =============================================================================
 # WIDGETS: STATUSLABEL (f9 / f10)
@@ -835,6 +1192,11 @@ lbl_status = tk.Label(
 )
 lbl_status.grid(row=0, column=0, sticky=tk.NW, pady=2, padx=2)
 
+# Label met de actuele doorvoersnelheid (punten/s en MB/s), ververst door
+# _toon_voortgang zolang de batch loopt.
+lbl_snelheid = tk.Label(f10, textvariable=snelheid_var, font=("TkDefaultFont", 10))
+lbl_snelheid.grid(row=1, column=0, sticky=tk.NW, pady=2, padx=2)
+
 
 # =============================================================================
 # HOOFDLUS
@@ -5,7 +5,7 @@ a = Analysis(
     ['coordinaat_conversie_batch.py'],
     pathex=[],
     binaries=[],
-    datas=[('coordinaat_conversie.ico', '.')],
+    datas=[('coordinaat_conversie.ico', '.'), ('geoide', 'geoide')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
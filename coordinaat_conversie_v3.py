@@ -10,6 +10,8 @@ import sys
 from pyproj import Transformer
 from  pathlib import Path
 from shapely.geometry import Polygon
+from conversie_kern import snel_voorbeeld, voorbeeld_info, formaat_detecteren, formaat_info, SCHEIDINGSTEKENS
+from batch_taak import profiel_laden
 
 # pad naar icoon werkt zowel als script als als PyInstaller exe
 def resource_path(filename):
@@ -32,6 +34,8 @@ input_file = StringVar()
 input_file.set("")
 input_preview = StringVar()
 input_preview.set("")
+input_info = StringVar()
+input_info.set("")
 output_file = StringVar()
 output_file.set("")
 lst_conversies_input = ('L72', 'UTM31', 'WGS84','L2008')
@@ -102,10 +106,23 @@ def scheidingsteken_geven():
     separator, decimal = output_separators[combo_separator_out.get()]
     return separator, decimal
 
-def preview(input_file):#functie om preview in put in tekstveld te zetten
-    with open(input_file, "r") as f:
-        coord = [lijn.strip() for lijn in f if lijn.strip()]  # sla enkel lege regels over
-    input_preview.set("\n".join(coord[:5]))
+def preview(input_file, detecteren=True):#functie om preview in put in tekstveld te zetten
+    #enkel het begin van het bestand wordt gelezen, ook grote bestanden zijn direct zichtbaar
+    voorbeeld = snel_voorbeeld(input_file)
+    input_preview.set("\n".join(voorbeeld["regels"]))
+    info = voorbeeld_info(voorbeeld)#codering, grootte en geschat aantal rijen
+
+    if detecteren and Path(input_file).suffix.lower() != ".cgp":
+        #formaat detecteren uit de eerste regels en de opties meteen juist zetten
+        #de gebruiker kan ze nadien nog aanpassen
+        formaat = formaat_detecteren(input_file)
+        if formaat is not None:
+            combo_separator_in.set(formaat["separator_label"])
+            header_input_switch.set(formaat["header"])
+            if formaat["naam_kolom"] is not None:#onzeker (bijv. raster met gehele X): vinkje laten staan
+                eerste_kolom_naam_switch.set(formaat["naam_kolom"])
+        info += "\n" + formaat_info(formaat)
+    input_info.set(info)
 
 def update_preview(*args):#functie om tekstveld geupdate houden
     txt_input_file.config(state="normal")
@@ -264,7 +281,8 @@ def open_file():
                                                            ('csv Bestanden', '.csv'), ('asc Bestanden', '.asc'),
                                                            ('cgp Bestanden', '.cgp'), ('All Files', '.*')]))
 
-    preview(input_file.get())
+    if input_file.get():#dialoog geannuleerd: geen voorbeeld
+        preview(input_file.get())
 
 
 
@@ -277,6 +295,74 @@ def save_file():
                                                               ('All Files', '.*')],
                                                    defaultextension='.asc'))
 
+def scheiding_label(separator, decimal):
+    #label uit de dropdown zoeken bij de tekens uit een profiel
+    for label, tekens in SCHEIDINGSTEKENS.items():
+        if tekens == (separator, decimal):
+            return label
+    raise ValueError(f"Scheidingsteken {separator!r} met decimaalteken {decimal!r} staat niet in de keuzelijst.")
+
+def niet_toepasbaar(profiel):
+    #opties uit een profiel die deze versie niet kan uitvoeren (alleen die de uitvoer veranderen)
+    instellingen = profiel["instellingen"]
+    opties = []
+    if instellingen["hoogte_in"] or instellingen["hoogte_uit"]:
+        opties.append(f"hoogte omzetten ({instellingen['hoogte_in'] or '-'} → {instellingen['hoogte_uit'] or '-'}): "
+                      "Z blijft ongewijzigd")
+    if len(profiel["stelsels_uit"]) > 1:
+        opties.append(f"extra uitvoerstelsels ({', '.join(profiel['stelsels_uit'][1:])}): "
+                      f"enkel naar {profiel['stelsels_uit'][0]}")
+    if instellingen["tegel_grootte"]:
+        opties.append(f"tegels van {instellingen['tegel_grootte']}")
+    if instellingen["uitdunnen"]:
+        opties.append(f"uitdunnen ({instellingen['uitdunnen']})")
+    if instellingen["sorteren"]:
+        opties.append(f"sorteren ({instellingen['sorteren']})")
+    if profiel["ontdubbelen"]:
+        opties.append("ontdubbelen")
+    return opties
+
+def open_profiel():
+    #taakprofiel van de batchversie laden (zie batch_taak), enkel de conversie-instellingen worden gebruikt
+    #opties die deze versie niet kent (hoogte omzetten, tegels, uitdunnen ed.) worden eerst gemeld
+    status_var.set("")
+    pad = filedialog.askopenfilename(filetypes=[('Taakprofielen', '.json .toml'), ('All Files', '.*')])
+    if not pad:
+        return
+    try:
+        profiel = profiel_laden(pad)
+        instellingen = profiel["instellingen"]
+        separator_in = scheiding_label(instellingen["separator_in"], instellingen["decimal_in"])
+        separator_uit = scheiding_label(instellingen["separator_uit"], instellingen["decimal_uit"])
+    except (OSError, ValueError) as e:
+        tkinter.messagebox.showerror('Foutje', f'Kan profiel niet laden!\n\n{e}')
+        return
+
+    #de conversie zou anders stil afwijken van de batchversie: de gebruiker beslist
+    genegeerd = niet_toepasbaar(profiel)
+    if genegeerd and not tkinter.messagebox.askokcancel(
+            'Let op', 'Deze opties uit het profiel kan de single-versie niet uitvoeren:\n\n'
+            + "\n".join(f"- {optie}" for optie in genegeerd)
+            + '\n\nGebruik hiervoor de batchversie. Profiel toch laden zonder deze opties?', icon='warning'):
+        return
+
+    combo_conv_in.set(instellingen["stelsel_in"])
+    combo_conv_out.set(instellingen["stelsel_uit"])
+    combo_separator_in.set(separator_in)
+    combo_separator_out.set(separator_uit)
+    header_input_switch.set(instellingen["titelrij_in"])
+    header_output_switch.set(instellingen["titelrij_uit"])
+    eerste_kolom_naam_switch.set(instellingen["naam_kolom"])
+    diepte_switch.set(instellingen["diepte"])
+    reductievlak_conversie_keuze.set(instellingen["reductievlak_keuze"])
+    reductievlak_waarde.set(instellingen["reductievlak_waarde"])
+
+    #profiel met precies één invoerbestand: dat bestand ook openen
+    if len(profiel["bestanden"]) == 1 and Path(profiel["bestanden"][0]).is_file():
+        input_file.set(profiel["bestanden"][0])
+        preview(input_file.get(), detecteren=profiel["auto_formaat"])
+    status_var.set(f"Profiel {profiel['naam']} geladen")
+
 def show_context_menu(event, entry_widget):
     #context menu voor textboxen
     context_menu = tk.Menu(root, tearoff=0)
@@ -334,6 +420,8 @@ f10.grid(row=4, column=1, sticky=tk.NW,padx=2,pady=3)
 #opbouw knoppen, labels en textboxen
 btn_input = tk.Button(f1, text="Invoer", command=open_file, font="bold", width=10, height=2)
 btn_input.grid(row=0, column=0, sticky=tk.E, pady=2, padx=2)
+btn_profiel = tk.Button(f1, text="Profiel", command=open_profiel, font="bold", width=10, height=2)
+btn_profiel.grid(row=1, column=0, sticky=tk.E, pady=2, padx=2)
 txt_input = tk.Entry(f2, textvariable=input_file, relief="sunken",width=70, state="readonly",readonlybackground="lightyellow")
 txt_input.grid(row=0, column=0, sticky="nsew", pady=2, padx=2)
 txt_input.bind("<Button-3>", lambda event: show_context_menu(event, txt_input))
@@ -344,20 +432,22 @@ txt_input_file.config(state="normal")
 txt_input_file.delete("1.0", tk.END)
 txt_input_file.insert("1.0", input_preview.get())
 txt_input_file.config(state="disabled")
+lbl_input_info = tk.Label(f2, textvariable=input_info, fg="gray30", justify=tk.LEFT)
+lbl_input_info.grid(row=2, column=0, sticky=tk.W, pady=0, padx=2)
 
 combo_conv_in = Combobox(f2, values=lst_conversies_input, height=10, width=30)
-combo_conv_in.grid(row=2, column=0, sticky=tk.W, pady=2, padx=2)
+combo_conv_in.grid(row=3, column=0, sticky=tk.W, pady=2, padx=2)
 combo_conv_in.set('UTM31')
 
 combo_separator_in = Combobox(f2, values=lst_separator_input, height=10, width=30)
-combo_separator_in.grid(row=3, column=0, sticky=tk.W, pady=2, padx=2)
+combo_separator_in.grid(row=4, column=0, sticky=tk.W, pady=2, padx=2)
 combo_separator_in.set('spatie(decimaal punt)')
 checkbox_eerste_kolom = tk.Checkbutton(f2, text="Eerste kolom bevat point-id",
                              variable=eerste_kolom_naam_switch)
-checkbox_eerste_kolom.grid(row=4, column=0, sticky=tk.W, pady=2, padx=2)
+checkbox_eerste_kolom.grid(row=5, column=0, sticky=tk.W, pady=2, padx=2)
 checkbox_header_input = tk.Checkbutton(f2, text="Negeer titelrij",
                              variable=header_input_switch)
-checkbox_header_input.grid(row=5, column=0, sticky=tk.W, pady=2, padx=2)
+checkbox_header_input.grid(row=6, column=0, sticky=tk.W, pady=2, padx=2)
 
 btn_output = tk.Button(f3, text="Uitvoer", font="bold", command=save_file, width=10, height=2)
 btn_output.grid(row=0, column=0, sticky=tk.E, pady=2, padx=2)
@@ -0,0 +1,308 @@
+# =============================================================================
+# GEOPACKAGE-UITVOER (.gpkg)
+# =============================================================================
+# Miljoenen geconverteerde punten laden in een GIS gaat veel sneller uit een
+# GeoPackage met ruimtelijke index dan uit een tekstbestand, en de punt-ID,
+# Z en VAR blijven als attributen bij elk punt. Een GeoPackage is een
+# SQLite-databank met vaste metadatatabellen (OGC-standaard), dus alles kan
+# met de standaardbibliotheek (sqlite3); er is geen GDAL nodig.
+#
+# Werkwijze:
+#   gpkg_openen()     : nieuw bestand met de metadatatabellen en het stelsel
+#   gpkg_punten()     : één chunk punten als features, in één transactie.
+#                       De eerste chunk bepaalt de attribuutkolommen (alle
+#                       kolommen behalve X en Y, bijv. point, Z, VAR, bron).
+#   gpkg_polygoon()   : één polygoon (werkgebied uit een CGP-bestand)
+#   gpkg_afsluiten()  : de ruimtelijke index (R-tree) pas op het einde in één
+#                       keer opbouwen, de omhullende bijwerken en sluiten
+#
+# De geometrie is een GeoPackage-blob: een korte kop ("GP", vlaggen,
+# stelsel) gevolgd door de WKB van het punt. Die blobs worden per chunk met
+# numpy in één keer opgebouwd. Een punt dat niet te transformeren was (inf,
+# NaN) wordt een leeg punt en komt niet in de index.
+#
+# GeoPackage gebruikt altijd X = oost (lengte) en Y = noord (breedte). Bij
+# een stelsel met breedte als eerste as (WGS84) worden de kolommen dus
+# omgewisseld.
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   re      : tabelnaam uit de bestandsnaam maken
+#   sqlite3 : de GeoPackage zelf (SQLite met R-tree)
+#   time    : tijdstip van de laatste wijziging in gpkg_contents
+#   numpy   : geometrieblobs per chunk opbouwen en teruglezen
+#   pandas  : soort van de attribuutkolommen
+#   pyproj  : definitie (WKT) en asvolgorde van het stelsel
+#   pathlib : bestaand bestand verwijderen, tabelnaam
+# -----------------------------------------------------------------------------
+import re
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+from pyproj import CRS
+from pyproj.enums import WktVersion
+from pathlib import Path
+
+
+GPKG_APPLICATION_ID = 0x47504B47   # "GPKG"
+GPKG_VERSIE = 10200                # GeoPackage 1.2
+GEOMETRIE_KOLOM = "geom"
+INDEX_BLOK = 100_000               # rijen per leesbeurt bij het opbouwen van de index
+
+# Geometrieblob van een punt: kop (8 bytes) + WKB (21 bytes), little endian
+_PUNT_BLOB = np.dtype([("magic", "S2"), ("versie", "u1"), ("vlaggen", "u1"), ("srs", "<i4"),
+                       ("orde", "u1"), ("soort", "<u4"), ("x", "<f8"), ("y", "<f8")])
+_VLAG_LITTLE_ENDIAN = 0x01
+_VLAG_LEEG = 0x10
+_VLAG_OMHULLENDE_XY = 0x02
+
+_VERPLICHTE_STELSELS = [
+    ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", "undefined cartesian coordinate reference system"),
+    ("Undefined geographic SRS", 0, "NONE", 0, "undefined", "undefined geographic coordinate reference system"),
+]
+
+_METADATA = """
+CREATE TABLE gpkg_spatial_ref_sys (
+    srs_name TEXT NOT NULL, srs_id INTEGER NOT NULL PRIMARY KEY, organization TEXT NOT NULL,
+    organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT);
+CREATE TABLE gpkg_contents (
+    table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE,
+    description TEXT DEFAULT '', last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+    min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER,
+    CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys(srs_id));
+CREATE TABLE gpkg_geometry_columns (
+    table_name TEXT NOT NULL, column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL,
+    srs_id INTEGER NOT NULL, z TINYINT NOT NULL, m TINYINT NOT NULL,
+    CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+    CONSTRAINT fk_gc_tn FOREIGN KEY (table_name) REFERENCES gpkg_contents(table_name),
+    CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys (srs_id));
+CREATE TABLE gpkg_extensions (
+    table_name TEXT, column_name TEXT, extension_name TEXT NOT NULL, definition TEXT NOT NULL,
+    scope TEXT NOT NULL, CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name));
+"""
+
+# Triggers uit de standaard (extensie gpkg_rtree_index): houden de index
+# bij als een GIS het bestand later bewerkt. De ST_-functies levert dat GIS.
+_RTREE_TRIGGERS = """
+CREATE TRIGGER "rtree_{t}_{c}_insert" AFTER INSERT ON "{t}"
+WHEN (new."{c}" NOT NULL AND NOT ST_IsEmpty(NEW."{c}"))
+BEGIN
+  INSERT OR REPLACE INTO "rtree_{t}_{c}" VALUES (
+    NEW."fid", ST_MinX(NEW."{c}"), ST_MaxX(NEW."{c}"), ST_MinY(NEW."{c}"), ST_MaxY(NEW."{c}"));
+END;
+CREATE TRIGGER "rtree_{t}_{c}_update1" AFTER UPDATE OF "{c}" ON "{t}"
+WHEN OLD."fid" = NEW."fid" AND (NEW."{c}" NOTNULL AND NOT ST_IsEmpty(NEW."{c}"))
+BEGIN
+  INSERT OR REPLACE INTO "rtree_{t}_{c}" VALUES (
+    NEW."fid", ST_MinX(NEW."{c}"), ST_MaxX(NEW."{c}"), ST_MinY(NEW."{c}"), ST_MaxY(NEW."{c}"));
+END;
+CREATE TRIGGER "rtree_{t}_{c}_update2" AFTER UPDATE OF "{c}" ON "{t}"
+WHEN OLD."fid" = NEW."fid" AND (NEW."{c}" ISNULL OR ST_IsEmpty(NEW."{c}"))
+BEGIN
+  DELETE FROM "rtree_{t}_{c}" WHERE id = OLD."fid";
+END;
+CREATE TRIGGER "rtree_{t}_{c}_update3" AFTER UPDATE ON "{t}"
+WHEN OLD."fid" != NEW."fid" AND (NEW."{c}" NOTNULL AND NOT ST_IsEmpty(NEW."{c}"))
+BEGIN
+  DELETE FROM "rtree_{t}_{c}" WHERE id = OLD."fid";
+  INSERT OR REPLACE INTO "rtree_{t}_{c}" VALUES (
+    NEW."fid", ST_MinX(NEW."{c}"), ST_MaxX(NEW."{c}"), ST_MinY(NEW."{c}"), ST_MaxY(NEW."{c}"));
+END;
+CREATE TRIGGER "rtree_{t}_{c}_update4" AFTER UPDATE ON "{t}"
+WHEN OLD."fid" != NEW."fid" AND (NEW."{c}" ISNULL OR ST_IsEmpty(NEW."{c}"))
+BEGIN
+  DELETE FROM "rtree_{t}_{c}" WHERE id IN (OLD."fid", NEW."fid");
+END;
+CREATE TRIGGER "rtree_{t}_{c}_delete" AFTER DELETE ON "{t}"
+WHEN old."{c}" NOT NULL
+BEGIN
+  DELETE FROM "rtree_{t}_{c}" WHERE id = OLD."fid";
+END;
+"""
+
+
+def is_geopackage(pad) -> bool:
+    return Path(pad).suffix.lower() == ".gpkg"
+
+
+def _tabelnaam(pad) -> str:
+    # Bestandsnaam zonder extensie, enkel letters, cijfers en _
+    naam = re.sub(r"\W", "_", Path(pad).stem, flags=re.ASCII).strip("_")
+    return naam if naam and not naam[0].isdigit() else f"punten_{naam}".rstrip("_")
+
+
+def gpkg_openen(pad, crs_code: str) -> dict:
+    # Bestaand bestand wordt vervangen (zoals mode 'w' bij tekstuitvoer)
+    Path(pad).unlink(missing_ok=True)
+    crs = CRS.from_user_input(crs_code)
+    organisatie, code = crs.to_authority()
+    db = sqlite3.connect(pad, isolation_level=None)   # transacties zelf beheren
+    try:
+        db.execute(f"PRAGMA application_id = {GPKG_APPLICATION_ID}")
+        db.execute(f"PRAGMA user_version = {GPKG_VERSIE}")
+        db.executescript(_METADATA)
+        db.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", _VERPLICHTE_STELSELS + [
+            ("WGS 84 geodetic", 4326, "EPSG", 4326, CRS.from_epsg(4326).to_wkt(WktVersion.WKT1_GDAL),
+             "longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid")])
+        db.execute("INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+                   (crs.name, int(code), organisatie, int(code), crs.to_wkt(WktVersion.WKT1_GDAL), ""))
+    except Exception:
+        db.close()
+        raise
+    return {
+        "pad":         str(pad),
+        "db":          db,
+        "tabel":       _tabelnaam(pad),
+        "srs":         int(code),
+        # breedte als eerste as (EPSG:4326) → kolommen omwisselen
+        "omwisselen":  crs.axis_info[0].direction in ("north", "south"),
+        "kolommen":    None,       # attribuutkolommen, vastgelegd bij de eerste chunk
+        "geometrie":   None,
+        "omhullende":  [np.inf, np.inf, -np.inf, -np.inf],   # min_x, min_y, max_x, max_y
+    }
+
+
+def _sql_soort(kolom: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(kolom) or pd.api.types.is_integer_dtype(kolom):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(kolom):
+        return "DOUBLE"
+    return "TEXT"
+
+
+def _tabel_maken(gpkg: dict, geometrie: str, attributen: dict):
+    tabel, db = gpkg["tabel"], gpkg["db"]
+    kolommen = "".join(f', "{naam}" {soort}' for naam, soort in attributen.items())
+    db.execute("BEGIN")
+    db.execute(f'CREATE TABLE "{tabel}" (fid INTEGER PRIMARY KEY AUTOINCREMENT, '
+               f'"{GEOMETRIE_KOLOM}" {geometrie}{kolommen})')
+    db.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, srs_id) VALUES (?, 'features', ?, ?)",
+               (tabel, tabel, gpkg["srs"]))
+    db.execute("INSERT INTO gpkg_geometry_columns VALUES (?, ?, ?, ?, 0, 0)",
+               (tabel, GEOMETRIE_KOLOM, geometrie, gpkg["srs"]))
+    db.execute("COMMIT")
+    gpkg["kolommen"], gpkg["geometrie"] = list(attributen), geometrie
+
+
+def _omhullende_bijwerken(gpkg: dict, x: np.ndarray, y: np.ndarray):
+    eindig = np.isfinite(x) & np.isfinite(y)
+    if eindig.any():
+        o = gpkg["omhullende"]
+        o[0], o[1] = min(o[0], x[eindig].min()), min(o[1], y[eindig].min())
+        o[2], o[3] = max(o[2], x[eindig].max()), max(o[3], y[eindig].max())
+
+
+def gpkg_punten(gpkg: dict, df: pd.DataFrame, x_header: str, y_header: str):
+    if gpkg["omwisselen"]:
+        x_header, y_header = y_header, x_header
+    attributen = {naam: _sql_soort(df[naam]) for naam in df.columns if naam not in (x_header, y_header)}
+    if gpkg["kolommen"] is None:
+        _tabel_maken(gpkg, "POINT", attributen)
+    elif gpkg["geometrie"] != "POINT":
+        raise ValueError("Punten en een werkgebied (CGP) kunnen niet in hetzelfde GeoPackage.")
+    elif list(attributen) != gpkg["kolommen"]:
+        raise ValueError("Kolommen verschillen van de vorige bestanden: "
+                         f"{list(attributen)} i.p.v. {gpkg['kolommen']}")
+
+    x = df[x_header].to_numpy(dtype=float)
+    y = df[y_header].to_numpy(dtype=float)
+    leeg = ~(np.isfinite(x) & np.isfinite(y))
+    blobs = np.zeros(len(df), dtype=_PUNT_BLOB)
+    blobs["magic"] = b"GP"
+    blobs["vlaggen"] = np.where(leeg, _VLAG_LITTLE_ENDIAN | _VLAG_LEEG, _VLAG_LITTLE_ENDIAN)
+    blobs["srs"] = gpkg["srs"]
+    blobs["orde"] = 1
+    blobs["soort"] = 1   # WKB Point
+    blobs["x"] = np.where(leeg, np.nan, x)
+    blobs["y"] = np.where(leeg, np.nan, y)
+    data = blobs.tobytes()
+    grootte = _PUNT_BLOB.itemsize
+    geometrie = [data[i:i + grootte] for i in range(0, len(data), grootte)]
+    _omhullende_bijwerken(gpkg, x, y)
+
+    # Attributen als Python-waarden (NaN → NULL), in kolomvolgorde
+    waarden = [df[naam].astype(object).where(df[naam].notna(), None).tolist() for naam in gpkg["kolommen"]]
+    plaatsen = ", ".join("?" * (1 + len(waarden)))
+    namen = "".join(f', "{naam}"' for naam in gpkg["kolommen"])
+    db = gpkg["db"]
+    db.execute("BEGIN")
+    try:
+        db.executemany(f'INSERT INTO "{gpkg["tabel"]}" ("{GEOMETRIE_KOLOM}"{namen}) VALUES ({plaatsen})',
+                       zip(geometrie, *waarden))
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+
+
+def gpkg_polygoon(gpkg: dict, x: np.ndarray, y: np.ndarray):
+    # Eén polygoon met één ring; de ring wordt gesloten als dat nog niet zo is
+    if gpkg["omwisselen"]:
+        x, y = y, x
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if len(x) and (x[0] != x[-1] or y[0] != y[-1]):
+        x, y = np.append(x, x[0]), np.append(y, y[0])
+    if gpkg["kolommen"] is None:
+        _tabel_maken(gpkg, "POLYGON", {})
+    elif gpkg["geometrie"] != "POLYGON":
+        raise ValueError("Punten en een werkgebied (CGP) kunnen niet in hetzelfde GeoPackage.")
+    _omhullende_bijwerken(gpkg, x, y)
+    omhullende = [x.min(), x.max(), y.min(), y.max()]
+    kop = b"GP" + bytes([0, _VLAG_LITTLE_ENDIAN | _VLAG_OMHULLENDE_XY]) + np.int32(gpkg["srs"]).tobytes()
+    wkb = (bytes([1]) + np.uint32(3).tobytes() + np.uint32(1).tobytes() + np.uint32(len(x)).tobytes() +
+           np.column_stack([x, y]).astype("<f8").tobytes())
+    db = gpkg["db"]
+    db.execute("BEGIN")
+    db.execute(f'INSERT INTO "{gpkg["tabel"]}" ("{GEOMETRIE_KOLOM}") VALUES (?)',
+               (kop + np.array(omhullende, dtype="<f8").tobytes() + wkb,))
+    db.execute("COMMIT")
+
+
+def _index_opbouwen(gpkg: dict):
+    # R-tree in één keer vullen vanuit de geometrieblobs, per INDEX_BLOK rijen
+    tabel, db = gpkg["tabel"], gpkg["db"]
+    rtree = f"rtree_{tabel}_{GEOMETRIE_KOLOM}"
+    db.execute("BEGIN")
+    db.execute(f'CREATE VIRTUAL TABLE "{rtree}" USING rtree(id, minx, maxx, miny, maxy)')
+    if gpkg["geometrie"] == "POINT":
+        cursor = db.execute(f'SELECT fid, "{GEOMETRIE_KOLOM}" FROM "{tabel}"')
+        while rijen := cursor.fetchmany(INDEX_BLOK):
+            fid = np.fromiter((rij[0] for rij in rijen), dtype=np.int64, count=len(rijen))
+            blobs = np.frombuffer(b"".join(rij[1] for rij in rijen), dtype=_PUNT_BLOB)
+            gevuld = (blobs["vlaggen"] & _VLAG_LEEG) == 0
+            x, y = blobs["x"][gevuld], blobs["y"][gevuld]
+            db.executemany(f'INSERT INTO "{rtree}" VALUES (?, ?, ?, ?, ?)',
+                           zip(fid[gevuld].tolist(), x.tolist(), x.tolist(), y.tolist(), y.tolist()))
+    else:
+        for fid, blob in db.execute(f'SELECT fid, "{GEOMETRIE_KOLOM}" FROM "{tabel}"').fetchall():
+            min_x, max_x, min_y, max_y = np.frombuffer(blob[8:40], dtype="<f8")
+            db.execute(f'INSERT INTO "{rtree}" VALUES (?, ?, ?, ?, ?)',
+                       (fid, float(min_x), float(max_x), float(min_y), float(max_y)))
+    for trigger in _RTREE_TRIGGERS.format(t=tabel, c=GEOMETRIE_KOLOM).split("END;")[:-1]:
+        db.execute(trigger + "END;")
+    db.execute("INSERT INTO gpkg_extensions VALUES (?, ?, 'gpkg_rtree_index', "
+               "'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')",
+               (tabel, GEOMETRIE_KOLOM))
+    db.execute("COMMIT")
+
+
+def gpkg_afsluiten(gpkg: dict):
+    # Index en omhullende pas op het einde; ook zonder punten blijft het
+    # een geldig (leeg) bestand
+    db = gpkg["db"]
+    if db is None:
+        return
+    try:
+        if gpkg["kolommen"] is not None:
+            _index_opbouwen(gpkg)
+            min_x, min_y, max_x, max_y = gpkg["omhullende"]
+            if np.isfinite(min_x):
+                db.execute("UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ?, "
+                           "last_change = ? WHERE table_name = ?",
+                           (min_x, min_y, max_x, max_y, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                            gpkg["tabel"]))
+    finally:
+        db.close()
+        gpkg["db"] = None
@@ -0,0 +1,147 @@
+# =============================================================================
+# LOGBOEK EN METRIEKEN VAN EEN BATCH
+# =============================================================================
+# Een nachtelijke batch draait zonder toeschouwer: een foutvenster ziet
+# niemand en de statusregel is de volgende ochtend weg. Met de optie
+# "logboek" schrijft de batch in de uitvoermap:
+#
+#   logboek_<start>.jsonl        : één JSON-object per regel (JSON Lines)
+#       {"soort": "start", ...}  : taak, instellingen en batchopties, machine
+#       {"soort": "bestand", ...}: per invoerbestand de status, het gebruikte
+#                                  formaat, rijen, bytes, duur, doorvoer,
+#                                  geheugenpiek en de foutmelding of reden
+#       {"soort": "einde", ...}  : eindstatus van de taak
+#   logboek_<start>.metrics.json : totalen, percentielen (p50/p90/p95/p99)
+#                                  van duur en doorvoer per bestand, en de
+#                                  traagste bestanden
+#
+# Elke regel wordt in één keer opgebouwd (json.dumps) en in een gebufferd
+# bestand geschreven, dat de hele taak open blijft. Na elke regel gaat de
+# buffer wel naar schijf, zodat het logboek ook na een crash of
+# stroomuitval tot en met het laatste bestand leesbaar blijft; met één
+# regel per bestand kost dat niets merkbaars.
+#
+# De regels lezen bijv. met pandas.read_json(pad, lines=True).
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   json     : regels en metriekbestand
+#   os       : aantal processorkernen (capaciteitsplanning)
+#   platform : machine en besturingssysteem
+#   time     : tijdstippen en duur
+#   numpy    : percentielen
+#   pathlib  : bestandspaden
+# -----------------------------------------------------------------------------
+import json
+import os
+import platform
+import time
+import numpy as np
+from pathlib import Path
+
+
+LOGBOEK_BUFFER = 256 * 1024
+PERCENTIELEN = (50, 90, 95, 99)
+TRAAGSTE = 10          # aantal traagste bestanden in de metrieken
+MB = 1024 * 1024
+
+
+def _tijd(t=None) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(t))
+
+
+def logboek_openen(map_pad, taak: str, instellingen: dict, opties: dict) -> dict:
+    start = time.time()
+    basis = Path(map_pad) / f"logboek_{time.strftime('%Y%m%d_%H%M%S', time.localtime(start))}"
+    logboek = {
+        "pad":        str(basis) + ".jsonl",
+        "metrics":    str(basis) + ".metrics.json",
+        "stroom":     open(str(basis) + ".jsonl", "a", encoding="utf-8", buffering=LOGBOEK_BUFFER),
+        "start":      start,
+        "taak":       taak,
+        "bestanden":  [],      # de bestandsregels, voor de metrieken
+    }
+    logboek_regel(logboek, {
+        "soort":        "start",
+        "taak":         taak,
+        "instellingen": instellingen,
+        "opties":       opties,
+        "machine":      {"systeem": platform.platform(), "processor": platform.processor(),
+                         "kernen": os.cpu_count(), "python": platform.python_version()},
+    })
+    return logboek
+
+
+def logboek_regel(logboek: dict, regel: dict):
+    regel = {"tijd": _tijd(), **regel}
+    logboek["stroom"].write(json.dumps(regel, ensure_ascii=False, default=str) + "\n")
+    logboek["stroom"].flush()
+
+
+def logboek_bestand(logboek: dict, bestand, status: str, duur: float, invoer_bytes, **gegevens):
+    # Eén invoerbestand. gegevens: rijen, formaat, piek_mb, detail, fout, ...
+    rijen = gegevens.get("rijen")
+    regel = {
+        "soort":       "bestand",
+        "bestand":     str(bestand),
+        "status":      status,
+        "duur_s":      round(duur, 3),
+        "bytes":       invoer_bytes,
+        **gegevens,
+        "rijen_per_s": round(rijen / duur) if rijen and duur > 0 else None,
+        "mb_per_s":    round(invoer_bytes / MB / duur, 2) if invoer_bytes and duur > 0 else None,
+    }
+    logboek["bestanden"].append(regel)
+    logboek_regel(logboek, regel)
+
+
+def _percentielen(waarden: list):
+    if not waarden:
+        return None
+    a = np.asarray(waarden, dtype=float)
+    return {**{f"p{p}": round(float(np.percentile(a, p)), 3) for p in PERCENTIELEN},
+            "min": round(float(a.min()), 3), "max": round(float(a.max()), 3),
+            "gemiddeld": round(float(a.mean()), 3)}
+
+
+def logboek_afsluiten(logboek: dict, resultaat: dict, piek_bytes=None):
+    duur = time.time() - logboek["start"]
+    bestanden = logboek["bestanden"]
+    klaar = [b for b in bestanden if b["status"] == "klaar"]
+    rijen = sum(b.get("rijen") or 0 for b in klaar)
+    invoer_bytes = sum(b["bytes"] or 0 for b in klaar)
+    statussen = {}
+    for b in bestanden:
+        statussen[b["status"]] = statussen.get(b["status"], 0) + 1
+    piek_mb = round(piek_bytes / MB) if piek_bytes is not None else None
+    try:
+        logboek_regel(logboek, {"soort": "einde", "taak": logboek["taak"], "status": resultaat["status"],
+                                "duur_s": round(duur, 3), "piek_mb": piek_mb, "fout": resultaat.get("fout")})
+    finally:
+        logboek["stroom"].close()
+
+    metrieken = {
+        "taak":         logboek["taak"],
+        "start":        _tijd(logboek["start"]),
+        "einde":        _tijd(),
+        "status":       resultaat["status"],
+        "logboek":      logboek["pad"],
+        "bestanden":    statussen,
+        "totaal": {
+            "rijen":       rijen,
+            "bytes":       invoer_bytes,
+            "duur_s":      round(duur, 3),
+            "rijen_per_s": round(rijen / duur) if duur > 0 else None,
+            "mb_per_s":    round(invoer_bytes / MB / duur, 2) if duur > 0 else None,
+            "piek_mb":     piek_mb,
+        },
+        # Per geconverteerd bestand
+        "duur_s":      _percentielen([b["duur_s"] for b in klaar]),
+        "rijen_per_s": _percentielen([b["rijen_per_s"] for b in klaar if b["rijen_per_s"] is not None]),
+        "mb_per_s":    _percentielen([b["mb_per_s"] for b in klaar if b["mb_per_s"] is not None]),
+        "traagste":    [{"bestand": b["bestand"], "duur_s": b["duur_s"], "rijen_per_s": b["rijen_per_s"]}
+                        for b in sorted(klaar, key=lambda b: b["duur_s"], reverse=True)[:TRAAGSTE]],
+    }
+    with open(logboek["metrics"], "w", encoding="utf-8") as f:
+        json.dump(metrieken, f, indent=2, ensure_ascii=False)
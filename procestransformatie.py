@@ -0,0 +1,227 @@
+# =============================================================================
+# TRANSFORMEREN IN MEERDERE PROCESSEN
+# =============================================================================
+# Met hoogte_in/hoogte_uit (geoïdemodel) of een zware PROJ-bewerking is de
+# transform()-oproep het grootste deel van de rekentijd, en die draait in
+# één proces op één kern. ProcesTransformer verdeelt elke chunk over een
+# aantal werkprocessen. Elk werkproces maakt de transformers zelf
+# (transformer_maken) en houdt ze bij per combinatie van argumenten.
+#
+# DataFrames of arrays via een Queue doorgeven kost pickelen en kopiëren in
+# beide richtingen, ongeveer evenveel als de transformatie zelf. Daarom gaan
+# de coördinaten via gedeeld geheugen (multiprocessing.shared_memory):
+#   - een ring van vaste blokken (RING_PER_PROCES per werkproces), eenmalig
+#     aangemaakt en steeds hergebruikt, zonder nieuwe toewijzingen per chunk
+#   - elk blok bevat X, Y en eventueel Z van BLOK_RIJEN punten
+#   - over de Queues gaan enkel kleine tuples: (blok, aantal, dimensie,
+#     argumenten) heen en (blok, fout) terug
+# Het werkproces transformeert de punten in het blok zelf en schrijft het
+# resultaat op dezelfde plaats terug. Zodra een blok terugkomt, wordt het
+# uitgelezen en meteen opnieuw gevuld met het volgende stuk.
+#
+# Er draait één groep werkprocessen (Werkgroep) voor het hele programma,
+# gedeeld door alle uitvoerstelsels en bestanden van een batch: met
+# processen = 4 en drie uitvoerstelsels blijven dat 4 werkprocessen, geen 12.
+# proces_transformer() geeft een ProcesTransformer voor één combinatie van
+# argumenten, met hetzelfde gebruik als een pyproj Transformer:
+# transform(x, y[, z]). De werkprocessen worden gestart met "spawn" (zoals
+# altijd op Windows). Wordt een ander aantal gevraagd (bijv. een kleiner
+# geheugenbudget, zie conversie_kern.geheugen_verdeling), dan wordt de
+# groep vervangen. procestransformers_sluiten() stopt ze; dat gebeurt ook
+# automatisch bij het afsluiten van het programma. werkproces_ids() geeft
+# de proces-id's, zodat hun geheugen mee gemeten kan worden
+# (batch_planner.geheugen_nu).
+#
+# Het hoofdscript moet beschermd zijn met if __name__ == "__main__" (zoals
+# batch_taak), want spawn importeert het opnieuw in elk werkproces.
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   atexit          : werkprocessen stoppen bij het afsluiten
+#   multiprocessing : werkprocessen, Queues en gedeeld geheugen
+#   queue           : wachten op een resultaat met een tijdslimiet
+#   threading       : één chunk tegelijk door de werkgroep
+#   numpy           : arrays rechtstreeks op het gedeelde geheugen
+# -----------------------------------------------------------------------------
+import atexit
+import multiprocessing
+import queue
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+
+
+BLOK_RIJEN = 65_536        # punten per blok (3 × 8 bytes per punt = 1,5 MB)
+RING_PER_PROCES = 2        # blokken per werkproces: één bezig, één klaar
+MIN_RIJEN_PER_PROCES = 4096   # kleinere stukken verdelen loont niet
+WACHT_S = 1.0              # zo vaak controleren of de werkprocessen nog leven
+
+
+def _werkproces(taken, klaar, namen: list, blok_rijen: int):
+    # Draait in het werkproces. Import pas hier: conversie_kern importeert
+    # deze module zelf.
+    from conversie_kern import transformer_maken
+    blokken = [shared_memory.SharedMemory(name=naam) for naam in namen]
+    arrays = [np.ndarray((3, blok_rijen), dtype=np.float64, buffer=blok.buf) for blok in blokken]
+    transformers = {}      # argumenten → transformer (of de opstartfout)
+    a = None
+    try:
+        while (taak := taken.get()) is not None:
+            nummer, aantal, dimensie, argumenten = taak
+            if argumenten not in transformers:
+                try:
+                    transformers[argumenten] = transformer_maken(*argumenten)
+                except Exception as e:
+                    transformers[argumenten] = f"{type(e).__name__}: {e}"
+            transformer = transformers[argumenten]
+            if isinstance(transformer, str):
+                klaar.put((nummer, transformer))
+                continue
+            a = arrays[nummer]
+            try:
+                resultaat = transformer.transform(*(a[i, :aantal] for i in range(dimensie)))
+                for i in range(dimensie):
+                    a[i, :aantal] = resultaat[i]
+                klaar.put((nummer, None))
+            except Exception as e:
+                klaar.put((nummer, f"{type(e).__name__}: {e}"))
+    finally:
+        # Eerst de numpy-arrays loslaten, anders kan het blok niet sluiten
+        a = None
+        arrays.clear()
+        for blok in blokken:
+            blok.close()
+
+
+class Werkgroep:
+    def __init__(self, processen: int, blok_rijen: int = BLOK_RIJEN):
+        context = multiprocessing.get_context("spawn")
+        self.processen = processen
+        self.blok_rijen = blok_rijen
+        self._slot = threading.Lock()
+        self._blokken = [shared_memory.SharedMemory(create=True, size=3 * blok_rijen * 8)
+                         for _ in range(processen * RING_PER_PROCES)]
+        self._arrays = [np.ndarray((3, blok_rijen), dtype=np.float64, buffer=blok.buf)
+                        for blok in self._blokken]
+        self._vrij = list(range(len(self._blokken)))
+        self._taken = context.Queue()
+        self._klaar = context.Queue()
+        self._processen = [context.Process(target=_werkproces, daemon=True,
+                                           args=(self._taken, self._klaar, [b.name for b in self._blokken],
+                                                 blok_rijen))
+                           for _ in range(processen)]
+        for proces in self._processen:
+            proces.start()
+
+    def ids(self) -> list:
+        return [proces.pid for proces in self._processen if proces.pid is not None]
+
+    def transform(self, argumenten: tuple, invoer: list) -> tuple:
+        with self._slot:
+            return self._transform(argumenten, invoer)
+
+    def _transform(self, argumenten: tuple, invoer: list) -> tuple:
+        dimensie, aantal = len(invoer), len(invoer[0])
+        uitvoer = [np.empty(aantal) for _ in range(dimensie)]
+        # Stukken zo groot dat alle werkprocessen iets te doen hebben,
+        # maar nooit groter dan een blok
+        stuk = min(self.blok_rijen, max(MIN_RIJEN_PER_PROCES, -(-aantal // len(self._processen))))
+        bezig = {}      # blok → (begin, einde) in de invoer
+        fouten = []
+        for begin in range(0, aantal, stuk):
+            if not self._vrij:
+                self._ophalen(bezig, uitvoer, fouten)
+            nummer = self._vrij.pop()
+            einde = min(begin + stuk, aantal)
+            a = self._arrays[nummer]
+            for i in range(dimensie):
+                a[i, :einde - begin] = invoer[i][begin:einde]
+            bezig[nummer] = (begin, einde)
+            self._taken.put((nummer, einde - begin, dimensie, argumenten))
+        while bezig:
+            self._ophalen(bezig, uitvoer, fouten)
+        if fouten:
+            raise RuntimeError(f"Transformatie in werkproces mislukt: {fouten[0]}")
+        return tuple(uitvoer)
+
+    def _ophalen(self, bezig: dict, uitvoer: list, fouten: list):
+        # Eén klaar blok uitlezen en terug in de ring zetten
+        while True:
+            try:
+                nummer, fout = self._klaar.get(timeout=WACHT_S)
+                break
+            except queue.Empty:
+                if not all(proces.is_alive() for proces in self._processen):
+                    raise RuntimeError("Een werkproces van de transformatie is onverwacht gestopt.") from None
+        begin, einde = bezig.pop(nummer)
+        if fout is None:
+            a = self._arrays[nummer]
+            for i, kolom in enumerate(uitvoer):
+                kolom[begin:einde] = a[i, :einde - begin]
+        else:
+            fouten.append(fout)
+        self._vrij.append(nummer)
+
+    def sluiten(self):
+        for _ in self._processen:
+            self._taken.put(None)
+        for proces in self._processen:
+            proces.join(timeout=5)
+            if proces.is_alive():
+                proces.terminate()
+        self._arrays = []
+        for blok in self._blokken:
+            blok.close()
+            blok.unlink()
+        self._blokken = []
+
+
+class ProcesTransformer:
+    # argumenten: zoals voor transformer_maken(stelsel_in, stelsel_uit,
+    # snel, hoogte_in, hoogte_uit)
+    def __init__(self, werkgroep: Werkgroep, argumenten: tuple):
+        self._werkgroep = werkgroep
+        self._argumenten = argumenten
+
+    def transform(self, x, y, z=None):
+        invoer = [np.asarray(a, dtype=np.float64) for a in ((x, y) if z is None else (x, y, z))]
+        return self._werkgroep.transform(self._argumenten, invoer)
+
+
+# -----------------------------------------------------------------------------
+# HERGEBRUIK OVER DE BESTANDEN VAN EEN BATCH
+# -----------------------------------------------------------------------------
+# Een werkproces opstarten (Python, pandas en PROJ laden) duurt al snel een
+# halve seconde; per bestand opnieuw beginnen zou bij veel kleine bestanden
+# meer kosten dan het oplevert. Eén werkgroep tegelijk: elk werkproces kost
+# zelf geheugen (zie conversie_kern.GEHEUGEN_PROCES_MB).
+_WERKGROEP = None
+_WERKGROEP_SLOT = threading.Lock()
+
+
+def proces_transformer(argumenten: tuple, processen: int) -> ProcesTransformer:
+    global _WERKGROEP
+    with _WERKGROEP_SLOT:
+        if _WERKGROEP is not None and _WERKGROEP.processen != processen:
+            _WERKGROEP.sluiten()
+            _WERKGROEP = None
+        if _WERKGROEP is None:
+            _WERKGROEP = Werkgroep(processen)
+        return ProcesTransformer(_WERKGROEP, argumenten)
+
+
+def werkproces_ids() -> list:
+    werkgroep = _WERKGROEP
+    return werkgroep.ids() if werkgroep is not None else []
+
+
+def procestransformers_sluiten():
+    global _WERKGROEP
+    with _WERKGROEP_SLOT:
+        if _WERKGROEP is not None:
+            _WERKGROEP.sluiten()
+            _WERKGROEP = None
+
+
+atexit.register(procestransformers_sluiten)
@@ -0,0 +1,458 @@
+# =============================================================================
+# REGRESSIECONTROLE VAN DE CONVERSIE
+# =============================================================================
+# Elke versnelling van het conversiepad (caches, correctierasters, andere
+# lees- of schrijfwijze, compressie, ...) kan ongemerkt coördinaten
+# veranderen. Dit script controleert dat, zonder internet en in enkele
+# seconden, zodat het na elke wijziging gedraaid kan worden:
+#
+#     python regressie_controle.py
+#     python regressie_controle.py --vingerafdruk voor.json    (zie onder)
+#
+# Werkwijze: voor elk stelsel uit CRS_CODES worden controlepunten verspreid
+# over België en het Belgisch deel van de Noordzee aangemaakt, als
+# invoerbestand met en zonder punt-ID. Voor ELK stelselpaar wordt dat
+# bestand dan omgezet langs alle paden die de programma's gebruiken:
+#   kern         : conversie_kern.conversie_een_bestand (de batchversie)
+#   achtergrond  : vooruit gelezen bytes + AchtergrondSchrijver
+#   kleine_chunks: dezelfde conversie met chunks van enkele honderden rijen,
+#                  zodat er veel chunkgrenzen in het bestand vallen
+#   meerdere     : één keer lezen, naar alle stelsels (conversie_meerdere_stelsels)
+#   gzip         : gecomprimeerde invoer en uitvoer
+#   dienst       : POST /bestand van conversie_dienst, op een lokale poort
+#   excel        : dezelfde punten als getalcellen in een Excel-werkmap
+#                  (enkel als openpyxl geïnstalleerd is)
+# De uitvoer van elk pad moet BYTE VOOR BYTE gelijk zijn aan de referentie:
+# de werkwijze van de single-versie (coordinaat_conversie_v3.conversie: het
+# hele bestand in één keer inlezen, één pyproj-transform, afronden, to_csv).
+#
+# Het snelle pad (correctieraster, snel_raster) wijkt per ontwerp soms 1 af
+# in het laatste cijfer (zie conversie_kern; tot 1 mm fout, dus enkele
+# promille van de punten liggen vlak bij een afrondingsgrens). Daar geldt: hoogstens
+# SNEL_MAX_VERSCHIL in de coördinaten en hoogstens SNEL_MAX_AANDEEL van de
+# rijen verschillend.
+#
+# Rondreis: elk paar heen en terug (zonder afronding) moet op minder dan
+# RONDREIS_MAX_FOUT terugkomen, ook via het correctieraster.
+#
+# Uitdunnen "ondiepste": per rastercel moet het ondiepste punt overblijven,
+# ook met "Wissel hoogte/diepte" (dan is Z een diepte, positief naar onder).
+# Uitdunnen bij samenvoegen: twee bestanden met punten in dezelfde cellen
+# moeten één punt per cel geven, met het gemiddelde over beide bestanden.
+#
+# Vingerafdruk: --vingerafdruk PAD bewaart een hash van elke uitvoer als het
+# bestand nog niet bestaat, en vergelijkt ermee als het al bestaat. Zo is
+# ook een verandering zichtbaar die alle paden samen (en dus ook de
+# referentie) treft, bijv. een andere pandas- of PROJ-versie. Draai het dus
+# één keer vóór en één keer na een wijziging.
+#
+# Afsluitcode 0 als alles klopt, anders 1.
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   argparse       : opdrachtregelopties
+#   gzip           : gecomprimeerde invoer aanmaken en uitvoer uitpakken
+#   hashlib        : vingerafdruk van de uitvoer
+#   http.client    : verzoek naar de conversiedienst
+#   io             : uitvoer (bytes) opnieuw inlezen
+#   json           : vingerafdruk lezen en bewaren
+#   sys            : afsluitcode
+#   tempfile       : werkmap voor de controlebestanden
+#   threading      : conversiedienst in de achtergrond laten draaien
+#   time           : duur van de controle
+#   pathlib        : bestandspaden
+#   numpy / pandas : controlepunten en referentie
+#   pyproj         : referentietransformatie en versie voor de vingerafdruk
+#   openpyxl       : (optioneel) Excel-werkmap van de controlepunten maken
+# -----------------------------------------------------------------------------
+import argparse
+import gzip
+import hashlib
+import http.client
+import io
+import json
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyproj
+from pyproj import Transformer
+import conversie_kern
+from conversie_kern import (CRS_CODES, HEADERS, SNEL_STELSELS, STANDAARD_INSTELLINGEN, SCHEIDINGSTEKENS,
+                            conversie_een_bestand, conversie_meerdere_stelsels, tak_nieuw,
+                            transformer_maken)
+from batch_planner import AchtergrondSchrijver
+from batch_taak import profiel_maken, taak_uitvoeren
+from conversie_dienst import ConversieHandler
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+CONTROLE_PUNTEN = 3000
+CONTROLE_GEBIED = (2.3, 49.5, 6.4, 51.9)   # lengte/breedte: België + Noordzee
+KLEINE_CHUNK = 457                          # geen deler van CONTROLE_PUNTEN
+RONDREIS_MAX_FOUT = 0.001                   # in meter
+SNEL_MAX_VERSCHIL = 0.01                    # 1 in het laatste cijfer (cm)
+SNEL_MAX_AANDEEL = 0.01                     # hoogstens 1 % van de rijen
+METER_PER_GRAAD = 111_320.0
+
+# Twee invoervarianten per stelsel: zonder en met punt-ID (met herhaalde
+# ID's, zodat ook de compacte opslag van conversie_kern.punt_ids meedoet).
+# De tweede variant schrijft met decimale komma.
+VARIANTEN = {
+    "xyz": {"naam_kolom": False, "uitvoer": "komma(decimaal punt)"},
+    "id":  {"naam_kolom": True,  "uitvoer": "punt-komma(decimaal komma)"},
+}
+
+
+# =============================================================================
+# CONTROLEPUNTEN EN REFERENTIE
+# =============================================================================
+def _decimalen(stelsel: str) -> int:
+    # Invoer: graden met 8 decimalen (± 1 mm), meter met 3
+    return 8 if stelsel == "WGS84" else 3
+
+
+def controlebestanden_maken(map_pad: Path) -> dict:
+    # Geeft (stelsel, variant) → pad van het invoerbestand
+    toeval = np.random.default_rng(31370)
+    lengte = toeval.uniform(CONTROLE_GEBIED[0], CONTROLE_GEBIED[2], CONTROLE_PUNTEN)
+    breedte = toeval.uniform(CONTROLE_GEBIED[1], CONTROLE_GEBIED[3], CONTROLE_PUNTEN)
+    z = np.round(toeval.uniform(-30, 5, CONTROLE_PUNTEN), 2)
+    ids = [f"lijn{i // 50}" for i in range(CONTROLE_PUNTEN)]
+
+    paden = {}
+    for stelsel, code in CRS_CODES.items():
+        # EPSG:4326 in de officiële volgorde (breedte, lengte), zoals conversie_kern
+        x, y = Transformer.from_crs("EPSG:4326", code).transform(breedte, lengte)
+        d = _decimalen(stelsel)
+        for variant, opties in VARIANTEN.items():
+            kolommen = {"x": np.round(x, d), "y": np.round(y, d), "z": z}
+            if opties["naam_kolom"]:
+                kolommen = {"id": ids, **kolommen}
+            pad = map_pad / f"{stelsel}_{variant}.xyz"
+            pd.DataFrame(kolommen).to_csv(pad, sep=" ", header=False, index=False,
+                                          float_format=f"%.{d}f")
+            paden[stelsel, variant] = pad
+    return paden
+
+
+def instellingen_maken(stelsel_in: str, stelsel_uit: str, variant: str) -> dict:
+    separator, decimal = SCHEIDINGSTEKENS[VARIANTEN[variant]["uitvoer"]]
+    return {**STANDAARD_INSTELLINGEN, "stelsel_in": stelsel_in, "stelsel_uit": stelsel_uit,
+            "naam_kolom": VARIANTEN[variant]["naam_kolom"], "separator_uit": separator,
+            "decimal_uit": decimal}
+
+
+def referentie(pad: Path, instellingen: dict) -> bytes:
+    # Zelfde stappen als coordinaat_conversie_v3.conversie(), los van
+    # conversie_kern: alles in één keer, geen chunks, geen caches
+    df = pd.read_csv(pad, delimiter=" ", header=None)
+    x_header, y_header = HEADERS[instellingen["stelsel_uit"]]
+    transformer = Transformer.from_crs(CRS_CODES[instellingen["stelsel_in"]],
+                                       CRS_CODES[instellingen["stelsel_uit"]])
+    if instellingen["naam_kolom"]:
+        x, y = transformer.transform(df[1].values, df[2].values)
+        df_output = pd.DataFrame({"point": df[0], x_header: x, y_header: y, "Z": df[3]})
+    else:
+        x, y = transformer.transform(df[0].values, df[1].values)
+        df_output = pd.DataFrame({x_header: x, y_header: y, "Z": df[2]})
+    decimalen = 6 if instellingen["stelsel_uit"] == "WGS84" else 2
+    df_output[x_header] = df_output[x_header].round(decimalen)
+    df_output[y_header] = df_output[y_header].round(decimalen)
+    df_output["Z"] = df_output["Z"].round(2)
+    return df_output.to_csv(index=False, sep=instellingen["separator_uit"],
+                            decimal=instellingen["decimal_uit"]).encode("utf-8")
+
+
+# =============================================================================
+# DE CONVERSIEPADEN
+# =============================================================================
+# Elk pad krijgt het invoerbestand, de instellingen en een werkmap, en geeft
+# de uitvoer als bytes terug.
+# -----------------------------------------------------------------------------
+def pad_kern(pad, instellingen, map_pad):
+    uit = map_pad / "kern.asc"
+    conversie_een_bestand(pad, uit, instellingen)
+    return uit.read_bytes()
+
+
+def pad_achtergrond(pad, instellingen, map_pad):
+    uit = map_pad / "achtergrond.asc"
+    schrijver = AchtergrondSchrijver()
+    try:
+        conversie_een_bestand(pad, uit, instellingen, invoer_data=pad.read_bytes(), schrijver=schrijver)
+    finally:
+        schrijver.sluiten()
+    return uit.read_bytes()
+
+
+def pad_kleine_chunks(pad, instellingen, map_pad):
+    uit = map_pad / "kleine_chunks.asc"
+    oud, conversie_kern.CHUNK_RIJEN = conversie_kern.CHUNK_RIJEN, KLEINE_CHUNK
+    try:
+        conversie_een_bestand(pad, uit, instellingen)
+    finally:
+        conversie_kern.CHUNK_RIJEN = oud
+    return uit.read_bytes()
+
+
+def pad_gzip(pad, instellingen, map_pad):
+    invoer = map_pad / (pad.name + ".gz")
+    invoer.write_bytes(gzip.compress(pad.read_bytes()))
+    uit = map_pad / "gzip.asc.gz"
+    conversie_een_bestand(invoer, uit, instellingen)
+    return gzip.decompress(uit.read_bytes())
+
+
+def pad_dienst(pad, instellingen, map_pad):
+    verbinding = http.client.HTTPConnection("127.0.0.1", _dienst_poort())
+    try:
+        uitvoer = next(label for label, tekens in SCHEIDINGSTEKENS.items()
+                       if tekens == (instellingen["separator_uit"], instellingen["decimal_uit"]))
+        verbinding.request("POST", "/bestand?" + "&".join([
+            f"van={instellingen['stelsel_in']}", f"naar={instellingen['stelsel_uit']}",
+            f"point_id={int(instellingen['naam_kolom'])}", f"uitvoer={uitvoer}"]).replace(" ", "%20"),
+            body=pad.read_bytes())
+        antwoord = verbinding.getresponse()
+        data = antwoord.read()
+        if antwoord.status != 200:
+            raise RuntimeError(f"HTTP {antwoord.status}: {data.decode('utf-8', 'replace')}")
+        return data
+    finally:
+        verbinding.close()
+
+
+def pad_excel(pad, instellingen, map_pad):
+    invoer = map_pad / (pad.stem + ".xlsx")
+    if not invoer.exists():   # één werkmap per invoerbestand, voor alle uitvoerstelsels
+        werkmap = openpyxl.Workbook(write_only=True)
+        blad = werkmap.create_sheet("punten")
+        for rij in pd.read_csv(pad, delimiter=" ", header=None).itertuples(index=False):
+            blad.append(list(rij))
+        werkmap.save(invoer)
+    uit = map_pad / "excel.asc"
+    conversie_een_bestand(invoer, uit, instellingen)
+    return uit.read_bytes()
+
+
+PADEN = {
+    "kern":          pad_kern,
+    "achtergrond":   pad_achtergrond,
+    "kleine_chunks": pad_kleine_chunks,
+    "gzip":          pad_gzip,
+    "dienst":        pad_dienst,
+}
+if openpyxl is not None:
+    PADEN["excel"] = pad_excel
+
+_dienst = {}
+
+
+def _dienst_poort() -> int:
+    # De conversiedienst één keer starten op een vrije poort (poort 0)
+    if "server" not in _dienst:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), ConversieHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        _dienst["server"] = server
+    return _dienst["server"].server_address[1]
+
+
+def meerdere_stelsels(pad, stelsel_in, variant, map_pad) -> dict:
+    # Eén keer lezen, naar alle stelsels: stelsel_uit → bytes
+    takken = [tak_nieuw(instellingen_maken(stelsel_in, stelsel_uit, variant),
+                        map_pad / f"meerdere_{stelsel_uit}.asc") for stelsel_uit in CRS_CODES]
+    conversie_meerdere_stelsels(pad, takken)
+    return {tak["instellingen"]["stelsel_uit"]: Path(tak["output_pad"]).read_bytes() for tak in takken}
+
+
+# =============================================================================
+# VERGELIJKEN
+# =============================================================================
+def _coordinaten(data: bytes, instellingen: dict) -> np.ndarray:
+    df = pd.read_csv(io.BytesIO(data), sep=instellingen["separator_uit"],
+                     decimal=instellingen["decimal_uit"])
+    x_header, y_header = HEADERS[instellingen["stelsel_uit"]]
+    return df[[x_header, y_header]].to_numpy(dtype=float)
+
+
+def snel_vergelijken(data: bytes, ref: bytes, instellingen: dict):
+    # Geeft een foutmelding terug, of None als het snelle pad binnen de marge blijft
+    a, b = _coordinaten(data, instellingen), _coordinaten(ref, instellingen)
+    if a.shape != b.shape:
+        return f"{len(a)} i.p.v. {len(b)} rijen"
+    verschil = np.abs(a - b).max(axis=1)
+    if verschil.max() > SNEL_MAX_VERSCHIL * 1.0001:   # marge voor de voorstelling van 0.01
+        return f"grootste verschil {verschil.max():.6f}"
+    aandeel = (verschil > 0).mean()
+    if aandeel > SNEL_MAX_AANDEEL:
+        return f"{aandeel:.2%} van de rijen verschilt"
+    return None
+
+
+def rondreis_fout(stelsel_a: str, stelsel_b: str, snel: bool) -> float:
+    # Grootste fout in meter na heen en terug, zonder afronding
+    toeval = np.random.default_rng(4326)
+    breedte = toeval.uniform(CONTROLE_GEBIED[1], CONTROLE_GEBIED[3], CONTROLE_PUNTEN)
+    lengte = toeval.uniform(CONTROLE_GEBIED[0], CONTROLE_GEBIED[2], CONTROLE_PUNTEN)
+    x, y = Transformer.from_crs("EPSG:4326", CRS_CODES[stelsel_a]).transform(breedte, lengte)
+    u, v = transformer_maken(stelsel_a, stelsel_b, snel).transform(x, y)
+    x2, y2 = transformer_maken(stelsel_b, stelsel_a, snel).transform(u, v)
+    dx, dy = np.asarray(x2) - x, np.asarray(y2) - y
+    if stelsel_a == "WGS84":
+        # (breedte, lengte) in graden → meter
+        dx, dy = dx * METER_PER_GRAAD, dy * METER_PER_GRAAD * np.cos(np.radians(x))
+    return float(np.nanmax(np.hypot(dx, dy)))
+
+
+# Twee rastercellen van 10 m met elk twee punten: (X, Y, Z als hoogte, LAT negatief)
+UITDUN_PUNTEN = [(150001.0, 200001.0, -2.0), (150002.0, 200002.0, -9.0),
+                 (150101.0, 200101.0, -5.0), (150102.0, 200102.0, -1.0)]
+UITDUN_ONDIEPSTE = [-2.0, -1.0]   # per cel, als hoogte
+# Samenvoegen: het tweede bestand valt in dezelfde twee cellen
+UITDUN_TWEEDE = [(150003.0, 200003.0, -4.0), (150103.0, 200103.0, -3.0)]
+UITDUN_GEMIDDELD = [-5.0, -3.0]  # gemiddelde Z per cel over beide bestanden
+
+
+def uitdunnen_controleren(map_pad: Path) -> list:
+    # Geeft een lijst met foutmeldingen terug
+    invoer = map_pad / "uitdunnen.xyz"
+    pd.DataFrame(UITDUN_PUNTEN).to_csv(invoer, sep=" ", header=False, index=False)
+    fouten = []
+    for diepte in (False, True):
+        uit = map_pad / "uitdunnen.asc"
+        conversie_een_bestand(invoer, uit, {**STANDAARD_INSTELLINGEN, "stelsel_in": "L72", "stelsel_uit": "L72",
+                                            "diepte": diepte, "uitdunnen": "ondiepste", "uitdun_waarde": 10})
+        z = sorted(pd.read_csv(uit)["Z"], key=abs)
+        verwacht = sorted((-v if diepte else v for v in UITDUN_ONDIEPSTE), key=abs)
+        if z != verwacht:
+            fouten.append(f"uitdunnen ondiepste{' met diepte' if diepte else ''}: Z {z} i.p.v. {verwacht}")
+
+    tweede = map_pad / "uitdunnen_2.xyz"
+    pd.DataFrame(UITDUN_TWEEDE).to_csv(tweede, sep=" ", header=False, index=False)
+    profiel = profiel_maken({**STANDAARD_INSTELLINGEN, "stelsel_in": "L72", "stelsel_uit": "L72",
+                             "uitdunnen": "raster_gemiddeld", "uitdun_waarde": 10},
+                            bestanden=[str(invoer), str(tweede)], uitvoer_map=str(map_pad / "samen"),
+                            samenvoeg_naam="alles", auto_formaat=False, validatie=False)
+    resultaat = taak_uitvoeren(profiel)
+    if resultaat["status"] != "klaar":
+        fouten.append(f"uitdunnen samengevoegd: {resultaat['status']} {resultaat['fout']}")
+    else:
+        df = pd.read_csv(map_pad / "samen" / "alles.asc")
+        if sorted(df["Z"]) != sorted(UITDUN_GEMIDDELD) or df.duplicated(list(df.columns[:2])).any():
+            fouten.append(f"uitdunnen samengevoegd: {len(df)} rijen, Z {sorted(df['Z'])} "
+                          f"i.p.v. één punt per cel met Z {sorted(UITDUN_GEMIDDELD)}")
+    return fouten
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+# =============================================================================
+# CONTROLE UITVOEREN
+# =============================================================================
+def controle_uitvoeren(melden=print, snel: bool = True) -> tuple:
+    # Geeft (fouten, vingerafdruk) terug: een lijst met foutmeldingen en
+    # geval → hash van de referentie-uitvoer
+    fouten, vingerafdruk = [], {}
+
+    def fout(tekst):
+        fouten.append(tekst)
+        melden("FOUT  " + tekst)
+
+    with tempfile.TemporaryDirectory(prefix="regressie_") as tijdelijk:
+        map_pad = Path(tijdelijk)
+        invoer = controlebestanden_maken(map_pad)
+
+        for (stelsel_in, variant), pad in invoer.items():
+            meerdere = meerdere_stelsels(pad, stelsel_in, variant, map_pad)
+            for stelsel_uit in CRS_CODES:
+                geval = f"{stelsel_in}→{stelsel_uit} {variant}"
+                instellingen = instellingen_maken(stelsel_in, stelsel_uit, variant)
+                ref = referentie(pad, instellingen)
+                vingerafdruk[geval] = _hash(ref)
+
+                uitkomsten = {"meerdere": meerdere[stelsel_uit]}
+                for naam, functie in PADEN.items():
+                    try:
+                        uitkomsten[naam] = functie(pad, instellingen, map_pad)
+                    except Exception as e:
+                        fout(f"{geval} [{naam}]: {e}")
+                for naam, data in uitkomsten.items():
+                    if data != ref:
+                        fout(f"{geval} [{naam}]: uitvoer verschilt van de referentie")
+
+                if snel and stelsel_in != stelsel_uit and stelsel_in in SNEL_STELSELS \
+                        and stelsel_uit in SNEL_STELSELS:
+                    uit = map_pad / "snel.asc"
+                    conversie_een_bestand(pad, uit, {**instellingen, "snel_raster": True})
+                    probleem = snel_vergelijken(uit.read_bytes(), ref, instellingen)
+                    if probleem:
+                        fout(f"{geval} [snel]: {probleem}")
+            melden(f"ok    {stelsel_in} {variant}")
+
+    for stelsel_a in CRS_CODES:
+        for stelsel_b in CRS_CODES:
+            if stelsel_a == stelsel_b:
+                continue
+            for met_raster in (False, True) if snel else (False,):
+                if met_raster and (stelsel_a not in SNEL_STELSELS or stelsel_b not in SNEL_STELSELS):
+                    continue
+                afwijking = rondreis_fout(stelsel_a, stelsel_b, met_raster)
+                naam = f"rondreis {stelsel_a}→{stelsel_b}→{stelsel_a}{' [snel]' if met_raster else ''}"
+                if not afwijking < RONDREIS_MAX_FOUT:
+                    fout(f"{naam}: {afwijking * 1000:.3f} mm")
+    melden(f"ok    rondreizen (< {RONDREIS_MAX_FOUT * 1000:g} mm)")
+
+    with tempfile.TemporaryDirectory(prefix="regressie_") as tijdelijk:
+        for tekst in uitdunnen_controleren(Path(tijdelijk)):
+            fout(tekst)
+    melden("ok    uitdunnen ondiepste (hoogte en diepte) en samengevoegd")
+    return fouten, vingerafdruk
+
+
+def vingerafdruk_vergelijken(pad: Path, vingerafdruk: dict) -> list:
+    # Bestaat het bestand nog niet, dan wordt de vingerafdruk bewaard
+    versies = {"pyproj": pyproj.__version__, "proj": pyproj.proj_version_str, "pandas": pd.__version__}
+    if not pad.exists():
+        pad.write_text(json.dumps({"versies": versies, "uitvoer": vingerafdruk}, indent=2,
+                                  ensure_ascii=False), encoding="utf-8")
+        print(f"Vingerafdruk bewaard in {pad}")
+        return []
+    vorige = json.loads(pad.read_text(encoding="utf-8"))
+    if vorige["versies"] != versies:
+        print(f"Let op: andere versies dan bij het bewaren ({vorige['versies']})")
+    return [f"{geval}: uitvoer veranderd t.o.v. {pad.name}"
+            for geval, waarde in vingerafdruk.items() if vorige["uitvoer"].get(geval) != waarde]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regressiecontrole van alle conversiepaden")
+    parser.add_argument("--vingerafdruk", type=Path,
+                        help="hashes van de uitvoer bewaren (nieuw bestand) of ermee vergelijken")
+    parser.add_argument("--zonder-snel", action="store_true",
+                        help="het correctieraster (snel_raster) niet controleren")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    fouten, vingerafdruk = controle_uitvoeren(snel=not args.zonder_snel)
+    if args.vingerafdruk:
+        for tekst in vingerafdruk_vergelijken(args.vingerafdruk, vingerafdruk):
+            fouten.append(tekst)
+            print("FOUT  " + tekst)
+    print(f"{len(vingerafdruk)} gevallen, {len(fouten)} fouten ({time.perf_counter() - start:.1f} s)")
+    sys.exit(1 if fouten else 0)
+
+
+if __name__ == "__main__":
+    main()
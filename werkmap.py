@@ -0,0 +1,122 @@
+# =============================================================================
+# EXCEL-WERKMAPPEN INLEZEN (.xlsx, .xlsm)
+# =============================================================================
+# Aannemers leveren controlepunten als Excel-werkmap, met één werkblad per
+# meetdag. In plaats van elk blad met de hand als CSV te bewaren, leest de
+# batch de werkmap rechtstreeks, blad per blad (één uitvoerbestand per blad).
+#
+# openpyxl opent de werkmap in read-only modus: de rijen worden dan tijdens
+# het lezen uit het zip-bestand gehaald, in plaats van eerst de volledige
+# werkmap (met opmaak, stijlen, ...) in het geheugen op te bouwen.
+#
+# werkblad_chunks() levert DataFrames zoals pd.read_csv(header=None,
+# chunksize=...): kolommen 0, 1, 2, ..., een kolom met enkel getallen als
+# getal, andere kolommen (punt-ID's) als tekst. Lege rijen worden
+# overgeslagen, lege cellen rechts van de gegevens vallen weg. Bij formules
+# geldt de waarde die Excel het laatst berekend en bewaard heeft.
+#
+# openpyxl is optioneel en wordt pas geïmporteerd als er een werkmap gelezen
+# wordt. Oude .xls-bestanden (binair formaat) worden niet ondersteund.
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# IMPORTS
+#   io        : vooruit gelezen bytes als bestand aanbieden
+#   itertools : rijen per chunk nemen (islice)
+#   zipfile   : een beschadigde werkmap herkennen (.xlsx is een zip-bestand)
+#   pandas    : rijen omzetten naar een DataFrame
+#   pathlib   : extensie bepalen
+# -----------------------------------------------------------------------------
+import io
+import itertools
+import zipfile
+import pandas as pd
+from pathlib import Path
+
+
+WERKMAP_EXTENSIES = (".xlsx", ".xlsm")
+
+
+def is_werkmap(pad) -> bool:
+    return Path(pad).suffix.lower() in WERKMAP_EXTENSIES
+
+
+def _openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise RuntimeError("Voor Excel-bestanden is het pakket openpyxl nodig.") from None
+    return openpyxl
+
+
+def werkmap_openen(pad, data=None):
+    # data: al vooruit gelezen bytes van het bestand. Na gebruik sluiten
+    # (read-only houdt het bestand open zolang er gelezen wordt).
+    openpyxl = _openpyxl()
+    try:
+        return openpyxl.load_workbook(pad if data is None else io.BytesIO(data),
+                                      read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError, openpyxl.utils.exceptions.InvalidFileException):
+        raise ValueError(f"Geen geldige Excel-werkmap: {Path(pad).name}") from None
+
+
+def werkbladen(pad, data=None) -> dict:
+    # Werkbladnaam → aantal rijen volgens de werkmap zelf (bovengrens, lege
+    # rijen tellen mee; None als de werkmap dat niet bijhoudt). In de volgorde
+    # van de tabbladen, zonder grafiekbladen.
+    werkmap = werkmap_openen(pad, data)
+    try:
+        return {blad.title: blad.max_row for blad in werkmap.worksheets}
+    finally:
+        werkmap.close()
+
+
+def _leeg(waarde) -> bool:
+    return waarde is None or (isinstance(waarde, str) and not waarde.strip())
+
+
+def werkblad_rijen(pad, blad=None, data=None):
+    # Generator: de niet-lege rijen van het werkblad als lijsten met waarden.
+    # blad None = het eerste werkblad.
+    werkmap = werkmap_openen(pad, data)
+    try:
+        if blad is None:
+            werkblad = werkmap.worksheets[0]
+        elif blad in werkmap.sheetnames:
+            werkblad = werkmap[blad]
+        else:
+            raise ValueError(f"Werkblad {blad!r} niet gevonden in {Path(pad).name}.")
+        for rij in werkblad.iter_rows(values_only=True):
+            waarden = [None if _leeg(waarde) else waarde for waarde in rij]
+            while waarden and waarden[-1] is None:
+                waarden.pop()
+            if waarden:
+                yield waarden
+    finally:
+        werkmap.close()
+
+
+def _naar_dataframe(rijen: list, decimal: str) -> pd.DataFrame:
+    df = pd.DataFrame(rijen)   # kortere rijen worden aangevuld met NaN
+    for kolom in df.columns:
+        waarden = df[kolom]
+        if decimal == ",":
+            # Getallen die als tekst met decimale komma in een cel staan
+            waarden = waarden.map(lambda v: v.replace(",", ".") if isinstance(v, str) else v)
+        getallen = pd.to_numeric(waarden, errors="coerce")
+        # Enkel een getalkolom als elke ingevulde cel een getal is
+        if getallen.notna().sum() == waarden.notna().sum():
+            df[kolom] = getallen
+    return df
+
+
+def werkblad_chunks(pad, blad=None, titelrij: bool = False, decimal: str = ".",
+                    chunk_rijen: int = 100_000, data=None):
+    rijen = werkblad_rijen(pad, blad, data)
+    try:
+        if titelrij:
+            next(rijen, None)
+        while blok := list(itertools.islice(rijen, chunk_rijen)):
+            yield _naar_dataframe(blok, decimal)
+    finally:
+        rijen.close()   # werkmap sluiten, ook als er vroeger gestopt wordt